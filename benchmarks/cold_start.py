@@ -0,0 +1,102 @@
+"""
+Cold-start report: what a restarted container pays before the first frame.
+Every measurement runs in a fresh interpreter, so nothing is already imported
+or cached in memory.
+
+  imports                 import time per heavy module, and for the two sets the
+                          app needs before the PIN page (old eager vs now)
+  time_to_first_inference fresh process -> shared Orchestrator built -> one blank
+                          frame inferred, for the onnxruntime backend with the
+                          serialized pre-optimized graph missing ("cold") and present ("cached")
+
+    python benchmarks/cold_start.py --repeats 3
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["streamlit", "numpy", "cv2", "av", "pandas", "streamlit_webrtc", "onnxruntime", "ultralytics"]
+# What main.py imported before rendering the PIN page, before and after lazy imports
+PIN_PAGE_EAGER = ["streamlit", "numpy", "cv2", "av", "pandas", "streamlit_webrtc",
+                  "brain.orchestrator", "brain.live_pipeline", "tools.inventory"]
+PIN_PAGE_LAZY = ["streamlit", "tools.startup"]
+
+IMPORT_SNIPPET = """
+import sys, time, json
+sys.path.append({src!r})
+t0 = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+print(json.dumps(round((time.perf_counter() - t0) * 1000, 1)))
+"""
+
+FIRST_INFERENCE_SNIPPET = """
+import sys, time, json, os
+t0 = time.perf_counter()
+sys.path.append({src!r})
+os.chdir({base!r})
+from brain.orchestrator import warm_up
+from tools import startup
+warm_up()
+out = startup.timings()
+out["wall_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+# The app process lives on, so let the background graph serializer finish too
+import threading
+for t in threading.enumerate():
+    if t.name == "ort-graph-cache":
+        t.join()
+print(json.dumps(out))
+"""
+
+
+def run_python(code, env=None):
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_ms(modules, repeats):
+    runs = [run_python(IMPORT_SNIPPET.format(src=os.path.join(BASE_DIR, "src"), modules=modules))
+            for _ in range(repeats)]
+    errors = [r for r in runs if isinstance(r, dict)]
+    if errors:
+        return errors[0]
+    return {"ms_min": min(runs), "ms_median": sorted(runs)[len(runs) // 2]}
+
+
+def first_inference(cache_dir, clear, repeats):
+    env = dict(os.environ, PHARMA_VISION_BACKEND="onnxruntime", PHARMA_ORT_CACHE=cache_dir)
+    code = FIRST_INFERENCE_SNIPPET.format(src=os.path.join(BASE_DIR, "src"), base=BASE_DIR)
+    runs = []
+    for _ in range(repeats):
+        if clear:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        runs.append(run_python(code, env))
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {"imports": {name: import_ms([name], args.repeats) for name in MODULES}}
+    report["imports"]["pin_page_eager"] = import_ms(PIN_PAGE_EAGER, args.repeats)
+    report["imports"]["pin_page_lazy"] = import_ms(PIN_PAGE_LAZY, args.repeats)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = first_inference(cache_dir, clear=True, repeats=args.repeats)
+        cached = first_inference(cache_dir, clear=False, repeats=args.repeats)
+    report["time_to_first_inference"] = {"cold": cold, "cached": cached}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Offline serving benchmark for the three hot paths, reported as one JSON
+document so runs can be diffed across commits:
+
+  vision     dataset/images/train frames and a synthetic panning video replayed
+             through VisionAgent.analyze_frame (one stream, real StreamState)
+  audit      AuditorAgent.log_transaction at full speed into a scratch ledger
+  inventory  InventoryService lookups against synthetic 100 and 10k SKU files
+
+Every section runs in its own child process so "peak_rss_mb" belongs to that
+section alone. Latencies are per call in milliseconds.
+
+    python benchmarks/serving_suite.py --out benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/serving_suite.py --only audit inventory --audit-records 200000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+TRAIN_DIR = os.path.join(BASE_DIR, 'dataset', 'images', 'train')
+SECTIONS = ("vision", "audit", "inventory")
+
+
+def summarize(samples_ms, elapsed_s):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if samples.size == 0:
+        return {"calls": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "calls": int(samples.size),
+        "ms_p50": round(float(p50), 4),
+        "ms_p95": round(float(p95), 4),
+        "ms_p99": round(float(p99), 4),
+        "ms_max": round(float(samples.max()), 4),
+        "per_sec": round(samples.size / elapsed_s, 1) if elapsed_s else None,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def timed_loop(fn, items):
+    samples = []
+    t0 = time.perf_counter()
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples, time.perf_counter() - t0)
+
+
+# --- VISION ---
+
+def synthetic_video(images, path, frames, size=(1280, 720), fps=30):
+    """Pans across the dataset images so the video has real texture and motion."""
+    import cv2
+    width, height = size
+    canvas = np.concatenate([cv2.resize(img, (width, height)) for img in images[:4]], axis=1)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    span = canvas.shape[1] - width
+    for i in range(frames):
+        x = int(span * (0.5 - 0.5 * np.cos(2 * np.pi * i / frames)))
+        writer.write(np.ascontiguousarray(canvas[:, x:x + width]))
+    writer.release()
+
+
+def bench_vision(args):
+    # Imported here so the audit/inventory sections run on machines without OpenCV
+    import cv2
+    from agents.vision_agent import VisionAgent
+
+    paths = sorted(
+        os.path.join(TRAIN_DIR, name) for name in os.listdir(TRAIN_DIR)
+        if name.lower().endswith(('.png', '.jpg', '.jpeg'))
+    )
+    images = [img for img in (cv2.imread(p) for p in paths) if img is not None]
+    if not images:
+        return {"skipped": f"no readable images in {TRAIN_DIR}"}
+
+    t0 = time.perf_counter()
+    vision = VisionAgent(backend=args.backend, frame_mode=args.frame_mode)
+    report = {"backend": vision.backend, "frame_mode": vision.frame_mode,
+              "model_load_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    fmt = vision.input_format
+    convert = (lambda img: img) if fmt == "bgr24" else (lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    target_ids = list(vision.name_to_id)
+
+    # Stills: every frame is an inference frame (fresh stream state per image)
+    frames = [convert(img) for img in images] * args.image_passes
+
+    def still(frame):
+        state = vision.new_stream_state()
+        state.frame_count = -1  # next call is frame 0, which always runs the model
+        vision.analyze_frame(frame.copy(), random.choice(target_ids), fmt=fmt, state=state)
+
+    report["dataset_images"] = timed_loop(still, frames)
+
+    # Synthetic video: decode + the live skip/track schedule on one stream
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "synthetic.mp4")
+        synthetic_video(images, video_path, args.video_frames)
+        capture = cv2.VideoCapture(video_path)
+        state = vision.new_stream_state()
+        target = target_ids[0]
+        decode, analyze = [], []
+        t0 = time.perf_counter()
+        while True:
+            start = time.perf_counter()
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frame = convert(frame)
+            mid = time.perf_counter()
+            vision.analyze_frame(frame, target, fmt=fmt, state=state)
+            end = time.perf_counter()
+            decode.append((mid - start) * 1000)
+            analyze.append((end - mid) * 1000)
+        elapsed = time.perf_counter() - t0
+        capture.release()
+    report["synthetic_video"] = {
+        "decode": summarize(decode, elapsed),
+        "analyze_frame": summarize(analyze, elapsed),
+        "skip_ratio": round(state.metrics.skipped / state.metrics.frames, 3) if state.metrics.frames else None,
+    }
+    return report
+
+
+# --- AUDIT ---
+
+def bench_audit(args):
+    from agents.auditor_agent import AuditorAgent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        auditor = AuditorAgent(log_dir=os.path.join(tmp, "audit"), legacy_csv=None)
+        entry = {"status": "MATCH", "medicine": "drug_cetirizine", "expected": "drug_cetirizine",
+                 "confidence": 0.91, "count": 1, "source": "benchmark"}
+        dropped_before = auditor.writer.dropped
+
+        t0 = time.perf_counter()
+        enqueue = timed_loop(lambda _: auditor.log_transaction(dict(entry)), range(args.audit_records))
+        auditor.flush()
+        durable_s = time.perf_counter() - t0
+
+        return {
+            "records": args.audit_records,
+            "log_transaction": enqueue,
+            "on_disk_per_sec": round(args.audit_records / durable_s, 1),
+            "flush_wait_ms": round((durable_s - args.audit_records / enqueue["per_sec"]) * 1000, 1),
+            "dropped": auditor.writer.dropped - dropped_before,
+            "stored": auditor.total_records(),
+        }
+
+
+# --- INVENTORY ---
+
+def synthetic_inventory(n_skus, path):
+    doses = ["250mg", "500mg", "650mg", "10mg", "5ml"]
+    db = {
+        f"drug_sku_{i:05d}": {"name": f"Medicine {i:05d}", "dose": doses[i % len(doses)],
+                              "warnings": "Synthetic benchmark entry."}
+        for i in range(n_skus)
+    }
+    with open(path, "w") as f:
+        json.dump(db, f)
+    return db
+
+
+def bench_inventory(args):
+    from tools.inventory import InventoryService
+
+    report = {}
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_skus in args.skus:
+            path = os.path.join(tmp, f"inventory_{n_skus}.json")
+            db = synthetic_inventory(n_skus, path)
+            ids = list(db)
+            names = [info["name"] for info in db.values()]
+            # Mostly hits, some misses, in random order
+            id_keys = [rng.choice(ids) if rng.random() < 0.9 else "drug_unknown" for _ in range(args.lookups)]
+            name_keys = [rng.choice(names) for _ in range(args.lookups)]
+
+            t0 = time.perf_counter()
+            service = InventoryService(path)
+            load_ms = (time.perf_counter() - t0) * 1000
+
+            report[str(n_skus)] = {
+                "load_ms": round(load_ms, 2),
+                "get": timed_loop(service.get, id_keys),
+                "id_for_name": timed_loop(service.id_for_name, name_keys),
+                "contains": timed_loop(service.__contains__, id_keys),
+                "ids_for_dose": timed_loop(service.ids_for_dose, ["500mg"] * min(args.lookups, 1000)),
+            }
+    return report
+
+
+BENCHES = {"vision": bench_vision, "audit": bench_audit, "inventory": bench_inventory}
+
+
+def _child(name, args, conn):
+    os.chdir(BASE_DIR)
+    try:
+        result = BENCHES[name](args)
+    except Exception as e:
+        # A missing model or backend skips the section instead of failing the whole run
+        result = {"error": f"{type(e).__name__}: {e}"}
+    result["peak_rss_mb"] = peak_rss_mb()
+    conn.send(result)
+    conn.close()
+
+
+def run_section(name, args):
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(name, args, child))
+    t0 = time.perf_counter()
+    proc.start()
+    result = parent.recv() if parent.poll(args.timeout) else {"error": "timed out"}
+    proc.join(5)
+    if proc.is_alive():
+        proc.terminate()
+    result["wall_s"] = round(time.perf_counter() - t0, 2)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--backend", choices=["ultralytics", "onnxruntime"], default=None,
+                        help="vision backend (default: PHARMA_VISION_BACKEND)")
+    parser.add_argument("--frame-mode", choices=["fixed", "adaptive"], default=None)
+    parser.add_argument("--image-passes", type=int, default=3, help="times the training images are replayed")
+    parser.add_argument("--video-frames", type=int, default=300)
+    parser.add_argument("--audit-records", type=int, default=50000)
+    parser.add_argument("--skus", type=int, nargs="+", default=[100, 10000])
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--timeout", type=float, default=900, help="seconds per section")
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        "sections": {name: run_section(name, args) for name in SECTIONS if name in args.only},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        out_dir = os.path.dirname(args.out)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Stress test for the shared inference scheduler.
+Spawns N synthetic camera streams that each push frames as fast as the model
+answers, first through the per-stream batch-1 path, then through the
+micro-batching scheduler, and prints aggregate FPS and per-stream latency.
+
+    python benchmarks/stress_streams.py --model models/besttwo.onnx --streams 8
+(the model must be exported with dynamic=True for batches > 1)
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+from tools.onnx_engine import OnnxEngine
+from tools.inference_scheduler import InferenceScheduler
+
+
+def run_streams(detect, n_streams, seconds, height, width):
+    """Each stream calls `detect(frame)` in a loop. Returns per-frame latencies (ms)."""
+    latencies = [[] for _ in range(n_streams)]
+    stop_at = time.perf_counter() + seconds
+
+    def stream(idx):
+        rng = np.random.default_rng(idx)
+        frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            detect(frame)
+            latencies[idx].append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=stream, args=(i,)) for i in range(n_streams)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def summarize(name, latencies, seconds):
+    flat = np.concatenate([np.asarray(lat) for lat in latencies if lat]) if any(latencies) else np.zeros(1)
+    return {
+        "mode": name,
+        "frames": int(flat.size),
+        "aggregate_fps": round(flat.size / seconds, 1),
+        "per_stream_fps": [round(len(lat) / seconds, 1) for lat in latencies],
+        "latency_ms_p50": round(float(np.percentile(flat, 50)), 2),
+        "latency_ms_p95": round(float(np.percentile(flat, 95)), 2),
+        "latency_ms_p99": round(float(np.percentile(flat, 99)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.path.join(BASE_DIR, "models", "besttwo.onnx"))
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--width", type=int, default=1280)
+    args = parser.parse_args()
+
+    report = []
+
+    # 1. BASELINE: every stream runs its own batch-1 call (today's behaviour)
+    single = OnnxEngine(args.model)
+    lat = run_streams(single.detect, args.streams, args.seconds, args.height, args.width)
+    report.append(summarize("batch1_per_stream", lat, args.seconds))
+
+    # 2. SCHEDULER: frames from all streams share one micro-batched call
+    batched = OnnxEngine(args.model, max_batch=args.max_batch)
+    scheduler = InferenceScheduler(batched, max_batch=batched.max_batch, max_wait_ms=args.max_wait_ms)
+    lat = run_streams(scheduler.detect, args.streams, args.seconds, args.height, args.width)
+    result = summarize("scheduler", lat, args.seconds)
+    result["avg_batch_size"] = round(scheduler.frames_run / max(1, scheduler.batches_run), 2)
+    result["dynamic_batch_model"] = batched.dynamic_batch
+    report.append(result)
+    scheduler.stop()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Export stage after training: builds the deployable model variants and gates
+them on accuracy.
+
+For every input size it writes, into models/variants/:
+  best_<size>_fp32.onnx   plain Ultralytics ONNX export
+  best_<size>_ort.onnx    the same graph after ORT's offline graph optimizations
+  best_<size>_int8.onnx   static INT8 (QDQ) quantization calibrated on the dataset/train.txt split
+
+Each variant is then validated with the serving engine (mAP50, mAP50-95 and
+single-frame CPU latency) on the held-out dataset/val.txt split (written by
+run_train.py; never used for training or calibration) and everything is recorded in manifest.json. The
+VisionAgent reads that manifest and serves the fastest variant whose mAP50-95
+is within PHARMA_MAP_BUDGET of the fp32 model at 640, the size deployed
+without a manifest. That reference is exported and validated even when
+--sizes leaves it out; variants without a measured delta are never served.
+
+    python export_models.py --weights runs/detect/runs/pharma/exp_augmented_final3/weights/best.pt
+    python export_models.py --sizes 480 320 --skip-export   # re-validate existing files
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+from tools.model_manifest import MANIFEST_NAME
+from tools.model_validation import (IMAGE_EXTENSIONS, evaluate_map, load_labelled_images, load_labelled_list,
+                                    measure_latency, read_image_list)
+
+DEFAULT_WEIGHTS = os.path.join(BASE_DIR, 'runs', 'detect', 'runs', 'pharma', 'exp_augmented_final3', 'weights', 'best.pt')
+PAD_VALUE = 114
+# Input size of the deployed fp32 model (besttwo.onnx) every variant is gated against
+REFERENCE_SIZE = 640
+
+
+def letterbox_tensor(image, size):
+    """BGR image -> (1, 3, size, size) float32 RGB in [0, 1], padded like the serving engine."""
+    ih, iw = image.shape[:2]
+    r = min(size / ih, size / iw)
+    nh, nw = int(round(ih * r)), int(round(iw * r))
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas = np.full((size, size, 3), PAD_VALUE, dtype=np.uint8)
+    canvas[top:top + nh, left:left + nw] = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(canvas[..., ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def copy_metadata(src_path, dst_path):
+    """ORT rewrites drop the Ultralytics metadata (class names, imgsz); put it back."""
+    import onnx
+
+    src, dst = onnx.load(src_path), onnx.load(dst_path)
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, dst_path)
+
+
+# --- VARIANT BUILDERS ---
+
+def export_fp32(weights, size, dst):
+    from ultralytics import YOLO
+
+    # Ultralytics always writes <weights>.onnx next to the weights; move it before the next size overwrites it
+    exported = YOLO(weights).export(format="onnx", imgsz=size, simplify=True, dynamic=False)
+    shutil.move(exported, dst)
+
+
+def optimize_graph(src, dst):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    # EXTENDED, not ALL: layout-specific (NCHWc) rewrites tie the file to the exporting CPU
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = dst
+    ort.InferenceSession(src, options, providers=["CPUExecutionProvider"])
+    copy_metadata(src, dst)
+
+
+class CalibrationReader:
+    """Feeds letterboxed training images to the static quantizer, one at a time."""
+
+    def __init__(self, image_paths, size, input_name):
+        self.image_paths = image_paths
+        self.size = size
+        self.input_name = input_name
+        self._iter = iter(image_paths)
+
+    def get_next(self):
+        for path in self._iter:
+            image = cv2.imread(path)
+            if image is not None:
+                return {self.input_name: letterbox_tensor(image, self.size)}
+        return None
+
+    def rewind(self):
+        self._iter = iter(self.image_paths)
+
+
+def quantize_int8(src, dst, calibration_paths, size, keep_head_fp32=True):
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared = dst + ".prep.onnx"
+    quant_pre_process(src, prepared, skip_symbolic_shape=True)
+    model = onnx.load(prepared)
+    input_name = model.graph.input[0].name
+    # The Detect head (box decode + class sigmoid) is where INT8 hurts mAP most and saves the least time
+    head = sorted({n.name for n in model.graph.node if n.name.startswith("/model.23/")}) if keep_head_fp32 else []
+
+    try:
+        quantize_static(
+            prepared, dst, CalibrationReader(calibration_paths, size, input_name),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=head,
+        )
+    finally:
+        if os.path.exists(prepared):
+            os.remove(prepared)
+    copy_metadata(src, dst)
+
+
+# --- VALIDATION ---
+
+def validate(path, samples, latency_runs, threads):
+    from tools.onnx_engine import OnnxEngine
+
+    engine = OnnxEngine(path, conf=0.45, threads=threads, cache=False)
+    report = evaluate_map(engine, samples)
+    report.update(measure_latency(engine, [image for image, _, _ in samples], runs=latency_runs))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="trained .pt checkpoint")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[640, 480, 320])
+    parser.add_argument("--out-dir", default=os.path.join(BASE_DIR, "models", "variants"))
+    parser.add_argument("--calibration", default=os.path.join(BASE_DIR, "dataset", "train.txt"),
+                        help="training split list or image directory for INT8 calibration")
+    parser.add_argument("--calibration-images", type=int, default=64, help="images used to calibrate INT8")
+    parser.add_argument("--val-list", default=os.path.join(BASE_DIR, "dataset", "val.txt"),
+                        help="held-out split the accuracy gate is measured on")
+    parser.add_argument("--val-images", default=None, help="image directory to validate on instead of --val-list")
+    parser.add_argument("--val-labels", default=None, help="label directory for --val-images")
+    parser.add_argument("--latency-runs", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=0, help="ORT intra-op threads for the latency pass (0 = all cores)")
+    parser.add_argument("--quantize-head", action="store_true", help="also quantize the Detect head")
+    parser.add_argument("--skip-export", action="store_true", help="only validate files already in --out-dir")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    sizes = sorted(args.sizes, reverse=True)
+    # The gate always compares against the deployed 640 fp32 model, whether or not 640 was requested
+    build_sizes = sizes if REFERENCE_SIZE in sizes else [REFERENCE_SIZE] + sizes
+    if os.path.isdir(args.calibration):
+        calibration_paths = sorted(
+            os.path.join(args.calibration, name) for name in os.listdir(args.calibration)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+    else:
+        calibration_paths = read_image_list(args.calibration)
+    calibration_paths = calibration_paths[:args.calibration_images]
+
+    # 1. BUILD VARIANTS
+    variants = []
+    for size in build_sizes:
+        fp32 = os.path.join(args.out_dir, f"best_{size}_fp32.onnx")
+        builds = (
+            ("fp32", False, fp32, lambda dst: export_fp32(args.weights, size, dst)),
+            ("fp32", True, os.path.join(args.out_dir, f"best_{size}_ort.onnx"),
+             lambda dst: optimize_graph(fp32, dst)),
+            ("int8", False, os.path.join(args.out_dir, f"best_{size}_int8.onnx"),
+             lambda dst: quantize_int8(fp32, dst, calibration_paths, size, not args.quantize_head)),
+        )
+        if size not in sizes:
+            builds = builds[:1]  # Reference only
+        for precision, optimized, path, build in builds:
+            if not args.skip_export:
+                t0 = time.perf_counter()
+                build(path)
+                print(f"built {os.path.basename(path)} in {time.perf_counter() - t0:.1f}s")
+            if os.path.exists(path):
+                variants.append({
+                    "name": os.path.splitext(os.path.basename(path))[0],
+                    "file": os.path.basename(path),
+                    "precision": precision,
+                    "optimized": optimized,
+                    "imgsz": size,
+                    "size_mb": round(os.path.getsize(path) / 2**20, 2),
+                })
+
+    # 2. VALIDATE (same engine, same images, for every variant)
+    if args.val_images:
+        val_source = args.val_images
+        samples = load_labelled_images(args.val_images, args.val_labels or args.val_images.replace("images", "labels"))
+    elif os.path.exists(args.val_list):
+        val_source = args.val_list
+        samples = load_labelled_list(args.val_list)
+    else:
+        sys.exit(f"{args.val_list} not found: run `python run_train.py --prep-only` to write the split")
+    if not samples:
+        sys.exit(f"No labelled images found for {val_source}")
+    for variant in variants:
+        variant.update(validate(os.path.join(args.out_dir, variant["file"]), samples, args.latency_runs, args.threads))
+        print(f"{variant['name']:>20}: mAP50-95 {variant['map50_95']:.4f}  p50 {variant['latency_ms_p50']:.1f} ms")
+
+    # 3. ACCURACY DELTAS AGAINST THE DEPLOYED FP32 MODEL
+    baseline = next((v for v in variants if v["precision"] == "fp32" and not v["optimized"]
+                     and v["imgsz"] == REFERENCE_SIZE), None)
+    if baseline is None:
+        sys.exit(f"best_{REFERENCE_SIZE}_fp32.onnx not found in {args.out_dir}: the accuracy gate needs it "
+                 "(run without --skip-export)")
+    for variant in variants:
+        variant["map_delta"] = round(variant["map50_95"] - baseline["map50_95"], 4)
+        variant["speedup"] = round(baseline["latency_ms_p50"] / variant["latency_ms_p50"], 2)
+
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "weights": os.path.relpath(args.weights, BASE_DIR),
+        "baseline": baseline["name"],
+        "calibration": {"dir": os.path.relpath(args.calibration, BASE_DIR), "images": len(calibration_paths)},
+        "validation": {"dir": os.path.relpath(val_source, BASE_DIR), "images": len(samples)},
+        "cpus": os.cpu_count(),
+        "variants": variants,
+    }
+    manifest_path = os.path.join(args.out_dir, MANIFEST_NAME)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"wrote {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
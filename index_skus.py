@@ -0,0 +1,95 @@
+"""
+Maintains the SKU re-identification index (PHARMA_REID=1 mode).
+Adding a drug is an index insert, not a retrain:
+
+    python index_skus.py add drug_aspirin photos/aspirin_front.jpg photos/aspirin_back.jpg
+    python index_skus.py build                     # every id in dataset/images/train (name_<n>.jpg)
+    python index_skus.py remove drug_aspirin
+    python index_skus.py list
+
+Reference crops come from the YOLO label next to each image when there is
+one (dataset/labels/train), otherwise the whole image is used.
+"""
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+from agents.reid_agent import ReIDAgent
+from brain.batch_pipeline import IMAGE_EXTENSIONS, expected_from_filename
+from tools.inventory import get_inventory
+
+
+def label_box(image_path, image):
+    """First YOLO box from the matching label file, in pixels (or None)."""
+    label_path = image_path.replace(os.sep + "images" + os.sep, os.sep + "labels" + os.sep)
+    label_path = os.path.splitext(label_path)[0] + ".txt"
+    if not os.path.exists(label_path):
+        return None
+    rows = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    if not rows.size:
+        return None
+    h, w = image.shape[:2]
+    _, cx, cy, bw, bh = rows[0]
+    return (cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h
+
+
+def load_references(paths):
+    images, boxes = [], []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is not None:
+            images.append(image)
+            boxes.append(label_box(path, image))
+    return images, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="index reference images for one drug id")
+    add.add_argument("drug_id")
+    add.add_argument("images", nargs="+")
+    add.add_argument("--append", action="store_true", help="keep the drug's existing reference vectors")
+    build = sub.add_parser("build", help="index every drug found in an image folder")
+    build.add_argument("--images", default=os.path.join(BASE_DIR, "dataset", "images", "train"))
+    remove = sub.add_parser("remove", help="drop a drug id from the index")
+    remove.add_argument("drug_id")
+    sub.add_parser("list", help="show indexed drug ids")
+    args = parser.parse_args()
+
+    agent = ReIDAgent()
+    index = agent.index
+
+    if args.command == "add":
+        if args.drug_id not in get_inventory():
+            print(f"warning: {args.drug_id} is not in the inventory file")
+        t0 = time.perf_counter()
+        images, boxes = load_references(args.images)
+        count = agent.add_sku(args.drug_id, images, boxes=boxes, replace=not args.append)
+        print(f"indexed {count} reference(s) for {args.drug_id} in {time.perf_counter() - t0:.2f}s")
+    elif args.command == "build":
+        by_drug = {}
+        for name in sorted(os.listdir(args.images)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                by_drug.setdefault(expected_from_filename(name), []).append(os.path.join(args.images, name))
+        t0 = time.perf_counter()
+        for drug_id, paths in by_drug.items():
+            images, boxes = load_references(paths)
+            print(f"{drug_id}: {agent.add_sku(drug_id, images, boxes=boxes)} reference(s)")
+        print(f"indexed {len(by_drug)} drug(s) in {time.perf_counter() - t0:.1f}s -> {index.root}")
+    elif args.command == "remove":
+        index.remove(args.drug_id)
+        print(f"removed {args.drug_id}")
+    else:
+        print(f"{len(index)} vectors, embedder {index.embedder}")
+        for drug_id in index.ids():
+            print(drug_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Out-of-process inference server for the live scanner.
+
+Runs the ONNX detector in worker processes pinned to their own cores, so
+inference no longer competes with Streamlit reruns and WebRTC threads for
+the app's GIL, and inference capacity is sized independently of UI sessions.
+Frames arrive through each app process's shared-memory ring; only slot
+references cross the socket.
+
+    export PHARMA_INFERENCE_KEY=$(openssl rand -hex 32)  # shared secret, required on both sides
+    python inference_server.py --workers 4               # 4 workers, cores split evenly
+    PHARMA_VISION_BACKEND=server streamlit run main.py   # app side
+
+Connections carry pickled messages: keep the server on 127.0.0.1 (the
+default), a unix socket path, or a private network, never a public interface.
+
+The app and the server must share /dev/shm (same host, or the same IPC
+namespace in Docker; see docker-compose.yml).
+"""
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+from tools.inference_server import INFERENCE_ADDR, InferenceServer
+from tools.model_manifest import MANIFEST_NAME, select_variant
+
+
+def default_model():
+    """Same resolution as VisionAgent: Docker path first, then a faster variant within the mAP budget."""
+    model_path = "/app/models/besttwo.onnx"
+    if not os.path.exists(model_path):
+        model_path = os.path.join(BASE_DIR, "models", "besttwo.onnx")
+    manifest = os.environ.get("PHARMA_MODEL_MANIFEST")
+    if manifest is None:
+        manifest = os.path.join(os.path.dirname(model_path), "variants", MANIFEST_NAME)
+    variant = select_variant(manifest, float(os.environ.get("PHARMA_MAP_BUDGET", "0.01")))
+    return variant["path"] if variant else model_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="ONNX model (default: besttwo.onnx or its best variant)")
+    parser.add_argument("--address", default=INFERENCE_ADDR, help="host:port or unix socket path to listen on")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("PHARMA_INFERENCE_WORKERS", "2")))
+    parser.add_argument("--cores-per-worker", type=int, default=None, help="default: available cores / workers")
+    parser.add_argument("--max-batch", type=int, default=int(os.environ.get("PHARMA_MAX_BATCH", "4")),
+                        help="frames per ORT call (needs a dynamic-batch export, otherwise 1)")
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.environ.get("PHARMA_BATCH_WAIT_MS", "5")))
+    args = parser.parse_args()
+
+    server = InferenceServer(args.model or default_model(), args.address, workers=args.workers,
+                             cores_per_worker=args.cores_per_worker, max_batch=args.max_batch,
+                             max_wait_ms=args.max_wait_ms)
+    info = server.start()
+    print(f"inference server on {args.address}: {info['workers']} worker(s), cores {info['cores']}, "
+          f"{len(info['names'])} classes")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
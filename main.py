@@ -1,13 +1,7 @@
 import streamlit as st
-import json
-import numpy as np
-import cv2
 import sys
 import os
-import av
-import pandas as pd
 from datetime import datetime
-from streamlit_webrtc import webrtc_streamer, WebRtcMode
 import time
 
 # 1. INITIALIZATION & PATH FIXING
@@ -16,7 +10,8 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Ensure 'src' is in the path for both local and Docker
 sys.path.append(os.path.join(BASE_DIR, 'src'))
-from brain.orchestrator import Orchestrator
+# Stdlib-only: everything heavy (cv2, av, pandas, onnxruntime, torch) is imported after the PIN gate
+from tools import startup
 
 st.set_page_config(page_title="PharmaAgent | AI Scanner", page_icon="🛡️", layout="wide")
 
@@ -27,6 +22,16 @@ def get_path(relative_path):
 # --- CONFIGURATION ---
 TIMEOUT_SECONDS = 600  # 10 minutes (600 seconds)
 DEMO_PIN = "9@26"
+# Async mode: recv() never waits on inference, it returns the latest annotated frame
+ASYNC_PIPELINE = os.environ.get("PHARMA_ASYNC_PIPELINE", "0") == "1"
+
+def _warm_up():
+    # Runs on a background thread: imports the agents, loads the model, runs one inference
+    from brain.orchestrator import warm_up
+    warm_up()
+
+# Model load + warm-up start with the first page view and overlap with the PIN entry
+startup.start_warmup(_warm_up)
 
 # 1. INITIALIZE SESSION STATE
 if "authenticated" not in st.session_state:
@@ -60,48 +65,68 @@ if not st.session_state["authenticated"]:
             st.rerun()
         else:
             st.error("Invalid PIN")
+    startup.mark("pin_page_ms")
     st.stop()
     
+# Heavy imports, deferred until the user is actually past the login page
+_imports_start = time.perf_counter()
+import av
+import pandas as pd
+from streamlit_webrtc import webrtc_streamer, WebRtcMode
+from brain.orchestrator import get_orchestrator
+from brain.live_pipeline import AsyncFramePipeline
+from tools.inventory import get_inventory
+from tools.metrics import registry, start_metrics_server
+startup.record("post_login_imports_ms", (time.perf_counter() - _imports_start) * 1000)
+
 # 3. LOAD DATA & AI ENGINE
-# Updated to use dynamic paths for inventory and history
+# Updated to use dynamic paths for inventory
 inventory_path = get_path('data/inventory.json')
-history_file = get_path('data/history.json')
 
-with open(inventory_path, 'r') as f:
-    med_data = json.load(f)
+# Shared per-process inventory: parsed once, re-read only when the file changes
+med_data = get_inventory(inventory_path)
 
-brain = Orchestrator()
+# Shared across reruns and sessions: agents and models are only built once per process
+if not startup.warmup_done():
+    with st.spinner("Loading AI engine..."):
+        startup.wait_for_warmup()
+brain = get_orchestrator()
+
+# Prometheus scrape endpoint (GET :8502/metrics), started once per process
+try:
+    start_metrics_server()
+except OSError:
+    pass  # Port taken (e.g. a second app process); the Ops tab still works
 
 # 4. SIDEBAR LOGIC & LIVE AUDIT VIEW
 with st.sidebar:
     st.title("🛡️ PharmaGuard")
     st.divider()
-    selected_name = st.selectbox("Current Task", options=[v['name'] for v in med_data.values()])
-    target_id = next(k for k, v in med_data.items() if v['name'] == selected_name)
+    selected_name = st.selectbox("Current Task", options=med_data.names())
+    target_id = med_data.id_for_name(selected_name)
     
     st.divider()
     st.subheader("📋 Recent Detections")
     
-    if os.path.exists(history_file):
-        try:
-            with open(history_file, 'r') as f:
-                history_data = json.load(f)
-            
-            if history_data:
-                df_side = pd.DataFrame(history_data)
-                st.table(df_side[['timestamp', 'medicine', 'confidence']].iloc[::-1].head(5))
-                
-                csv = df_side.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label="📥 Export History (CSV)",
-                    data=csv,
-                    file_name=f"pharma_audit_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv",
-                )
-            else:
-                st.info("No detections yet.")
-        except Exception as e:
-            st.error(f"Log Error: {e}")
+    # Served from the auditor's in-memory ring buffer, never from the ledger files
+    try:
+        recent = brain.auditor.recent(5)
+        if recent:
+            df_side = pd.DataFrame(recent)
+            # Order verdicts carry no confidence: those cells stay empty instead of failing the table
+            st.table(df_side.reindex(columns=['Timestamp', 'medicine', 'status', 'confidence']))
+
+            csv = pd.DataFrame(brain.auditor.recent()).to_csv(index=False).encode('utf-8')
+            st.download_button(
+                label="📥 Export Recent (CSV)",
+                data=csv,
+                file_name=f"pharma_recent_{datetime.now().strftime('%Y%m%d')}.csv",
+                mime="text/csv",
+            )
+        else:
+            st.info("No detections yet.")
+    except Exception as e:
+        st.error(f"Log Error: {e}")
     
     st.divider()
     if st.button("Logout", use_container_width=True):
@@ -116,33 +141,87 @@ selected_id = st.sidebar.selectbox("Select Drug:", options=["drug_crocin_advance
 # In main.py, ensure your VideoProcessor looks like this:
 
 class VideoProcessor:
-    def __init__(self, orchestrator):
+    def __init__(self, orchestrator, target_id):
         self.orchestrator = orchestrator
+        # Per-stream state: frame counter, last detection and tracker are never shared
+        self.state = orchestrator.new_stream()
+        # Updated from the script thread on every rerun (recv cannot read st.session_state)
+        self.target_id = target_id
+        # Order mode: {drug_id: qty} verified in one unfiltered pass per frame (None = single target)
+        self.order = None
+        self.last_order_result = None
+        # Ask PyAV for the layout the model wants, so the frame is never re-converted
+        self.fmt = orchestrator.vision.input_format
+        self.pipeline = AsyncFramePipeline(self._process) if ASYNC_PIPELINE else None
+
+    def _process(self, img, current_target):
+        # Pass to orchestrator -> vision_agent (overlays are drawn in place on img)
+        if isinstance(current_target, dict):
+            result = self.orchestrator.process_live_order(img, current_target, self.fmt, self.state)
+            self.last_order_result = result
+        else:
+            result = self.orchestrator.process_live_stream(img, current_target, self.fmt, self.state)
+        return result.get("annotated_frame", img)
 
     def recv(self, frame):
-        img = frame.to_ndarray(format="rgb24")
+        start = time.perf_counter()
+        img = frame.to_ndarray(format=self.fmt)
+        self.state.metrics.observe("decode", (time.perf_counter() - start) * 1000)
         
-        # DYNAMIC UPDATE: Get the dropdown selection from the UI in real-time
-        # This matches the 'key' used in your st.selectbox
-        current_target = st.session_state.get("active_med_task", "drug_crocin_advance")
+        # DYNAMIC UPDATE: the dropdown selection is pushed in by the script on each rerun
+        current_target = self.order or self.target_id
         
-        # Pass to orchestrator -> vision_agent
-        result = self.orchestrator.process_live_stream(img, current_target)
-        
-        output_img = result.get("annotated_frame", img)
-        return av.VideoFrame.from_ndarray(output_img, format="rgb24")
+        if self.pipeline is None:
+            output_img = self._process(img, current_target)
+        else:
+            # Hand off to the worker (stale frames get dropped) and show the newest result
+            self.pipeline.submit(img, current_target)
+            output_img = self.pipeline.latest()
+            if output_img is None:
+                output_img = img
+        out_frame = av.VideoFrame.from_ndarray(output_img, format=self.fmt)
+        self.state.metrics.observe("total", (time.perf_counter() - start) * 1000)
+        return out_frame
+
+    def on_ended(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        self.orchestrator.end_stream(self.state)
 
 # UI Implementation
-t1, t2, t3 = st.tabs(["⚡ Live Inspection", "📊 Historical Audit", "📘 Guide"])
+t1, t2, t3, t4 = st.tabs(["⚡ Live Inspection", "📊 Historical Audit", "📘 Guide", "🩺 Ops Panel"])
 
 with t1:
     st.header(f"Inspecting: {st.session_state.active_med}")
     
-    webrtc_streamer(
+    active_target = st.session_state.active_med
+
+    # Whole-tray mode: every listed SKU is counted and checked in the same frame
+    with st.expander("🧾 Order Mode (verify a whole tray)"):
+        order_names = st.multiselect("Order items", options=med_data.names(), key="order_items")
+        active_order = {
+            med_data.id_for_name(name): st.number_input(f"Qty: {name}", min_value=1, value=1, step=1, key=f"qty_{name}")
+            for name in order_names
+        }
+        patient_meds = [
+            med_data.id_for_name(name)
+            for name in st.multiselect("Patient's current medicines", options=med_data.names(), key="patient_meds")
+        ]
+        # Precomputed interaction tables: a whole-order screen is sub-millisecond, so it runs on every rerun
+        if active_order:
+            screen = brain.safety.check_interactions(list(active_order), patient_meds)
+            if screen["status"] == "SAFE":
+                st.success("No interactions between the order items or with the patient's medicines.")
+            else:
+                (st.error if screen["status"] == "DANGER" else st.warning)(screen["msg"])
+                for hit in screen["interactions"]:
+                    suffix = " (patient's current medicine)" if hit["patient_med"] else ""
+                    st.markdown(f"- **{hit['severity'].upper()}** {hit['drug_a']} + {hit['drug_b']}{suffix}: {hit['effect']}")
+    webrtc_ctx = webrtc_streamer(
         key="pharma-scanner",
         mode=WebRtcMode.SENDRECV,
-        # We pass the 'brain' (orchestrator) but NOT the target_id directly here
-        video_processor_factory=lambda: VideoProcessor(brain),
+        # The shared 'brain' plus this session's current selection
+        video_processor_factory=lambda: VideoProcessor(brain, active_target),
         rtc_configuration={
             "iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]
         },
@@ -150,81 +229,112 @@ with t1:
         async_processing=True,
     )
 
+    # Keep the running stream in sync with the dropdown of *this* session
+    if webrtc_ctx.video_processor:
+        webrtc_ctx.video_processor.target_id = active_target
+        webrtc_ctx.video_processor.order = active_order or None
+
+    # Per-item verdicts from the latest order-mode frame (refreshed on each rerun)
+    if webrtc_ctx.video_processor and active_order and webrtc_ctx.video_processor.last_order_result:
+        order_result = webrtc_ctx.video_processor.last_order_result
+        with st.expander("📦 Order Status", expanded=True):
+            st.dataframe(pd.DataFrame(order_result.get("items", [])), use_container_width=True, hide_index=True)
+            if order_result.get("unexpected"):
+                st.error(f"Not on the order: {', '.join(i['drug_id'] for i in order_result['unexpected'])}")
+
+    # Pipeline health for sizing hardware per counter (async mode only)
+    if webrtc_ctx.video_processor and webrtc_ctx.video_processor.pipeline:
+        with st.expander("⏱️ Pipeline Stats"):
+            st.json(webrtc_ctx.video_processor.pipeline.stats())
+
+    # Expiry OCR latency / cache effectiveness (PHARMA_LIVE_OCR=1 only)
+    if webrtc_ctx.video_processor and webrtc_ctx.video_processor.state.ocr:
+        with st.expander("🔎 Expiry OCR Stats"):
+            st.json(webrtc_ctx.video_processor.state.ocr.stats())
+
 with t2:
     st.header("📊 Global Audit Ledger")
     
-    # 1. Use caching with clear capability to ensure fresh data
-    @st.cache_data(show_spinner=False)
-    def load_fresh_logs(path):
-        if os.path.exists(path):
-            return pd.read_csv(path, on_bad_lines='skip')
-        return None
-
-    log_path = get_path('data/logs/audit_trail.csv')
-
-    # 2. Refresh Button for the "Simple Man"
+    # 1. Refresh Button for the "Simple Man" (flushes queued records to the ledger)
     if st.button("🔄 Check for New Detections"):
-        load_fresh_logs.clear()
+        brain.auditor.flush()
         st.rerun()
 
-    if os.path.exists(log_path):
-        try:
-            df = load_fresh_logs(log_path)
+    try:
+        total_rows = brain.auditor.total_records()
+        
+        if total_rows:
+            # --- LIVE SUMMARY (running counters kept by the audit writer) ---
+            summary = brain.auditor.summary(hours=24)
+            per_hour = summary["per_hour"]
+            mismatches = summary["statuses"].get("DANGER", 0)
+            col_s1, col_s2, col_s3 = st.columns(3)
+            col_s1.metric("Total Scans", summary["total"])
+            this_hour = datetime.now().strftime("%Y-%m-%d %H")
+            col_s2.metric("Scans (this hour)", next((h["scans"] for h in per_hour if h["hour"] == this_hour), 0))
+            col_s3.metric("Mismatch Rate", f"{mismatches / summary['total']:.1%}")
+            if per_hour:
+                st.bar_chart(pd.DataFrame(per_hour).set_index("hour")[["scans", "mismatches"]])
+            with st.expander("Mismatch rate per drug"):
+                st.dataframe(pd.DataFrame(summary["per_drug"]), use_container_width=True, hide_index=True)
+
+            # --- PAGINATION LOGIC START ---
+            # Pages are served newest-first straight from the segment index
+            col_p1, col_p2, col_p3, col_p4 = st.columns([2, 2, 2, 3])
+            with col_p1:
+                rows_per_page = st.selectbox("Rows per page", options=[10, 20, 50, 100], index=0)
+            with col_p2:
+                medicine_filter = st.selectbox("Medicine", options=["All"] + med_data.ids())
+            
+            # Filtered: pages over that medicine's rows only (counted from the manifest)
+            filtered_rows = total_rows if medicine_filter == "All" else brain.auditor.medicine_records(medicine_filter)
+            total_pages = max(1, (filtered_rows - 1) // rows_per_page + 1)
+            
+            with col_p3:
+                current_page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, value=1)
             
-            if df is not None and not df.empty:
-                # --- PAGINATION LOGIC START ---
-                # Reverse to show newest results first
-                df_display = df.iloc[::-1].reset_index(drop=True)
-                
-                # Pagination Controls
-                col_p1, col_p2, col_p3 = st.columns([2, 2, 3])
-                with col_p1:
-                    rows_per_page = st.selectbox("Rows per page", options=[10, 20, 50, 100], index=0)
-                
-                total_rows = len(df_display)
-                total_pages = max(1, (total_rows - 1) // rows_per_page + 1)
-                
-                with col_p2:
-                    current_page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, value=1)
-                
-                with col_p3:
-                    st.markdown(f"**Total Records:** {total_rows} | **Page:** {current_page}/{total_pages}")
-
-                # Slice the dataframe for the current page
-                start_idx = (current_page - 1) * rows_per_page
-                end_idx = start_idx + rows_per_page
-                paginated_df = df_display.iloc[start_idx:end_idx]
-
-                # Display the Paginated Table
-                st.dataframe(paginated_df, use_container_width=True, hide_index=True)
-                # --- PAGINATION LOGIC END ---
-
-                # Actions Row
-                col1, col2 = st.columns(2)
-                with col1:
-                    csv_download = df.to_csv(index=False).encode('utf-8')
-                    st.download_button(
-                        label="📥 Download CSV Audit Report",
-                        data=csv_download,
-                        file_name=f"pharma_audit_report_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv"
-                    )
-                
-                with col2:
-                    if st.button("🗑️ Reset Audit Ledger"):
-                        os.makedirs(os.path.dirname(log_path), exist_ok=True)
-                        with open(log_path, "w") as f:
-                            f.write("Result,Inspection Notes,Time,AI Certainty\n")
-                        load_fresh_logs.clear()
-                        st.rerun()
+            with col_p4:
+                st.markdown(f"**Total Records:** {filtered_rows} | **Page:** {current_page}/{total_pages}")
+
+            if medicine_filter == "All":
+                page_rows = brain.auditor.newest_page(current_page, rows_per_page)
             else:
-                st.info("Log file is currently empty.")
+                page_rows = brain.auditor.query_medicine(medicine_filter, limit=rows_per_page, page=current_page)
 
-        except Exception as e:
-            st.error(f"⚠️ Error loading audit logs: {e}")
-            st.info(f"Diagnostic Path: {log_path}")
-    else:
-        st.warning("No audit records found. Detected medicines will appear here automatically.")
+            # Display the Paginated Table
+            st.dataframe(pd.DataFrame(page_rows), use_container_width=True, hide_index=True)
+            # --- PAGINATION LOGIC END ---
+
+            # Actions Row
+            col1, col2 = st.columns(2)
+            with col1:
+                # Export streams segment by segment to disk, only when asked for
+                if st.button("📄 Prepare CSV Audit Report"):
+                    export_path = get_path(f"data/logs/exports/pharma_audit_report_{datetime.now().strftime('%Y%m%d')}.csv")
+                    os.makedirs(os.path.dirname(export_path), exist_ok=True)
+                    st.session_state["audit_export"] = brain.auditor.export_csv(export_path)
+
+                export_path = st.session_state.get("audit_export")
+                if export_path and os.path.exists(export_path):
+                    with open(export_path, "rb") as f:
+                        st.download_button(
+                            label="📥 Download CSV Audit Report",
+                            data=f,
+                            file_name=os.path.basename(export_path),
+                            mime="text/csv"
+                        )
+            
+            with col2:
+                if st.button("🗑️ Reset Audit Ledger"):
+                    brain.auditor.reset_ledger()
+                    st.session_state.pop("audit_export", None)
+                    st.rerun()
+        else:
+            st.warning("No audit records found. Detected medicines will appear here automatically.")
+
+    except Exception as e:
+        st.error(f"⚠️ Error loading audit logs: {e}")
+        st.info(f"Diagnostic Path: {brain.auditor.log_dir}")
 
 
 with t3:
@@ -234,4 +344,28 @@ with t3:
     - **Step 2:** Click 'START' on the Live Inspection tab.
     - **Step 3:** Align the medicine strip. A **Green Box** confirms a match.
     - **Step 4:** Verified detections (>80% confidence) are logged automatically.
-    """)
\ No newline at end of file
+    """)
+
+with t4:
+    st.header("🩺 Pipeline Metrics")
+    st.caption("Rolling per-stage latency per stream. Prometheus scrape: GET :8502/metrics")
+    if st.button("🔄 Refresh Metrics"):
+        st.rerun()
+    with st.expander("🚀 Startup Timings (ms)"):
+        st.json(startup.timings())
+    if brain.vision.backend == "server":
+        with st.expander("🖥️ Inference Server"):
+            st.json(brain.vision.scheduler.stats())
+    # Only once something has used OCR; importing the engine here would load Tesseract bindings for nothing
+    ocr_engine = sys.modules.get("tools.ocr_engine")
+    ocr_pool = ocr_engine.pool_stats() if ocr_engine else None
+    if ocr_pool:
+        with st.expander("🔤 OCR Engine"):
+            if not ocr_pool["persistent_workers"]:
+                st.warning("tesserocr is not installed: every OCR read spawns a tesseract process (pytesseract fallback).")
+            st.json(ocr_pool)
+    stream_rows = registry.snapshot()
+    if stream_rows:
+        st.dataframe(pd.DataFrame(stream_rows), use_container_width=True, hide_index=True)
+    else:
+        st.info("No active streams. Start a scan on the Live Inspection tab.")
\ No newline at end of file
@@ -1,25 +1,74 @@
-from ultralytics import YOLO
-import torch
+"""
+Training prep + training for the detector.
+
+Prep (fast when nothing changed):
+  1. dataset/data.yaml is generated from the inventory (class order = inventory order)
+  2. dataset/images/train is split deterministically into dataset/train.txt / dataset/val.txt
+  3. every image is decoded once into a memory-mapped uint8 cache under dataset/cache/
+
+Training then reads the cache with parallel DataLoader workers instead of
+decoding JPEGs on the main process every epoch.
+
+    python run_train.py                          # prep + train (GPU 0 if available)
+    python run_train.py --prep-only
+    python run_train.py --device cpu --workers 4 --epochs 50
+"""
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+from tools.training_cache import build_image_cache, class_names, split_dataset, write_data_yaml, write_split
+
+DATASET_DIR = os.path.join(BASE_DIR, "dataset")
+
+
+def prepare(inventory, imgsz, val_fraction, workers):
+    """Returns (data.yaml path, {"train": cache path, "val": cache path})."""
+    names = class_names(inventory)
+    train, val = split_dataset(os.path.join(DATASET_DIR, "images", "train"), val_fraction)
+    train_list, val_list = os.path.join(DATASET_DIR, "train.txt"), os.path.join(DATASET_DIR, "val.txt")
+    write_split(train, train_list)
+    write_split(val, val_list)
+    data_yaml = os.path.join(DATASET_DIR, "data.yaml")
+    write_data_yaml(data_yaml, train_list, val_list, names)
+
+    caches = {}
+    for mode, paths in (("train", train), ("val", val)):
+        caches[mode] = os.path.join(DATASET_DIR, "cache", f"{mode}_{imgsz}.npy")
+        build_image_cache(paths, caches[mode], imgsz, workers)
+    print(f"{len(names)} classes, {len(train)} train / {len(val)} val images, cache -> {os.path.dirname(caches['train'])}")
+    return data_yaml, caches
+
+
+def train_pharma_brain(args, data_yaml, caches):
+    import torch
+    from ultralytics import YOLO
+    from tools.cached_training import CachedDetectionTrainer
 
-def train_pharma_brain():
     # 1. Clear memory before starting
-    torch.cuda.empty_cache()
-    
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    CachedDetectionTrainer.cache_paths = caches
+
     # Using the latest YOLOv11 nano for best performance
-    model = YOLO('yolo11n.pt') 
+    model = YOLO('yolo11n.pt')
 
     # 2. STRATEGIC AUGMENTATION FOR MEDICINE DETECTION
     model.train(
-        data='dataset/data.yaml', 
-        epochs=100,               # 100 epochs is vital for small datasets
-        imgsz=640,                # INCREASED to 640 to capture tiny pill text
-        batch=4,                  # Keep low for your GTX 1660 Ti VRAM
-        device=0,       
-        workers=0,                
+        trainer=CachedDetectionTrainer,
+        data=data_yaml,
+        epochs=args.epochs,       # 100 epochs is vital for small datasets
+        imgsz=args.imgsz,         # 640 to capture tiny pill text
+        batch=args.batch,         # Keep low for a GTX 1660 Ti's VRAM
+        device=args.device,
+        workers=args.workers,     # Loaders only slice the memmap, so these scale with cores
+        cache=False,              # dataset/cache/ already holds the decoded images
         amp=False,                # Keep disabled for 1660 Ti stability
-        project='runs/pharma',    
+        project='runs/pharma',
         name='exp_augmented_final',
-        
+
         # --- THE MEDICINE-FIXER SETTINGS ---
         augment=True,             # Enable standard variations
         hsv_h=0.015,              # Shifts colors (detects Crocin even in yellow light)
@@ -34,5 +83,24 @@ def train_pharma_brain():
         copy_paste=0.1            # Pastes pills onto different backgrounds
     )
 
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inventory", default=os.path.join(BASE_DIR, "data", "inventory_all.json"),
+                        help="class order; must match the inventory scraper.py labelled with")
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--device", default=None, help="'0', 'cpu', ... (default: GPU 0 if available)")
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument("--prep-only", action="store_true")
+    args = parser.parse_args()
+
+    data_yaml, caches = prepare(args.inventory, args.imgsz, args.val_fraction, args.workers)
+    if not args.prep_only:
+        train_pharma_brain(args, data_yaml, caches)
+
+
 if __name__ == '__main__':
-    train_pharma_brain()
\ No newline at end of file
+    main()
@@ -1,58 +1,59 @@
+"""
+Dataset collection for the detector: fetches product images per SKU
+concurrently and ingests them into dataset/images/train + dataset/labels/train.
+
+Reruns are incremental (dataset/manifest.json keys every source file by
+content hash), near-duplicate photos are dropped per SKU, images are stored
+at training resolution, and existing data is never wiped.
+
+    python scraper.py                                   # Bing image search, data/inventory_all.json
+    python scraper.py --source local --source-dir photos/ --only drug_crocin_advance
+
+Label class indices follow the inventory order, so use the same inventory
+as run_train.py (both default to data/inventory_all.json).
+"""
+import argparse
 import json
 import os
-import shutil
-import time
-import re
-from pathlib import Path
-from bing_image_downloader import downloader
+import sys
 
-# --- CRITICAL FIX FOR WINDOWS ---
-Path.isdir = lambda self: os.path.isdir(self) # Fixes Path object bug
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+from tools.dataset_builder import BingSource, DatasetBuilder, LocalDirSource
 
 # --- CONFIGURATION ---
 BASE_IMG_DIR = "dataset/images/train"
 BASE_LBL_DIR = "dataset/labels/train"
 TEMP_DIR = "dataset/temp_download"
 
-def sanitize_folder_name(name):
-    """Removes all Windows illegal characters: < > : " / \ | ? *"""
-    return re.sub(r'[<>:"/\\|?*]', ' ', name).strip()
-
-def setup_environment():
-    """Safely cleans directories."""
-    print("Setting up folders...")
-    for p in [BASE_IMG_DIR, BASE_LBL_DIR, TEMP_DIR]:
-        if os.path.exists(p):
-            try: shutil.rmtree(p)
-            except: pass
-        os.makedirs(p, exist_ok=True)
-
-def move_and_label(query_folder, drug_key, class_index):
-    """Unique rename and YOLO label generation."""
-    if not os.path.exists(query_folder): return
-    files = [f for f in os.listdir(query_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-    for i, filename in enumerate(files):
-        unique_name = f"{drug_key}_{i+1}{os.path.splitext(filename)[1]}"
-        try:
-            shutil.move(os.path.join(query_folder, filename), os.path.join(BASE_IMG_DIR, unique_name))
-            with open(os.path.join(BASE_LBL_DIR, f"{drug_key}_{i+1}.txt"), "w") as f:
-                f.write(f"{class_index} 0.5 0.5 0.8 0.8")
-        except: continue
-
-def collect_images(drug_data):
-    class_names = list(drug_data.keys())
-    for idx, key in enumerate(class_names):
-        info = drug_data[key]
-        # Sanitize for folder creation safety
-        query = sanitize_folder_name(f"{info['name']} {info['dose']} medicine packaging")
-        print(f"[{idx+1}/{len(class_names)}] Downloading: {key}")
-        try:
-            downloader.download(query, limit=15, output_dir=TEMP_DIR, adult_filter_off=True, force_replace=True, verbose=False)
-            move_and_label(os.path.join(TEMP_DIR, query), key, idx)
-        except Exception as e: print(f"⚠️ Error: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inventory", default=os.path.join(BASE_DIR, "data", "inventory_all.json"),
+                        help="must match run_train.py --inventory (label class order)")
+    parser.add_argument("--source", choices=["bing", "local"], default="bing")
+    parser.add_argument("--source-dir", default=TEMP_DIR, help="local source: one folder per drug id")
+    parser.add_argument("--limit", type=int, default=15, help="bing source: images per SKU")
+    parser.add_argument("--only", nargs="+", help="drug ids to (re)collect (default: all)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--imgsz", type=int, default=640, help="long side images are stored at")
+    parser.add_argument("--max-distance", type=int, default=6, help="pHash bits within which an image is a duplicate")
+    args = parser.parse_args()
+
+    with open(args.inventory, 'r') as f:
+        data = json.load(f)
+    source = LocalDirSource(args.source_dir) if args.source == "local" else BingSource(TEMP_DIR, args.limit)
+    builder = DatasetBuilder(data, source, BASE_IMG_DIR, BASE_LBL_DIR, imgsz=args.imgsz,
+                             workers=args.workers, max_distance=args.max_distance)
+
+    def progress(drug_id, stats):
+        print(f"{drug_id}: +{stats['added']} new, {stats['known']} known, "
+              f"{stats['duplicate']} duplicates, {stats['error']} errors")
+
+    report = builder.build(args.only, progress)
+    added = sum(s["added"] for s in report.values())
+    print(f"\n✅ DATA COLLECTION DONE ({added} new images). RUN 'py run_train.py' NOW!")
+
 
 if __name__ == "__main__":
-    with open('data/inventory.json', 'r') as f: data = json.load(f)
-    setup_environment()
-    collect_images(data)
-    print("\n✅ DATA COLLECTION DONE. RUN 'py run_train.py' NOW!")
\ No newline at end of file
+    main()
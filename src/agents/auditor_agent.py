@@ -1,43 +1,91 @@
 import os
-import pandas as pd
 from datetime import datetime
 import uuid
+from tools.audit_writer import get_audit_writer
 
 class AuditorAgent:
-    def __init__(self, log_path="data/logs/audit_trail.csv"):
-        self.log_path = log_path
+    def __init__(self, log_dir="data/logs/audit", legacy_csv="data/logs/audit_trail.csv"):
+        self.log_dir = log_dir
+        # One shared background writer per ledger directory (safe across sessions)
+        self.writer = get_audit_writer(log_dir)
+        self.store = self.writer.store
+
+        # One-time migration of the old single-file ledger into daily segments
+        if legacy_csv and os.path.exists(legacy_csv) and self.store.total_records() == 0:
+            self.store.import_csv(legacy_csv)
+            os.replace(legacy_csv, legacy_csv + ".migrated")
+            # Imported straight into the store, so the aggregates read it from the segments once
+            self.writer.aggregates.refresh(force=True)
 
     def log_transaction(self, entry_data):
         """
         Records the agentic decision into an immutable CSV ledger.
+        Only enqueues the record; the shared AuditWriter group-commits it to disk.
         """
         try:
-            # 1. ENSURE DIRECTORY INTEGRITY [cite: 99]
-            log_dir = os.path.dirname(self.log_path)
-            if log_dir and not os.path.exists(log_dir):
-                os.makedirs(log_dir, exist_ok=True)
-            
-            # 2. ENRICH DATA FOR AUDIT COMPLIANCE
+            # 1. ENRICH DATA FOR AUDIT COMPLIANCE
             # Add Timestamp and a unique ID for every scan
             enriched_data = {
                 "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "Transaction_ID": str(uuid.uuid4())[:8],
+                "Transaction_ID": uuid.uuid4().hex[:8],
                 **entry_data # Merge with the original scan result
             }
             
-            # 3. APPEND TO PERMANENT STORAGE [cite: 61]
-            df = pd.DataFrame([enriched_data])
-            df.to_csv(
-                self.log_path, 
-                mode='a', 
-                index=False, 
-                header=not os.path.exists(self.log_path)
-            )
+            # 2. APPEND TO PERMANENT STORAGE (non-blocking, batched by the writer thread)
+            if not self.writer.submit(enriched_data):
+                return {"status": "LOG_ERROR", "msg": "Audit queue full, record dropped."}
             
-            # 4. RETURN CONFIRMATION TO ORCHESTRATOR 
+            # 3. RETURN CONFIRMATION TO ORCHESTRATOR 
             # Include the enriched data so the UI can show the Timestamp
             return enriched_data
 
         except Exception as e:
             # Fallback to prevent app crash
-            return {"status": "LOG_ERROR", "msg": str(e)}
\ No newline at end of file
+            return {"status": "LOG_ERROR", "msg": str(e)}
+
+    def flush(self):
+        """Blocks until every queued record is on disk (e.g. before exporting)."""
+        self.writer.flush()
+
+    def reset_ledger(self):
+        self.writer.reset()
+
+    # --- QUERY API (served from segment sidecars, never the whole history) ---
+
+    def total_records(self):
+        return self.writer.aggregates.total()
+
+    # --- DASHBOARD (materialized aggregates, constant time whatever the ledger size) ---
+
+    def recent(self, n=5):
+        """Latest `n` records, newest first (slim: timestamp, medicine, status, confidence...)."""
+        return self.writer.aggregates.recent_records(n)
+
+    def summary(self, hours=24):
+        """Scans per hour, per-status totals and mismatch rate per drug."""
+        return self.writer.aggregates.summary(hours)
+
+    def newest_page(self, page=1, rows_per_page=10):
+        return self.store.newest_page(page, rows_per_page)
+
+    def query_range(self, start, end):
+        """`start`/`end` are datetimes or 'YYYY-MM-DD HH:MM:SS' strings."""
+        fmt = "%Y-%m-%d %H:%M:%S"
+        start = start.strftime(fmt) if isinstance(start, datetime) else start
+        end = end.strftime(fmt) if isinstance(end, datetime) else end
+        return list(self.store.query_range(start, end))
+
+    def medicine_records(self, medicine):
+        return self.store.medicine_records(medicine)
+
+    def query_medicine(self, medicine, limit=50, page=1):
+        """Page N (1-based, `limit` rows each) of one medicine's records, newest first."""
+        return list(self.store.query_medicine(medicine, limit, offset=(page - 1) * limit))
+
+    def find_transaction(self, transaction_id):
+        return self.store.find_transaction(transaction_id)
+
+    def export_csv(self, out_path):
+        """Streams every segment into one CSV file (for download), row by row."""
+        self.flush()
+        return self.store.export_csv(out_path)
\ No newline at end of file
@@ -1,21 +1,150 @@
-import pytesseract
-import re
+import threading
+import time
+from collections import deque
 from datetime import datetime
+import cv2
 from PIL import Image
+from tools.label_parser import parse_label
+from tools.ocr_engine import get_tesseract_pool
+
+def preprocess_roi(frame, box, fmt="rgb24", inset=4, min_height=64):
+    """Crops the detected strip (inside the drawn overlay) and binarizes it for Tesseract."""
+    x1, y1, x2, y2 = box
+    roi = frame[max(0, y1 + inset):max(0, y2 - inset), max(0, x1 + inset):max(0, x2 - inset)]
+    if roi.size == 0:
+        return None
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY if fmt == "bgr24" else cv2.COLOR_RGB2GRAY)
+    # Small strips: upscale so the printed text reaches Tesseract's preferred glyph size
+    if gray.shape[0] < min_height:
+        scale = min_height / gray.shape[0]
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
 
 class OCRAgent:
+    def __init__(self, pool=None):
+        # Shared pool of persistent Tesseract workers (no process spawn per read)
+        self.pool = pool or get_tesseract_pool()
+
     def extract_expiry(self, image_path):
         # 1. Load and recognize text
-        text = pytesseract.image_to_string(Image.open(image_path))
-        
-        # 2. Use Regex to find common date patterns (MM/YYYY or DD-MM-YYYY)
-        date_pattern = r'(\d{2}[/-]\d{2}[/-]\d{4}|\d{2}/\d{4})'
-        matches = re.findall(date_pattern, text)
-        
-        if not matches:
-            return {"status": "UNKNOWN", "msg": "No expiry date detected."}
-            
+        text = self.pool.image_to_string(Image.open(image_path))
+        return self._result(text)
+
+    def read_expiry(self, image):
+        """Same as extract_expiry, but for an in-memory (already preprocessed) array."""
+        text = self.pool.image_to_string(image)
+        return self._result(text)
+
+    def _result(self, text):
+        # 2. Precompiled parser: EXP / MFG keywords, DD.MM.YYYY, MM/YY, MMM YYYY, batch numbers
+        label = parse_label(text)
+        expiry_str, expiry_date = label["expiry_raw"], label["expiry"]
+
+        if not expiry_str:
+            return {"status": "UNKNOWN", "batch": label["batch"], "msg": "No expiry date detected."}
+
         # 3. Logic to check if expired
-        expiry_str = matches[0]
-        # (Simplified) Compare with datetime.now()
-        return {"status": "SUCCESS", "date": expiry_str, "msg": f"Detected Expiry: {expiry_str}"}
\ No newline at end of file
+        expired = expiry_date < datetime.now().date()
+        return {
+            "status": "EXPIRED" if expired else "VALID",
+            "date": expiry_str,
+            "expiry_date": expiry_date.isoformat(),
+            "batch": label["batch"],
+            "expired": expired,
+            "msg": f"Detected Expiry: {expiry_str}" + (" (EXPIRED)" if expired else ""),
+        }
+
+class ExpiryOCRStage:
+    """
+    Live-stream OCR that never runs inline with the video.
+    `submit` returns the cached expiry for a strip if there is one; otherwise
+    it hands a copy of the strip ROI to a background worker, at most once
+    every `min_interval` seconds. Results are cached per tracked strip; a
+    strip without a key (None) is never read, as its result could not be
+    told apart from another strip's.
+    """
+
+    def __init__(self, agent=None, min_interval=1.0, ttl=60.0):
+        self.agent = agent or OCRAgent()
+        self.min_interval = min_interval
+        self.ttl = ttl
+        self._cache = {}          # strip key -> (result, time)
+        self._cond = threading.Condition()
+        self._pending = None
+        self._last_submit = 0.0
+        self._stopped = False
+
+        self.runs = 0
+        self.cache_hits = 0
+        self._latencies = deque(maxlen=50)
+
+        self._worker = threading.Thread(target=self._run, name="expiry-ocr", daemon=True)
+        self._worker.start()
+
+    def submit(self, key, frame, box, fmt="rgb24"):
+        if key is None:
+            return {"status": "PENDING", "msg": "Strip not tracked yet..."}
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        # Only a real date ends the search; "no date found" keeps retrying (throttled)
+        if cached and cached[0]["status"] in ("VALID", "EXPIRED") and now - cached[1] < self.ttl:
+            self.cache_hits += 1
+            return cached[0]
+
+        with self._cond:
+            # Throttle, and never queue behind a strip that is still being read
+            if self._pending is None and now - self._last_submit >= self.min_interval:
+                roi = preprocess_roi(frame, box, fmt)
+                if roi is not None:
+                    self._pending = (key, roi)
+                    self._last_submit = now
+                    self._cond.notify()
+        return cached[0] if cached else {"status": "PENDING", "msg": "Reading expiry..."}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                key, roi = self._pending
+
+            start = time.perf_counter()
+            try:
+                result = self.agent.read_expiry(roi)
+            except Exception as e:
+                result = {"status": "ERROR", "msg": str(e)}
+            ocr_ms = (time.perf_counter() - start) * 1000
+            result["ocr_ms"] = round(ocr_ms, 1)
+            self._latencies.append(ocr_ms)
+            self.runs += 1
+
+            # Keep the last good read if this attempt found nothing
+            previous = self._cache.get(key)
+            if result["status"] in ("VALID", "EXPIRED") or previous is None:
+                self._cache[key] = (result, time.monotonic())
+            if len(self._cache) > 256:
+                # Strips that left the counter long ago
+                cutoff = time.monotonic() - self.ttl
+                self._cache = {k: v for k, v in self._cache.items() if v[1] >= cutoff}
+            with self._cond:
+                self._pending = None
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        return {
+            # Fallback mode (no tesserocr) shows up here as persistent_workers: false
+            "engine": self.agent.pool.stats(),
+            "ocr_runs": self.runs,
+            "cache_hits": self.cache_hits,
+            "cached_strips": len(self._cache),
+            "ocr_ms_p50": round(latencies[len(latencies) // 2], 1) if latencies else None,
+            "ocr_ms_max": round(latencies[-1], 1) if latencies else None,
+        }
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
@@ -1,9 +1,12 @@
-import json
+from tools.drug_api import get_interaction_engine, summarize
+from tools.inventory import get_inventory
 
 class PharmaAgent:
-    def __init__(self, inventory_path='data/inventory.json'):
-        with open(inventory_path, 'r') as f:
-            self.db = json.load(f)
+    def __init__(self, inventory_path=None):
+        # Shared, hot-reloading inventory (loaded once per process)
+        self.db = get_inventory(inventory_path)
+        # Precomputed ingredient interaction tables (shared, hot-reloading)
+        self.interactions = get_interaction_engine(inventory_path=inventory_path)
 
     def verify_safety(self, detected_id, expected_id):
         drug = self.db.get(detected_id)
@@ -13,4 +16,17 @@ class PharmaAgent:
         if detected_id == expected_id:
             return {"status": "SAFE", "msg": f"Verified: {drug['name']}."}
         else:
-            return {"status": "DANGER", "msg": f"Mismatch! Detected {drug['name']}."}
\ No newline at end of file
+            return {"status": "DANGER", "msg": f"Mismatch! Detected {drug['name']}."}
+
+    def check_interactions(self, drug_ids, patient_meds=()):
+        """Whole-order interaction screen: the order against itself and the patient's current meds."""
+        hits = self.interactions.check(drug_ids, patient_meds)
+        status = summarize(hits)
+        if status == "SAFE":
+            return {"status": status, "msg": "No interactions found.", "interactions": hits}
+        worst = hits[0]
+        return {
+            "status": status,
+            "msg": f"{len(hits)} interaction(s); worst: {worst['drug_a']} + {worst['drug_b']} ({worst['severity']}).",
+            "interactions": hits,
+        }
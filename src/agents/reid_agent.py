@@ -0,0 +1,75 @@
+import os
+import pathlib
+from tools.embedder import CropEmbedder
+from tools.sku_index import get_sku_index
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+EMBEDDER_PATH = os.environ.get("PHARMA_EMBEDDER", str(PROJECT_ROOT / "models" / "embedder.onnx"))
+SKU_INDEX_DIR = os.environ.get("PHARMA_SKU_INDEX", str(PROJECT_ROOT / "data" / "sku_index"))
+# Below this cosine similarity a crop is reported as "unknown" rather than the nearest SKU
+MIN_SIMILARITY = float(os.environ.get("PHARMA_REID_MIN_SIM", "0.6"))
+
+
+def crop_box(frame, box, inset=0):
+    x1, y1, x2, y2 = (int(v) for v in box)
+    h, w = frame.shape[:2]
+    crop = frame[max(0, y1 + inset):min(h, y2 - inset), max(0, x1 + inset):min(w, x2 - inset)]
+    return crop if crop.size else None
+
+
+class ReIDAgent:
+    """
+    Second stage for the generic strip detector: names each detected box by
+    nearest-neighbour search of its crop embedding in the SKU index.
+    Identities are cached per tracked object, so a strip that stays in view is
+    embedded once and then re-checked only every `refresh_frames` frames.
+    """
+
+    def __init__(self, embedder=None, index=None, min_similarity=MIN_SIMILARITY, refresh_frames=30):
+        self.embedder = embedder or CropEmbedder(EMBEDDER_PATH)
+        self.index = index or get_sku_index(SKU_INDEX_DIR)
+        self.min_similarity = min_similarity
+        self.refresh_frames = refresh_frames
+
+    def identify(self, frame, boxes, fmt="bgr24", keys=None, cache=None, frame_no=0):
+        """
+        (drug_id or "unknown", similarity) per box. With `keys` (track ids) and a
+        per-stream `cache` dict, boxes identified recently are not re-embedded.
+        """
+        results = [None] * len(boxes)
+        todo, crops = [], []
+        for i, box in enumerate(boxes):
+            key = keys[i] if keys is not None else None
+            hit = cache.get(key) if cache is not None and key is not None else None
+            if hit and frame_no - hit[2] < self.refresh_frames:
+                results[i] = hit[:2]
+                continue
+            crop = crop_box(frame, box)
+            if crop is None:
+                results[i] = ("unknown", 0.0)
+                continue
+            todo.append(i)
+            crops.append(crop)
+
+        if crops:
+            matches = self.index.search(self.embedder.embed(crops, fmt), self.embedder.name)
+            for i, (drug_id, similarity) in zip(todo, matches):
+                identity = (drug_id if drug_id and similarity >= self.min_similarity else "unknown", similarity)
+                results[i] = identity
+                if cache is not None and keys is not None:
+                    cache[keys[i]] = (*identity, frame_no)
+
+        if cache is not None and len(cache) > 256:
+            # Tracks that ended long ago
+            for key in [k for k, v in cache.items() if frame_no - v[2] > 10 * self.refresh_frames]:
+                del cache[key]
+        return results
+
+    def add_sku(self, drug_id, images, fmt="bgr24", boxes=None, replace=True):
+        """Indexes reference images (optionally cropped to `boxes`) for `drug_id`. Returns the vector count."""
+        crops = [crop_box(img, box) if box is not None else img for img, box in zip(images, boxes or [None] * len(images))]
+        crops = [crop for crop in crops if crop is not None]
+        if not crops:
+            return 0
+        self.index.add(drug_id, self.embedder.embed(crops, fmt), self.embedder.name, replace=replace)
+        return len(crops)
@@ -2,19 +2,127 @@ import streamlit as st
 import os
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import pathlib
+import threading
+import time
+from tools import startup
+from tools.frame_pool import FramePool
+from tools.metrics import registry
+from tools.model_manifest import MANIFEST_NAME, select_variant
+from tools.tiling import tile_grid, merge_tile_detections
+
+# "ultralytics" (default), "onnxruntime" for the direct ORT engine,
+# or "server" for the out-of-process inference server (python inference_server.py)
+VISION_BACKEND = os.environ.get("PHARMA_VISION_BACKEND", "ultralytics")
+# >1 batches frames from all live sessions into one ORT call (needs a dynamic-batch export)
+MAX_BATCH = int(os.environ.get("PHARMA_MAX_BATCH", "1"))
+MAX_WAIT_MS = float(os.environ.get("PHARMA_BATCH_WAIT_MS", "10"))
+# Longest a frame may wait on the scheduler / inference server before it is dropped (seconds)
+INFERENCE_TIMEOUT = float(os.environ.get("PHARMA_INFERENCE_TIMEOUT", "2.0"))
+# "fixed" runs the model on every 3rd frame, "adaptive" gates it on motion and tracks boxes in between
+FRAME_MODE = os.environ.get("PHARMA_FRAME_MODE", "fixed")
+# Variant manifest written by export_models.py ("" disables it); default: models/variants/manifest.json
+MODEL_MANIFEST = os.environ.get("PHARMA_MODEL_MANIFEST")
+# Largest mAP50-95 drop (vs the fp32 export) a faster variant may cost
+MAP_BUDGET = float(os.environ.get("PHARMA_MAP_BUDGET", "0.01"))
+# High-res frames: "off", "on" (always tile) or "auto" (tile while the detected strips are small)
+TILE_MODE = os.environ.get("PHARMA_TILE_MODE", "off")
+TILE_SIZE = int(os.environ.get("PHARMA_TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.environ.get("PHARMA_TILE_OVERLAP", "0.2"))
+# Auto mode tiles when the median box's short side is below this at model input scale
+SMALL_OBJECT_PX = 32
+# 1 = the detector only finds strips; SKUs are named by embedding search (see ReIDAgent)
+REID = os.environ.get("PHARMA_REID", "0") == "1"
 
 @st.cache_resource
-def load_yolo_model(model_path):
+def load_yolo_model(model_path, imgsz=640):
+    # Imported lazily so the onnxruntime backend never pulls in torch
+    start = time.perf_counter()
+    from ultralytics import YOLO
+    startup.record("ultralytics_import_ms", (time.perf_counter() - start) * 1000)
+
     # Strictly using YOLO with the ONNX backend as per your Dockerfile
     model = YOLO(model_path, task='detect')
     # Warm-up with a blank frame to prevent lag on first scan
-    model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+    model(np.zeros((640, 640, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
     return model
 
+@st.cache_resource
+def load_onnx_engine(model_path, max_batch=1):
+    from tools.onnx_engine import OnnxEngine
+
+    engine = OnnxEngine(model_path, conf=0.45, max_batch=max_batch)
+    startup.record("ort_session_ms", engine.session_load_ms)
+    startup.record("ort_graph_from_cache", engine.from_cache)
+    # Same warm-up as the YOLO path so the first real scan is not slow
+    engine.detect(np.zeros((640, 640, 3), dtype=np.uint8))
+    return engine
+
+@st.cache_resource
+def load_inference_scheduler(model_path, max_batch, max_wait_ms):
+    # One scheduler per process: every WebRTC session shares the same batcher
+    from tools.onnx_engine import OnnxEngine
+    from tools.inference_scheduler import InferenceScheduler
+
+    engine = OnnxEngine(model_path, conf=0.45, max_batch=max_batch)
+    startup.record("ort_session_ms", engine.session_load_ms)
+    startup.record("ort_graph_from_cache", engine.from_cache)
+    engine.detect_batch([np.zeros((640, 640, 3), dtype=np.uint8)] * engine.max_batch)
+    return InferenceScheduler(engine, max_batch=engine.max_batch, max_wait_ms=max_wait_ms)
+
+@st.cache_resource
+def load_inference_client():
+    # One connection + shared-memory frame ring per app process, shared by every session
+    from tools.inference_client import InferenceClient
+
+    start = time.perf_counter()
+    client = InferenceClient(request_timeout=INFERENCE_TIMEOUT)
+    startup.record("inference_server_connect_ms", (time.perf_counter() - start) * 1000)
+    return client
+
+# Overlay colours per frame layout (OpenCV draws raw channel values)
+MATCH_COLOR = (0, 255, 0)
+MISMATCH_COLOR = {"bgr24": (0, 0, 255), "rgb24": (255, 0, 0)}
+
+def draw_box(image, box, label, color):
+    x1, y1, x2, y2 = map(int, box)
+    cv2.rectangle(image, (x1, y1), (x2, y2), color, 3)
+    cv2.putText(image, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+
+class StreamState:
+    """
+    Everything that belongs to one live stream. The VisionAgent itself is a
+    shared, process-wide resource, so counters, last detection, tracker and
+    buffers must never live on it.
+    """
+
+    def __init__(self, frame_mode):
+        self.frame_count = 0
+        self.last_id = "none"
+        self.last_count = 0
+        # Order mode: last full-tray result, reused on skipped frames
+        self.last_order = None
+        # Tile auto mode: decided from the previous inference's box sizes
+        self.tile_next = False
+        # Re-id mode: track id -> (drug id, similarity, frame) so strips are embedded once
+        self.reid_cache = {}
+        # Re-id keys for boxes when no tracker runs (fixed mode, order mode); created on first use
+        self.box_keys = None
+        self.frame_pool = FramePool()
+        # Per-stage timings, FPS, skip ratio and errors (ops panel + /metrics)
+        self.metrics = registry.new_stream()
+        # Live expiry OCR stage, attached by the orchestrator when enabled
+        self.ocr = None
+
+        # Adaptive mode: motion-gated inference + tracker between model calls
+        if frame_mode == "adaptive":
+            from tools.tracker import MotionGate, IoUTracker
+            self.motion_gate = MotionGate()
+            self.tracker = IoUTracker()
+            self.last_target = None
+
 class VisionAgent:
-    def __init__(self):
+    def __init__(self, backend=None, frame_mode=None, max_batch=None, tile_mode=None, reid=None):
         # According to your Dockerfile, the model is at /app/models/besttwo.onnx
         # We use a dynamic check to work both locally and in Docker
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -25,74 +133,416 @@ class VisionAgent:
         if not os.path.exists(model_path):
             model_path = os.path.join(self.project_root, "models", "besttwo.onnx")
 
-        self.model = load_yolo_model(model_path)
-        self.model_names = self.model.names
+        # Faster exported variant (INT8 / ORT-optimized / smaller input) if one is within the accuracy budget
+        manifest = MODEL_MANIFEST if MODEL_MANIFEST is not None else os.path.join(
+            os.path.dirname(model_path), "variants", MANIFEST_NAME)
+        self.variant = select_variant(manifest, MAP_BUDGET)
+        self.imgsz = 640
+        if self.variant:
+            model_path, self.imgsz = self.variant["path"], self.variant["imgsz"]
+
+        self.backend = backend or VISION_BACKEND
+        self.scheduler = None
+        if self.backend == "server":
+            try:
+                self.scheduler = load_inference_client()
+            except OSError:
+                # No server listening: run the model in-process rather than take the UI down
+                self.backend = "onnxruntime"
+                startup.record("inference_server", "unavailable")
+        if self.backend == "server":
+            # Same submit()/detect() interface as the in-process scheduler; the server picks the model variant
+            self.model_names = self.scheduler.names
+            self.imgsz = self.scheduler.imgsz
+        elif self.backend == "onnxruntime" and max_batch is None and MAX_BATCH > 1:
+            self.scheduler = load_inference_scheduler(model_path, MAX_BATCH, MAX_WAIT_MS)
+            self.model_names = self.scheduler.engine.names
+        elif self.backend == "onnxruntime":
+            # Headless callers pass max_batch to get their own batched engine instead of the scheduler
+            self.engine = load_onnx_engine(model_path, max_batch or 1)
+            self.model_names = self.engine.names
+        else:
+            self.model = load_yolo_model(model_path, self.imgsz)
+            self.model_names = self.model.names
+
+        # The layout to ask PyAV for, so no colour conversion is needed before the model
+        # (the ORT engine handles either order; Ultralytics expects BGR like OpenCV)
+        self.input_format = "bgr24" if self.backend == "ultralytics" else "rgb24"
+        # The Ultralytics predictor is not thread-safe; the ORT engine locks internally
+        self._model_lock = threading.Lock()
         
         # Optimization: Map names to IDs for class filtering
         self.name_to_id = {v: k for k, v in self.model_names.items()}
+        self.num_classes = max(self.model_names, default=-1) + 1
         
-        self.frame_count = 0
-        self.last_id = "none"
-        self.last_count = 0
+        self.frame_mode = frame_mode or FRAME_MODE
+        self.tile_mode = tile_mode or TILE_MODE
+        self.reid = None
+        if REID if reid is None else reid:
+            from agents.reid_agent import ReIDAgent
+            self.reid = ReIDAgent()
+        # Fallback state for callers that do not track their own stream
+        self.default_state = self.new_stream_state()
+
+    def new_stream_state(self):
+        return StreamState(self.frame_mode)
+
+    def _detect(self, frame, fmt, classes, state):
+        """Full-frame or tiled inference. Returns (boxes xyxy, scores, class_ids) sorted by confidence."""
+        tiled = self._wants_tiles(frame, state)
+        if tiled:
+            with state.metrics.time("inference"):
+                detections = self._detect_tiled(frame, fmt, classes)
+        else:
+            detections = self._detect_frame(frame, fmt, classes, state)
+        if self.tile_mode == "auto":
+            state.tile_next = self._objects_small(frame, detections[0], tiled)
+        return detections
+
+    def _wants_tiles(self, frame, state):
+        # Frames close to the tile size gain nothing from tiling
+        if self.tile_mode == "off" or max(frame.shape[:2]) < TILE_SIZE * 1.5:
+            return False
+        return self.tile_mode == "on" or state.tile_next
+
+    def _objects_small(self, frame, boxes, tiled):
+        if not len(boxes):
+            # Nothing found on the whole frame: probe with tiles once; nothing in tiles either: back off
+            return not tiled
+        scale = self.imgsz / max(frame.shape[:2])
+        short_side = np.minimum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]) * scale
+        return bool(np.median(short_side) < SMALL_OBJECT_PX)
+
+    def _detect_tiled(self, frame, fmt, classes):
+        """
+        Overlapping tiles plus the downscaled full frame in one batched call
+        (the full frame keeps strips larger than a tile whole), merged with
+        cross-tile NMS.
+        """
+        h, w = frame.shape[:2]
+        windows = tile_grid(h, w, TILE_SIZE, TILE_OVERLAP)
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+        windows.append((0, 0, w, h))
+        crops.append(frame)
+        return merge_tile_detections(self.detect_batch(crops, fmt, classes), windows)
+
+    def _detect_frame(self, frame, fmt, classes, state):
+        """Runs the active backend on the whole frame."""
+        bgr = fmt == "bgr24"
+        metrics = state.metrics
+        if self.scheduler is not None:
+            # Blocks this stream until its slot in the shared micro-batch is done
+            with metrics.time("inference"):
+                return self.scheduler.detect(frame, classes=classes, bgr=bgr, timeout=INFERENCE_TIMEOUT)
+        if self.backend == "onnxruntime":
+            # The ORT engine reads either channel order, no extra conversion needed
+            timings = {}
+            detections = self.engine.detect(frame, classes=classes, bgr=bgr, timings=timings)
+            for stage, ms in timings.items():
+                metrics.observe(stage, ms)
+            return detections
+
+        start = time.perf_counter()
+        if not bgr:
+            # YOLO ONNX needs BGR for correct medicine colors; convert into a pooled buffer
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=state.frame_pool.get("bgr", frame.shape))
+        convert_ms = (time.perf_counter() - start) * 1000
+        with self._model_lock:
+            results = self.model(frame, classes=classes, conf=0.45, imgsz=self.imgsz, verbose=False)
+        # Ultralytics already times its own stages
+        speed = results[0].speed
+        metrics.observe("convert", convert_ms + speed.get("preprocess", 0.0))
+        metrics.observe("inference", speed.get("inference", 0.0))
+        metrics.observe("postprocess", speed.get("postprocess", 0.0))
+        boxes = results[0].boxes
+        if not boxes:
+            return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int)
+        return boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy().astype(int)
+
+    def _target_classes(self, target_id):
+        # The re-id detector has generic "strip" classes, so it can never be filtered by SKU
+        target_class_id = None if self.reid else self.name_to_id.get(target_id)
+        return [target_class_id] if target_class_id is not None else None
+
+    def _identify(self, frame, boxes, class_ids, fmt, state, keys=None):
+        """
+        SKU id per box: the detector's class, or the nearest reference embedding in re-id mode.
+        Re-id results are cached per track id (`keys`) or, without a tracker, per box matched
+        by IoU to the previous inference frame; `state=None` (headless) caches nothing.
+        """
+        if self.reid is None:
+            return [self.model_names.get(int(c), "Unknown") for c in class_ids]
+        if state is None:
+            return [drug_id for drug_id, _ in self.reid.identify(frame, boxes, fmt)]
+        if keys is None:
+            keys = self._box_keys(boxes, state)
+        identities = self.reid.identify(frame, boxes, fmt, keys, state.reid_cache, state.frame_count)
+        return [drug_id for drug_id, _ in identities]
+
+    @staticmethod
+    def _box_keys(boxes, state):
+        """Per-strip keys for one inference frame without a tracker (call once per frame)."""
+        if state.box_keys is None:
+            from tools.tracker import BoxKeys
+            state.box_keys = BoxKeys()
+        return state.box_keys.assign(boxes)
 
-    def analyze_frame(self, frame, target_id):
+    def _order_labels(self, frame, boxes, class_ids, order, fmt, state):
+        """
+        (label per box, label -> name, name -> label, known names) for order counting.
+        Detector classes as they are, or in re-id mode the identified SKUs numbered on the fly.
+        """
+        if self.reid is None:
+            return class_ids.astype(np.int64), self.model_names, self.name_to_id, self.num_classes
+        names = self._identify(frame, boxes, class_ids, fmt, state)
+        vocab = list(dict.fromkeys([*order, *names]))
+        name_to_id = {name: i for i, name in enumerate(vocab)}
+        known = set(self.reid.index.ids())
+        # Order lines the index has never seen stay UNKNOWN_SKU, as with the detector's classes
+        name_to_id = {name: i for name, i in name_to_id.items() if name in known or name in names}
+        labels = np.array([name_to_id[name] for name in names], dtype=np.int64)
+        return labels, dict(enumerate(vocab)), name_to_id, len(vocab)
+
+    def detect_batch(self, frames, fmt="bgr24", classes=None):
+        """Unfiltered detections for a list of frames: one (boxes, scores, class_ids) per frame."""
+        bgr = fmt == "bgr24"
+        if self.scheduler is not None:
+            futures = [self.scheduler.submit(frame, classes, bgr) for frame in frames]
+            return [future.result(timeout=INFERENCE_TIMEOUT) for future in futures]
+        if self.backend == "onnxruntime":
+            return self.engine.detect_batch(frames, [classes] * len(frames), bgr=bgr)
+
+        if not bgr:
+            frames = [cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) for frame in frames]
+        with self._model_lock:
+            results = self.model(frames, classes=classes, conf=0.45, imgsz=self.imgsz, verbose=False)
+        out = []
+        for r in results:
+            boxes = r.boxes
+            if not boxes:
+                out.append((np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int)))
+            else:
+                out.append((boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy().astype(int)))
+        return out
+
+    def analyze_batch(self, frames, fmt="bgr24"):
+        """
+        Headless analysis (no overlay, no frame skipping): the strongest
+        detection per frame plus the total box count.
+        """
+        if self.tile_mode == "on":
+            # No per-stream history here, so "auto" behaves like "off" for headless batches
+            detections = [
+                self._detect_tiled(frame, fmt, None) if max(frame.shape[:2]) >= TILE_SIZE * 1.5 else None
+                for frame in frames
+            ]
+            pending = [frame for frame, d in zip(frames, detections) if d is None]
+            full = iter(self.detect_batch(pending, fmt) if pending else [])
+            detections = [d if d is not None else next(full) for d in detections]
+        else:
+            detections = self.detect_batch(frames, fmt)
+
+        results = []
+        for frame, (boxes, scores, class_ids) in zip(frames, detections):
+            if len(boxes):
+                results.append({
+                    # Same naming as the live path: detector class, or the re-id match of the top box
+                    "detected_id": self._identify(frame, boxes[:1], class_ids[:1], fmt, None)[0],
+                    "confidence": float(scores[0]),
+                    "current_count": len(boxes),
+                    "box": [float(v) for v in boxes[0]],
+                })
+            else:
+                results.append({"detected_id": "none", "confidence": 0.0, "current_count": 0, "box": None})
+        return results
+
+    def analyze_order(self, frame, order, fmt="rgb24", state=None):
+        """
+        Whole-tray verification in one unfiltered pass. `order` maps drug id ->
+        expected quantity. Every box is drawn in place (green if the drug is on
+        the order); per-item counts come from a single bincount over all classes
+        (in re-id mode, over the SKUs the boxes were identified as).
+        Follows the fixed every-3rd-frame schedule; skipped frames repeat the last result.
+        """
+        if frame is None:
+            return {"items": [], "boxes": [], "current_count": 0, "match_status": "ERROR"}
+
+        state = state or self.default_state
+        state.frame_count += 1
+        last = state.last_order
+        if state.frame_count % 3 != 0 and last is not None and last["order"] == order:
+            state.metrics.frame_done(skipped=True)
+            return {**last, "annotated_frame": frame, "match_status": "SKIPPED"}
+
+        try:
+            boxes, scores, class_ids = self._detect(frame, fmt, None, state)
+            # Detector classes, or in re-id mode the SKU each box was identified as
+            labels, label_names, name_to_id, num_labels = self._order_labels(frame, boxes, class_ids, order, fmt, state)
+
+            # 1. COUNT EVERY CLASS AT ONCE
+            counts = np.bincount(labels, minlength=num_labels)
+            order_ids = np.array([name_to_id.get(drug_id, -1) for drug_id in order], dtype=np.int64)
+            expected = np.array(list(order.values()), dtype=np.int64)
+            known = order_ids >= 0
+            found = np.where(known, counts[np.where(known, order_ids, 0)], 0)
+            on_order = np.zeros(num_labels, dtype=bool)
+            on_order[order_ids[known]] = True
+
+            # 2. PER-ITEM VERDICTS
+            status = np.where(found == expected, "MATCH", np.where(found < expected, "SHORT", "EXCESS")).astype(object)
+            status[~known] = "UNKNOWN_SKU"
+            items = [
+                {"drug_id": drug_id, "expected": int(e), "found": int(f), "status": verdict}
+                for drug_id, e, f, verdict in zip(order, expected, found, status)
+            ]
+            unexpected = [
+                {"drug_id": label_names.get(int(c), "Unknown"), "found": int(counts[c])}
+                for c in np.nonzero(counts * ~on_order)[0]
+            ]
+
+            # 3. ALL BOXES (overlay + payload)
+            box_on_order = on_order[labels] if len(labels) else np.zeros(0, dtype=bool)
+            detections = []
+            with state.metrics.time("draw"):
+                for box, score, label, ok in zip(boxes, scores, labels, box_on_order):
+                    name = label_names.get(int(label), "Unknown")
+                    draw_box(frame, box, f"{name} {score:.0%}", MATCH_COLOR if ok else MISMATCH_COLOR[fmt])
+                    detections.append({"drug_id": name, "confidence": float(score), "box": [int(v) for v in box]})
+
+            verified = not unexpected and all(item["status"] == "MATCH" for item in items)
+            result = {
+                "order": order,
+                "items": items,
+                "unexpected": unexpected,
+                "boxes": detections,
+                "current_count": len(boxes),
+                "match_status": "VERIFIED" if verified else "MISMATCH",
+            }
+            state.last_order = result
+            state.last_count = len(boxes)
+            state.metrics.frame_done(skipped=False)
+            return {**result, "annotated_frame": frame}
+        except Exception as e:
+            state.metrics.error(e)
+            return {"items": [], "boxes": [], "current_count": 0, "annotated_frame": frame}
+
+    def analyze_frame(self, frame, target_id, fmt="rgb24", state=None):
+        """
+        `frame` is owned by the caller's stream and annotated in place,
+        `fmt` is its channel layout ("rgb24" or "bgr24", as requested from PyAV),
+        `state` is the caller's StreamState (see new_stream_state).
+        """
         if frame is None:
             return {"detected_id": "none", "current_count": 0, "match_status": "ERROR"}
         
-        self.frame_count += 1
+        state = state or self.default_state
+        state.frame_count += 1
+        if self.frame_mode == "adaptive":
+            return self._analyze_adaptive(frame, target_id, fmt, state)
         
-        # FIX: WebRTC gives RGB. YOLO ONNX needs BGR for correct medicine colors.
-        processed_frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-        annotated_frame = processed_frame.copy()
-        
-        # Performance: Skip frames to maintain high FPS on the web
-        if self.frame_count % 3 != 0:
+        # Performance: Skip frames to maintain high FPS on the web (returned untouched, no copy)
+        if state.frame_count % 3 != 0:
+            state.metrics.frame_done(skipped=True)
             return {
-                "detected_id": self.last_id,
-                "current_count": self.last_count,
-                "annotated_frame": cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB),
+                "detected_id": state.last_id,
+                "current_count": state.last_count,
+                "annotated_frame": frame,
                 "match_status": "SKIPPED"
             }
 
         try:
             # OPTIMIZATION: Tell YOLO to only look for the medicine selected in main.py
-            target_class_id = self.name_to_id.get(target_id)
-            
-            if target_class_id is not None:
-                # This classes filter prevents 'Traffic Light' detections
-                results = self.model(processed_frame, classes=[target_class_id], conf=0.45, verbose=False)
-            else:
-                results = self.model(processed_frame, conf=0.45, verbose=False)
+            # This classes filter prevents 'Traffic Light' detections
+            classes = self._target_classes(target_id)
+            boxes, scores, class_ids = self._detect(frame, fmt, classes, state)
 
-            current_count = 0
+            current_count = len(boxes)
             detected_id = "none"
+            top_box = strip_key = None
+
+            if current_count:
+                top_box = [int(v) for v in boxes[0]]
+                # Same strip, same key across inference frames (expiry OCR and re-id cache on it)
+                keys = self._box_keys(boxes, state)
+                strip_key = keys[0]
+                if self.reid is None:
+                    detected_id = self.model_names.get(int(class_ids[0]), "Unknown")
+                else:
+                    # Generic strips: name them all, count only the selected SKU
+                    names = self._identify(frame, boxes, class_ids, fmt, state, keys=keys)
+                    detected_id = names[0]
+                    current_count = sum(1 for name in names if name == target_id)
+                conf = float(scores[0])
 
-            for r in results:
-                if r.boxes:
-                    current_count = len(r.boxes)
-                    box = r.boxes[0]
-                    detected_id = self.model_names.get(int(box.cls[0]), "Unknown")
-                    conf = float(box.conf[0])
-
-                    # Color logic: Green if matched, Red if mismatch
-                    is_match = (detected_id == target_id)
-                    color = (0, 255, 0) if is_match else (0, 0, 255)
-                    
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 3)
-                    
-                    label = f"{detected_id} {conf:.0%}"
-                    cv2.putText(annotated_frame, label, (x1, y1 - 10), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-                    break
-
-            self.last_id, self.last_count = detected_id, current_count
+                # Color logic: Green if matched, Red if mismatch
+                is_match = (detected_id == target_id)
+                color = MATCH_COLOR if is_match else MISMATCH_COLOR[fmt]
+                with state.metrics.time("draw"):
+                    draw_box(frame, boxes[0], f"{detected_id} {conf:.0%}", color)
+
+            state.last_id, state.last_count = detected_id, current_count
+            state.metrics.frame_done(skipped=False)
 
             return {
                 "detected_id": detected_id,
                 "current_count": current_count,
-                "annotated_frame": cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB),
+                "annotated_frame": frame,
+                "box": top_box,
+                "strip_key": strip_key,
                 "match_status": "VERIFIED" if detected_id == target_id else "MISMATCH"
             }
-        except Exception:
+        except Exception as e:
+            state.metrics.error(e)
+            return {"detected_id": "none", "current_count": 0, "annotated_frame": frame}
+
+    def _analyze_adaptive(self, frame, target_id, fmt, state):
+        """
+        Runs the detector only when the motion gate fires; in between, the
+        tracker carries the boxes forward so the overlay never blinks out.
+        `detected_id` is the temporal majority of the primary track.
+        """
+        try:
+            # A new target changes the class filter, so old tracks are meaningless
+            if target_id != state.last_target:
+                state.tracker.reset()
+                state.motion_gate.reset()
+                state.last_target = target_id
+
+            ran_model = state.motion_gate.should_detect(frame, fmt)
+            if ran_model:
+                state.tracker.update(*self._detect(frame, fmt, self._target_classes(target_id), state))
+            else:
+                state.tracker.predict()
+
+            tracks = state.tracker.visible()
+            # Re-id results are cached per track id, so a steady strip is embedded only once
+            names = self._identify(
+                frame, [t.box for t in tracks], [t.class_id for t in tracks], fmt, state, keys=[t.id for t in tracks]
+            )
+            detected_id = names[0] if tracks else "none"
+            current_count = sum(1 for t in tracks if t.misses == 0)
+
+            with state.metrics.time("draw"):
+                for track, name in zip(tracks, names):
+                    color = MATCH_COLOR if name == target_id else MISMATCH_COLOR[fmt]
+                    draw_box(frame, track.box, f"{name} {track.score:.0%}", color)
+
+            state.last_id, state.last_count = detected_id, current_count
+            state.metrics.frame_done(skipped=not ran_model)
+
+            if not ran_model:
+                match_status = "SKIPPED"
+            else:
+                match_status = "VERIFIED" if detected_id == target_id else "MISMATCH"
+            return {
+                "detected_id": detected_id,
+                "current_count": current_count,
+                "annotated_frame": frame,
+                "box": [int(v) for v in tracks[0].box] if tracks else None,
+                "track_id": tracks[0].id if tracks else None,
+                "strip_key": tracks[0].id if tracks else None,
+                "match_status": match_status
+            }
+        except Exception as e:
+            state.metrics.error(e)
             return {"detected_id": "none", "current_count": 0, "annotated_frame": frame}
\ No newline at end of file
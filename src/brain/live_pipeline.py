@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import deque
+
+
+class AsyncFramePipeline:
+    """
+    Decouples the WebRTC callback from inference.
+    `submit` drops the frame into a single-slot mailbox and returns at once;
+    a background worker always takes the newest frame (older pending frames
+    are dropped) and publishes the latest annotated result.
+    """
+
+    def __init__(self, process_fn, latency_window=120):
+        self.process_fn = process_fn
+        self._cond = threading.Condition()
+        self._pending = None
+        self._latest = None
+        self._stopped = False
+
+        # Stats for sizing hardware per counter
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=latency_window)
+
+        self._worker = threading.Thread(target=self._run, name="live-pipeline", daemon=True)
+        self._worker.start()
+
+    def submit(self, frame, *args):
+        """Non-blocking hand-off. Replaces (and counts as dropped) any frame still waiting."""
+        with self._cond:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (time.perf_counter(), frame, args)
+            self.submitted += 1
+            self._cond.notify()
+
+    def latest(self):
+        """Most recent processed result, or None before the first one is ready."""
+        return self._latest
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                submitted_at, frame, args = self._pending
+                self._pending = None
+
+            try:
+                self._latest = self.process_fn(frame, *args)
+                self.processed += 1
+            except Exception:
+                self.errors += 1
+            self._latencies.append((time.perf_counter() - submitted_at) * 1000)
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth": int(self._pending is not None),
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "dropped_frames": self.dropped,
+            "errors": self.errors,
+            "latency_ms_p50": round(latencies[len(latencies) // 2], 1) if latencies else None,
+            "latency_ms_max": round(latencies[-1], 1) if latencies else None,
+        }
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._worker.join(timeout=1)
@@ -1,38 +1,179 @@
 from agents.vision_agent import VisionAgent
 from agents.pharma_agent import PharmaAgent
 from agents.auditor_agent import AuditorAgent
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from tools import startup
+from tools.metrics import registry
+
+# 1 = read the expiry date off detected strips in the background during live scans
+LIVE_OCR = os.environ.get("PHARMA_LIVE_OCR", "0") == "1"
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def get_orchestrator():
+    """
+    Process-wide Orchestrator shared by every Streamlit rerun and session.
+    Agents are built once; per-stream state comes from `new_stream()`.
+    """
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = Orchestrator()
+    return _shared
+
+def warm_up():
+    """
+    Builds the shared Orchestrator and pushes one blank frame through the model.
+    main.py runs this on a background thread while the PIN page is shown.
+    """
+    brain = get_orchestrator()
+    startup.mark("orchestrator_ready_ms")
+    brain.vision.analyze_batch([np.zeros((480, 640, 3), dtype=np.uint8)], fmt=brain.vision.input_format)
+    startup.mark("first_inference_ms")
+    return brain
+
+def normalize_order(order):
+    """{drug_id: qty}, [(drug_id, qty), ...] or [drug_id, ...] (one entry per unit) -> {drug_id: qty}."""
+    if isinstance(order, dict):
+        return {drug_id: int(qty) for drug_id, qty in order.items()}
+    normalized = {}
+    for item in order:
+        drug_id, qty = (item, 1) if isinstance(item, str) else item
+        normalized[drug_id] = normalized.get(drug_id, 0) + int(qty)
+    return normalized
 
 class Orchestrator:
-    def __init__(self):
-        self.vision = VisionAgent()
+    def __init__(self, **vision_options):
+        self.vision = VisionAgent(**vision_options)
         self.safety = PharmaAgent()
         self.auditor = AuditorAgent()
 
+    def new_stream(self):
+        """Fresh per-stream state (frame counter, last detection, tracker) for one live session."""
+        state = self.vision.new_stream_state()
+        if LIVE_OCR:
+            from agents.ocr_agent import ExpiryOCRStage
+            state.ocr = ExpiryOCRStage()
+        return state
+
+    def end_stream(self, state):
+        if state is None:
+            return
+        if state.ocr is not None:
+            state.ocr.stop()
+        registry.remove(state.metrics)
+
+    def verify_detection(self, vision_data, target_id, source=None, metrics=None):
+        """Safety check + audit entry for one analysed item (shared by uploads and batch runs)."""
+        detected_id = vision_data.get("detected_id", "none")
+        
+        # 1. Safety Logic
+        if detected_id == "none":
+            res = {"status": "NO_DETECTION", "msg": "No medicine detected."}
+        elif target_id is None:
+            res = self.safety.verify_safety(detected_id, detected_id)
+            res["status"] = "IDENTIFIED" if res["status"] == "SAFE" else res["status"]
+        else:
+            res = self.safety.verify_safety(detected_id, target_id)
+        
+        # 2. Audit Logging
+        entry = {
+            **res,
+            "medicine": detected_id,
+            "expected": target_id or "",
+            "confidence": round(vision_data.get("confidence", 0.0), 3),
+            "count": vision_data.get("current_count", 0),
+            "source": source or "",
+        }
+        start = time.perf_counter()
+        self.auditor.log_transaction(entry)
+        if metrics is not None:
+            metrics.observe("audit", (time.perf_counter() - start) * 1000)
+        return entry
+
     def process_order(self, image_path, target_id):
         """Maintains existing functionality for static image uploads"""
         try:
             # 1. Execute AI Vision
-            vision_data = self.vision.analyze_pill(image_path)
-            detected_id = vision_data.get("detected_pill_id")
+            image = cv2.imread(image_path)
+            if image is None:
+                return {"status": "ERROR", "msg": f"Could not read image: {image_path}"}
+            vision_data = self.vision.analyze_batch([image], fmt="bgr24")[0]
             
-            # 2. Safety Logic
-            if detected_id == target_id:
-                res = {"status": "SAFE", "msg": f"Verified: {target_id} matches."}
-            else:
-                res = {"status": "DANGER", "msg": f"Mismatch: Found {detected_id}."}
-            
-            # 3. Audit Logging
-            self.auditor.log_transaction(res)
-            return res
+            # 2. Safety Logic + 3. Audit Logging
+            return self.verify_detection(vision_data, target_id, source=image_path)
         except Exception as e:
             return {"status": "ERROR", "msg": f"Failed: {str(e)}"}
 
-    def process_live_stream(self, frame, target_id):
+    def verify_order(self, image, order, fmt="bgr24", source=None, state=None, patient_meds=()):
+        """
+        Verifies a whole dispensing tray from one image: per-item found/expected,
+        drugs that are not on the order, and every box, plus an interaction
+        screen of the order against itself and `patient_meds`. Each order line,
+        unexpected drug and interaction gets its own audit entry.
+        """
+        order = normalize_order(order)
+        interactions = self.safety.check_interactions(list(order), patient_meds)
+        own_state = state is None
+        state = state or self.vision.new_stream_state()
+        try:
+            result = self.vision.analyze_order(image, order, fmt, state)
+        finally:
+            if own_state:
+                self.end_stream(state)
+        result.pop("annotated_frame", None)
+
+        lines = [(item["drug_id"], item["drug_id"], item["found"], item["expected"], item["status"]) for item in result["items"]]
+        lines += [(extra["drug_id"], "", extra["found"], 0, "UNEXPECTED") for extra in result["unexpected"]]
+        for medicine, expected, found, expected_count, line_status in lines:
+            self.auditor.log_transaction({
+                "status": "SAFE" if line_status == "MATCH" else "DANGER",
+                "msg": f"Order line {line_status}: found {found} of {expected_count}.",
+                "medicine": medicine,
+                "expected": expected,
+                "count": found,
+                "expected_count": expected_count,
+                "source": source or "",
+            })
+        for hit in interactions["interactions"]:
+            self.auditor.log_transaction({
+                "status": "DANGER" if hit["severity"] == "major" else "WARNING",
+                "msg": f"Interaction ({hit['severity']}): {hit['drug_a']} + {hit['drug_b']}: {hit['effect']}",
+                "medicine": hit["drug_a"],
+                "expected": hit["drug_b"],
+                "source": source or "",
+            })
+        result["interactions"] = interactions
+        verified = result.get("match_status") == "VERIFIED" and interactions["status"] != "DANGER"
+        result["status"] = "SAFE" if verified else "DANGER"
+        return result
+
+    def process_live_order(self, frame, order, fmt="rgb24", state=None):
+        """Live multi-target mode: one unfiltered pass per frame for the whole order (not audited per frame)."""
+        try:
+            vision_data = self.vision.analyze_order(frame, order, fmt, state)
+            # Skipped frames carry the last verdict's items, so judge on those rather than match_status
+            items = vision_data.get("items")
+            verified = bool(items) and not vision_data.get("unexpected") and all(i["status"] == "MATCH" for i in items)
+            vision_data["status"] = "SAFE" if verified else "DANGER"
+            return vision_data
+        except Exception as e:
+            if state is not None:
+                state.metrics.error(e)
+            return {"annotated_frame": frame, "status": "ERROR", "items": [], "boxes": [], "current_count": 0}
+
+    def process_live_stream(self, frame, target_id, fmt="rgb24", state=None):
         """UPDATED: Handles real-time video frames and medicine counting"""
         try:
             # 1. Direct frame analysis (returns annotated frame with bounding boxes)
             # We call your existing vision agent here
-            vision_data = self.vision.analyze_frame(frame, target_id)
+            vision_data = self.vision.analyze_frame(frame, target_id, fmt, state)
             
             # 2. Extract detected ID for background logic
             detected_id = vision_data.get("detected_id")
@@ -47,10 +188,22 @@ class Orchestrator:
                 vision_data["status"] = "SAFE"
             else:
                 vision_data["status"] = "DANGER"
+
+            # 4. Expiry check on the detected strip (cached per physical strip, OCR runs off-thread).
+            # Never keyed by SKU: two strips of one SKU can carry different expiry dates
+            if state is not None and state.ocr is not None and vision_data.get("box"):
+                with state.metrics.time("ocr"):
+                    expiry = state.ocr.submit(vision_data.get("strip_key"), frame, vision_data["box"], fmt)
+                vision_data["expiry"] = expiry
+                if expiry.get("expired"):
+                    vision_data["status"] = "DANGER"
                 
             return vision_data
             
         except Exception as e:
+            # Counted (not silently swallowed) so it shows up in the ops panel and /metrics
+            if state is not None:
+                state.metrics.error(e)
             # Return original frame with 0 count if AI fails to prevent screen flickering
             return {
                 "annotated_frame": frame, 
@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from tools.audit_store import day_order
+
+AGGREGATES = "aggregates.json"
+# Statuses counted as a mismatch for the per-drug rate
+MISMATCH_STATUSES = {"DANGER"}
+# Fields kept per record in the recent-detections ring
+RECENT_FIELDS = ("Timestamp", "Transaction_ID", "medicine", "expected", "status", "confidence")
+
+
+class AuditAggregates:
+    """
+    Dashboard numbers maintained as records are written, never recomputed
+    from the ledger:
+        by_medicine   medicine -> status -> count (all time)
+        by_hour       'YYYY-MM-DD HH' -> medicine -> status -> count (last `hours_kept` hours)
+        recent        ring buffer of the latest `recent_size` records
+    `offsets` records how far into every day segment the counters reflect.
+    The AuditWriter hands over each batch it just appended; when that batch
+    does not start exactly at the known offset (another process appended, or
+    the counters were loaded from an older snapshot) the gap is tail-read
+    from the segment by byte offset. Counters and offsets are persisted
+    together to aggregates.json, so a restart only reads what came after.
+    """
+
+    def __init__(self, store, recent_size=50, hours_kept=168, save_interval=5.0, check_interval=2.0):
+        self.store = store
+        self.recent_size = recent_size
+        self.hours_kept = hours_kept
+        self.save_interval = save_interval
+        self.check_interval = check_interval
+        self.path = os.path.join(store.root, AGGREGATES)
+        self._lock = threading.RLock()
+        self._last_save = time.monotonic()
+        self._next_check = 0.0
+        self._dirty = False
+        self._clear()
+        self._load()
+        self.refresh(force=True)
+
+    def _clear(self):
+        self.offsets = {}
+        self.by_medicine = {}
+        self.by_hour = {}
+        self.rows = 0
+        self.recent = deque(maxlen=self.recent_size)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return  # Rebuilt from the segments by refresh()
+        self.offsets = state.get("offsets", {})
+        self.by_medicine = state.get("by_medicine", {})
+        self.by_hour = state.get("by_hour", {})
+        self.rows = state.get("rows", 0)
+        self.recent.extend(state.get("recent", []))
+
+    def save(self):
+        with self._lock:
+            state = {
+                "offsets": self.offsets,
+                "by_medicine": self.by_medicine,
+                "by_hour": self.by_hour,
+                "rows": self.rows,
+                "recent": list(self.recent),
+            }
+            self._dirty = False
+            self._last_save = time.monotonic()
+            payload = json.dumps(state, default=str)
+        # Per process and thread: the app and verify_batch.py may save the same file at once
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)  # Counters and offsets always move together
+
+    # --- WRITE PATH ---
+
+    def _apply(self, record):
+        medicine = str(record.get("medicine") or record.get("detected_id") or "")
+        status = str(record.get("status", ""))
+        per_status = self.by_medicine.setdefault(medicine, {})
+        per_status[status] = per_status.get(status, 0) + 1
+        hour = str(record.get("Timestamp", ""))[:13]
+        hourly = self.by_hour.setdefault(hour, {}).setdefault(medicine, {})
+        hourly[status] = hourly.get(status, 0) + 1
+        self.recent.append({key: record.get(key, "") for key in RECENT_FIELDS})
+        self.rows += 1
+
+    def _prune_hours(self):
+        if len(self.by_hour) > self.hours_kept:
+            for hour in sorted(self.by_hour)[:len(self.by_hour) - self.hours_kept]:
+                del self.by_hour[hour]
+
+    def observe(self, spans):
+        """
+        Called by the writer right after AuditStore.append(batch, spans):
+        `spans` maps day -> (start offset, end offset, records).
+        """
+        with self._lock:
+            for day, (start, end, records) in spans.items():
+                consumed = self.offsets.get(day, 0)
+                if consumed == start:
+                    for record in records:
+                        self._apply(record)
+                    self.offsets[day] = end
+                elif consumed < end:
+                    self._tail(day, end)
+                # consumed >= end: a refresh() already tail-read this batch
+            self._prune_hours()
+            self._dirty = True
+            if time.monotonic() - self._last_save >= self.save_interval:
+                self.save()
+
+    def _tail(self, day, end=None):
+        """Applies the records of `day` between the consumed offset and `end` (default: end of file)."""
+        path = self.store.segment_path(day)
+        start = self.offsets.get(day, 0)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            chunk = f.read() if end is None else f.read(end - start)
+        # Only complete lines; a concurrent append may be mid-write
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self.offsets[day] = start + len(complete)
+
+    def refresh(self, force=False):
+        """
+        Picks up records appended by other processes. Only segments at or
+        after the newest one already consumed are checked (older days are
+        immutable), unless `force` re-checks every day.
+        """
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        with self._lock:
+            newest = max(self.offsets, key=day_order, default=None)
+            newest_path = self.store.segment_path(newest) if newest is not None else None
+            if newest_path and (not os.path.exists(newest_path) or os.path.getsize(newest_path) < self.offsets[newest]):
+                # Ledger reset by another process: start over from whatever is there now
+                self._clear()
+                newest, force = None, True
+            changed = False
+            for day in self.store.days(newest_first=False):
+                if not force and day_order(day) < day_order(newest):
+                    continue
+                path = self.store.segment_path(day)
+                if os.path.exists(path) and os.path.getsize(path) > self.offsets.get(day, 0):
+                    self._tail(day)
+                    changed = True
+            if changed:
+                self._prune_hours()
+                self.save()
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    # --- READ PATH (independent of the ledger size) ---
+
+    def recent_records(self, n=None):
+        """Newest first."""
+        self.refresh()
+        with self._lock:
+            records = list(self.recent)
+        records.reverse()
+        return records[:n] if n else records
+
+    def total(self):
+        self.refresh()
+        return self.rows
+
+    def summary(self, hours=24):
+        """Scans per hour (last `hours` buckets), per-status totals and per-drug mismatch rates."""
+        self.refresh()
+        with self._lock:
+            hourly = [
+                {"hour": hour, "scans": sum(sum(s.values()) for s in meds.values()),
+                 "mismatches": sum(n for s in meds.values() for status, n in s.items() if status in MISMATCH_STATUSES)}
+                for hour, meds in sorted(self.by_hour.items())[-hours:]
+            ]
+            statuses = {}
+            drugs = []
+            for medicine, per_status in self.by_medicine.items():
+                scans = sum(per_status.values())
+                mismatches = sum(n for status, n in per_status.items() if status in MISMATCH_STATUSES)
+                for status, n in per_status.items():
+                    statuses[status] = statuses.get(status, 0) + n
+                drugs.append({"medicine": medicine, "scans": scans, "mismatches": mismatches,
+                              "mismatch_rate": round(mismatches / scans, 3) if scans else 0.0})
+            total = self.rows
+        drugs.sort(key=lambda d: -d["scans"])
+        return {"total": total, "statuses": statuses, "per_hour": hourly, "per_drug": drugs}
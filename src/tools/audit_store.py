@@ -0,0 +1,327 @@
+import csv
+import io
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl  # POSIX only; on Windows the in-process single writer is the guarantee
+except ImportError:
+    fcntl = None
+
+MANIFEST = "manifest.json"
+# Held (flock) by whichever process is appending, resetting or rewriting the manifest
+LOCK = ".lock"
+# Segment for legacy rows without a Timestamp; ordered before every dated day
+UNDATED = "undated"
+
+
+def _segment_day(record):
+    """Daily rotation key from the record's 'YYYY-MM-DD HH:MM:SS' timestamp."""
+    return str(record.get("Timestamp", ""))[:10] or UNDATED
+
+
+def day_order(day):
+    """Sort key for segment days, oldest first (undated rows are older than any dated one)."""
+    return (day != UNDATED, day)
+
+
+def _medicine(record):
+    return str(record.get("medicine") or record.get("detected_id") or "")
+
+
+class AuditStore:
+    """
+    Append-only audit ledger split into daily JSON-lines segments.
+
+        audit-2026-10-17.jsonl   one record per line, never rewritten
+        audit-2026-10-17.idx     sidecar: byte offset, timestamp, Transaction_ID, medicine
+        manifest.json            per-segment row counts / time bounds / medicine counts
+
+    Queries touch only the sidecars and seek straight to the rows they need,
+    so the Audit tab never loads the whole history.
+    Several processes may share one ledger (the app, verify_batch.py): writers
+    serialize on a lock file and merge into the manifest as it is on disk,
+    readers reload the manifest whenever another process replaced it.
+    """
+
+    def __init__(self, root="data/logs/audit"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index_cache = {}  # day -> (bytes of .idx already parsed, [entries])
+        self._manifest_stamp = None
+        self._manifest = {"segments": {}, "columns": []}
+        self._refresh_manifest()
+
+    # --- WRITE PATH (called from the AuditWriter thread) ---
+
+    def _path(self, day, ext):
+        return os.path.join(self.root, f"audit-{day}.{ext}")
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive across threads (self._lock) and processes (flock on the lock file)."""
+        with self._lock, open(os.path.join(self.root, LOCK), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                # Another process may have appended since we last looked: merge into its counts
+                self._refresh_manifest()
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _stamp(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh_manifest(self):
+        """Reloads manifest.json if it changed on disk since this process last read or wrote it."""
+        path = os.path.join(self.root, MANIFEST)
+        stamp = self._stamp(path)
+        if stamp == self._manifest_stamp:
+            return
+        if stamp is None:
+            self._manifest = {"segments": {}, "columns": []}  # Reset by another process
+        else:
+            with open(path, "r") as f:
+                self._manifest = json.load(f)
+        self._manifest_stamp = stamp
+
+    def _save_manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp, path)  # atomic, readers never see a half-written manifest
+        self._manifest_stamp = self._stamp(path)
+
+    def append(self, batch, spans=None):
+        """
+        Appends a batch of records to their day segments. Returns the files touched.
+        With a `spans` dict, fills day -> (start offset, end offset, records) for each segment written.
+        """
+        by_day = {}
+        for record in batch:
+            by_day.setdefault(_segment_day(record), []).append(record)
+
+        touched = []
+        with self._writing():
+            for day, records in by_day.items():
+                touched.extend(self._append_segment(day, records, spans))
+            self._save_manifest()
+        return touched
+
+    def _append_segment(self, day, records, spans=None):
+        seg_path, idx_path = self._path(day, "jsonl"), self._path(day, "idx")
+        meta = self._manifest["segments"].setdefault(
+            day, {"rows": 0, "first_ts": None, "last_ts": None, "medicines": {}}
+        )
+        columns = self._manifest["columns"]
+
+        # Called under _writing(): no other thread or process appends meanwhile
+        with open(seg_path, "ab") as seg, open(idx_path, "a", encoding="utf-8") as idx:
+            offset = start = seg.seek(0, os.SEEK_END)
+            lines, index_lines = [], []
+            for record in records:
+                line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+                ts, medicine = str(record.get("Timestamp", "")), _medicine(record)
+                index_lines.append(f"{offset}\t{ts}\t{record.get('Transaction_ID', '')}\t{medicine}\n")
+                lines.append(line)
+                offset += len(line)
+
+                meta["rows"] += 1
+                meta["first_ts"] = meta["first_ts"] or ts
+                meta["last_ts"] = ts
+                if medicine:
+                    meta["medicines"][medicine] = meta["medicines"].get(medicine, 0) + 1
+                for key in record:
+                    if key not in columns:
+                        columns.append(key)
+
+            seg.write(b"".join(lines))
+            idx.write("".join(index_lines))
+            seg.flush()
+            idx.flush()
+        if spans is not None:
+            spans[day] = (start, offset, records)
+        return seg_path, idx_path
+
+    def segment_path(self, day):
+        return self._path(day, "jsonl")
+
+    def sync(self, paths):
+        for path in paths:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def reset(self):
+        with self._writing():
+            for name in os.listdir(self.root):
+                if name.startswith("audit-") or name == MANIFEST:
+                    os.remove(os.path.join(self.root, name))
+            self._index_cache.clear()
+            self._manifest = {"segments": {}, "columns": []}
+            self._manifest_stamp = None
+
+    def import_csv(self, csv_path):
+        """One-off migration of the old single-file audit_trail.csv into segments."""
+        with open(csv_path, "r", newline="", encoding="utf-8") as f:
+            batch = []
+            for row in csv.DictReader(f):
+                batch.append(row)
+                if len(batch) >= 5000:
+                    self.append(batch)
+                    batch = []
+            if batch:
+                self.append(batch)
+
+    # --- READ PATH ---
+
+    def days(self, newest_first=True):
+        with self._lock:
+            self._refresh_manifest()
+            return sorted(self._manifest["segments"], key=day_order, reverse=newest_first)
+
+    def total_records(self):
+        with self._lock:
+            self._refresh_manifest()
+            return sum(meta["rows"] for meta in self._manifest["segments"].values())
+
+    def columns(self):
+        with self._lock:
+            self._refresh_manifest()
+            return list(self._manifest["columns"])
+
+    def segment_meta(self, day):
+        with self._lock:
+            return dict(self._manifest["segments"].get(day, {}))
+
+    def _index(self, day):
+        """Parsed sidecar for `day`; only the bytes appended since the last call are read."""
+        idx_path = self._path(day, "idx")
+        with self._lock:
+            read_upto, entries = self._index_cache.get(day, (0, []))
+            if not os.path.exists(idx_path):
+                return entries
+            size = os.path.getsize(idx_path)
+            if size < read_upto:
+                read_upto, entries = 0, []  # Ledger reset (possibly by another process) and refilled
+            if size <= read_upto:
+                return entries
+            with open(idx_path, "rb") as f:
+                f.seek(read_upto)
+                chunk = f.read(size - read_upto)
+            # Only consume complete lines; a concurrent append may be mid-write
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            for line in complete.decode("utf-8").splitlines():
+                offset, ts, txn, medicine = line.split("\t")
+                entries.append((int(offset), ts, txn, medicine))
+            self._index_cache[day] = (read_upto + len(complete), entries)
+            return entries
+
+    def _read_rows(self, day, offsets):
+        rows = []
+        with open(self._path(day, "jsonl"), "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                rows.append(json.loads(f.readline()))
+        return rows
+
+    def newest_page(self, page=1, rows_per_page=10):
+        """Page N (1-based) of the ledger, newest record first."""
+        skip = (page - 1) * rows_per_page
+        rows = []
+        for day in self.days():
+            rows_in_segment = self.segment_meta(day)["rows"]
+            if skip >= rows_in_segment:
+                # Whole segment lies before the requested page, its index is never read
+                skip -= rows_in_segment
+                continue
+            entries = self._index(day)
+            end = len(entries) - skip
+            start = max(0, end - (rows_per_page - len(rows)))
+            offsets = [e[0] for e in reversed(entries[start:end])]
+            rows.extend(self._read_rows(day, offsets))
+            skip = 0
+            if len(rows) >= rows_per_page:
+                break
+        return rows
+
+    def query_range(self, start_ts, end_ts):
+        """Records with start_ts <= Timestamp <= end_ts (same 'YYYY-MM-DD HH:MM:SS' format), oldest first."""
+        for day in self.days(newest_first=False):
+            meta = self.segment_meta(day)
+            if meta["last_ts"] < start_ts or meta["first_ts"] > end_ts:
+                continue
+            offsets = [e[0] for e in self._index(day) if start_ts <= e[1] <= end_ts]
+            yield from self._read_rows(day, offsets)
+
+    def medicine_records(self, medicine):
+        """Rows for one medicine across the ledger, from the manifest counts alone."""
+        with self._lock:
+            self._refresh_manifest()
+            return sum(meta["medicines"].get(medicine, 0) for meta in self._manifest["segments"].values())
+
+    def query_medicine(self, medicine, limit=None, offset=0):
+        """
+        Newest-first records for one medicine, skipping the newest `offset` of them (paging).
+        Segments without it, or lying wholly before the offset, are skipped via the manifest.
+        """
+        found = 0
+        for day in self.days():
+            in_segment = self.segment_meta(day)["medicines"].get(medicine, 0)
+            if not in_segment:
+                continue
+            if offset >= in_segment:
+                offset -= in_segment
+                continue
+            offsets = [e[0] for e in reversed(self._index(day)) if e[3] == medicine][offset:]
+            offset = 0
+            if limit is not None:
+                offsets = offsets[:limit - found]
+            for row in self._read_rows(day, offsets):
+                yield row
+            found += len(offsets)
+            if limit is not None and found >= limit:
+                return
+
+    def find_transaction(self, transaction_id):
+        for day in self.days():
+            for offset, _, txn, _ in self._index(day):
+                if txn == transaction_id:
+                    return self._read_rows(day, [offset])[0]
+        return None
+
+    def iter_csv(self, chunk_rows=5000):
+        """Streams the whole ledger as CSV text chunks, one segment at a time."""
+        columns = self.columns()
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        rows = 0
+        for day in self.days(newest_first=False):
+            with open(self._path(day, "jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    writer.writerow(json.loads(line))
+                    rows += 1
+                    if rows % chunk_rows == 0:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+        yield buffer.getvalue()
+
+    def export_csv(self, out_path):
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            for chunk in self.iter_csv():
+                f.write(chunk)
+        return out_path
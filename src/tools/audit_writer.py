@@ -0,0 +1,184 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from tools.audit_aggregates import AuditAggregates
+from tools.audit_store import AuditStore
+
+logger = logging.getLogger(__name__)
+
+# Batches that could not be appended after every retry, per process (one JSON record per line)
+SPILL_PATTERN = "unwritten-{pid}.jsonl"
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_audit_writer(log_dir, **kwargs):
+    """Returns the single process-wide writer for `log_dir` (every session shares it)."""
+    key = os.path.abspath(log_dir)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = AuditWriter(AuditStore(key), **kwargs)
+        return writer
+
+
+class AuditWriter:
+    """
+    Group-commit writer in front of the segmented AuditStore.
+    `submit` only enqueues (never blocks the video callback); a background
+    thread drains the queue in batches, appends them with one write and
+    fsyncs on a size/time policy. Pending records are flushed at exit.
+    Every appended batch also updates the dashboard aggregates.
+    A failed append is retried with exponential backoff; a batch that still
+    fails is written to unwritten-<pid>.jsonl in the ledger directory for
+    re-import (AuditStore.append), so no audit record is ever silently lost.
+    """
+
+    def __init__(self, store, max_queue=50000, max_batch=1000,
+                 flush_interval=0.25, fsync_every=5000, fsync_interval=1.0,
+                 max_retries=5, retry_delay=0.5, max_retry_delay=8.0):
+        self.store = store
+        self.aggregates = AuditAggregates(store)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._queue = queue.Queue(maxsize=max_queue)  # bounded memory
+        self._unsynced = 0
+        self._unsynced_paths = set()
+        self._last_sync = time.monotonic()
+        self._io_lock = threading.Lock()
+
+        # Counters for monitoring
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0      # failed append attempts
+        self.spilled = 0     # records written to the spill file instead of the ledger
+        self.lost = 0        # records neither appended nor spilled (both failed; logged)
+
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def submit(self, record):
+        """Non-blocking enqueue. Returns False if the queue is full and the record was dropped."""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _write_batch(self, batch):
+        try:
+            self._commit(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _append(self, batch):
+        spans = {}
+        self._unsynced_paths.update(self.store.append(batch, spans))
+        self.aggregates.observe(spans)
+        self._unsynced += len(batch)
+        now = time.monotonic()
+        if self._unsynced >= self.fsync_every or now - self._last_sync >= self.fsync_interval:
+            self._sync()
+        self.written += len(batch)
+
+    def _sync(self):
+        self.store.sync(self._unsynced_paths)
+        self._unsynced_paths.clear()
+        self._unsynced, self._last_sync = 0, time.monotonic()
+
+    def _drain(self, block):
+        """Collects up to `max_batch` records, waiting at most `flush_interval` for the first one."""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+            while len(batch) < self.max_batch:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _commit(self, batch):
+        """
+        Appends `batch` with retries and backoff (cut short by close()), then spills it.
+        A retry after a partial append may repeat some records; duplicates share a
+        Transaction_ID, while a dropped batch would leave a gap in the trail.
+        """
+        delay = self.retry_delay
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                with self._io_lock:
+                    self._append(batch)
+                return
+            except Exception:
+                self.errors += 1
+                logger.exception("audit append of %d records failed (attempt %d of %d)",
+                                 len(batch), attempt, self.max_retries + 1)
+            if attempt > self.max_retries or self._stopped.wait(delay):
+                break
+            delay = min(delay * 2, self.max_retry_delay)
+        self._spill(batch)
+
+    def _spill(self, batch):
+        path = os.path.join(self.store.root, SPILL_PATTERN.format(pid=os.getpid()))
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(record, default=str) + "\n" for record in batch))
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            self.lost += len(batch)
+            logger.critical("LOST %d audit records: ledger append and spill to %s both failed",
+                            len(batch), path, exc_info=True)
+            return
+        self.spilled += len(batch)
+        logger.error("%d audit records could not be appended; written to %s for re-import", len(batch), path)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write_batch(batch)
+
+    def flush(self):
+        """Synchronously writes and fsyncs everything queued so far."""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                break
+            self._write_batch(batch)
+        # Wait for a batch the worker may have picked up but not written yet
+        self._queue.join()
+        with self._io_lock:
+            if self._unsynced:
+                self._sync()
+            self.aggregates.save()
+
+    def reset(self):
+        """Empties the ledger (pending records are written first, then truncated away)."""
+        self.flush()
+        with self._io_lock:
+            self.store.reset()
+            self.aggregates.reset()
+            self._unsynced_paths.clear()
+            self._unsynced = 0
+
+    def close(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._worker.join(timeout=2)
+        self.flush()
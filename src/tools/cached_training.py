@@ -0,0 +1,65 @@
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils.torch_utils import de_parallel
+from tools.training_cache import ImageCache
+
+
+class MemmapYOLODataset(YOLODataset):
+    """
+    YOLODataset whose load_image() slices the pre-decoded memmap instead of
+    reading and resizing a JPEG. Images missing from the cache (or a cache
+    built at another imgsz) fall back to the stock loader.
+    """
+
+    def __init__(self, *args, image_cache=None, **kwargs):
+        self.image_cache = image_cache
+        super().__init__(*args, **kwargs)
+        if self.image_cache is not None and self.image_cache.imgsz != self.imgsz:
+            self.image_cache = None
+
+    def load_image(self, i, rect_mode=True):
+        if self.ims[i] is not None or self.image_cache is None or not rect_mode:
+            return super().load_image(i, rect_mode)
+        hit = self.image_cache.get(self.im_files[i])
+        if hit is None:
+            return super().load_image(i, rect_mode)
+        im, hw0, hw = hit
+        if self.augment:
+            # Same buffer bookkeeping as BaseDataset.load_image: mosaic samples from it
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, hw0, hw
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                if self.cache != "ram":
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return im, hw0, hw
+
+
+class CachedDetectionTrainer(DetectionTrainer):
+    """DetectionTrainer that reads training images from `cache_paths[mode]` (set before train())."""
+
+    cache_paths = {}
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        cache_path = self.cache_paths.get(mode)
+        if cache_path is None:
+            return super().build_dataset(img_path, mode, batch)
+        gs = max(int(de_parallel(self.model).stride.max() if self.model else 0), 32)
+        return MemmapYOLODataset(
+            img_path=img_path,
+            imgsz=self.args.imgsz,
+            batch_size=batch,
+            augment=mode == "train",
+            hyp=self.args,
+            rect=self.args.rect or mode == "val",
+            cache=None,
+            single_cls=self.args.single_cls or False,
+            stride=gs,
+            pad=0.0 if mode == "train" else 0.5,
+            prefix=f"{mode}: ",
+            task=self.args.task,
+            classes=self.args.classes,
+            data=self.data,
+            fraction=self.args.fraction if mode == "train" else 1.0,
+            image_cache=ImageCache(cache_path),
+        )
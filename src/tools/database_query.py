@@ -1,7 +1,5 @@
-import json
+from tools.inventory import get_inventory
 
 def get_medicine_data(pill_id):
-    # This simulates a real hospital database query
-    with open('data/inventory.json', 'r') as f:
-        db = json.load(f)
-    return db.get(pill_id)
\ No newline at end of file
+    # This simulates a real hospital database query (served from the shared in-memory index)
+    return get_inventory().get(pill_id)
\ No newline at end of file
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+# Used only when a source has no annotation for an image: the strip fills most of a product photo
+DEFAULT_LABEL = "0.5 0.5 0.8 0.8"
+
+
+def sanitize_folder_name(name):
+    """Removes all Windows illegal characters: < > : " / \\ | ? *"""
+    return re.sub(r'[<>:"/\\|?*]', ' ', name).strip()
+
+
+def search_query(info):
+    return sanitize_folder_name(f"{info['name']} {info['dose']} medicine packaging")
+
+
+# --- SOURCES ---
+
+# A source is anything with fetch(drug_id, inventory entry) -> [local image paths]
+
+class LocalDirSource:
+    """
+    Offline source: <root>/<drug_id>/ (or <root>/<search query>/) holding
+    images, optionally with a YOLO .txt label next to each one.
+    """
+
+    name = "local"
+
+    def __init__(self, root):
+        self.root = root
+
+    def fetch(self, drug_id, info):
+        for folder in (os.path.join(self.root, drug_id), os.path.join(self.root, search_query(info))):
+            if os.path.isdir(folder):
+                return sorted(
+                    os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)
+                )
+        return []
+
+
+class BingSource:
+    """Web image search via bing_image_downloader (one download folder per SKU)."""
+
+    name = "bing"
+
+    def __init__(self, temp_dir="dataset/temp_download", limit=15):
+        self.temp_dir = temp_dir
+        self.limit = limit
+
+    def fetch(self, drug_id, info):
+        from pathlib import Path
+        from bing_image_downloader import downloader
+
+        # Fixes the Path.isdir bug bing_image_downloader hits on Windows
+        Path.isdir = lambda self: os.path.isdir(self)
+        query = search_query(info)
+        downloader.download(query, limit=self.limit, output_dir=self.temp_dir,
+                            adult_filter_off=True, force_replace=False, verbose=False)
+        return LocalDirSource(self.temp_dir).fetch(drug_id, info)
+
+
+# --- IMAGE HELPERS ---
+
+def perceptual_hash(image):
+    """64-bit DCT pHash: survives re-encoding, resizing and small crops."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].ravel()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def resize_to(image, imgsz):
+    """Shrinks so the long side is `imgsz` (training resolution); never upscales."""
+    h, w = image.shape[:2]
+    scale = imgsz / max(h, w)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (int(round(w * scale)), int(round(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+class DatasetBuilder:
+    """
+    Builds dataset/images/train + dataset/labels/train from per-SKU sources,
+    one SKU per worker thread. Resumable: manifest.json records the SHA-256 of
+    every source file already ingested, so reruns only touch new or changed
+    images and nothing is ever deleted. Near-duplicates of an image already
+    kept for the same SKU (pHash distance <= `max_distance`) are skipped.
+    Images are resized to the training resolution once, here.
+    """
+
+    def __init__(self, inventory, source, images_dir="dataset/images/train", labels_dir="dataset/labels/train",
+                 manifest_path="dataset/manifest.json", imgsz=640, workers=8, max_distance=6):
+        self.inventory = inventory
+        self.class_index = {drug_id: i for i, drug_id in enumerate(inventory)}
+        self.source = source
+        self.images_dir = images_dir
+        self.labels_dir = labels_dir
+        self.manifest_path = manifest_path
+        self.imgsz = imgsz
+        self.workers = workers
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = 0
+        # Digests being ingested right now (the same file can come up for two SKUs at once)
+        self._reserved = set()
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        return {"files": {}}
+
+    def _save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with self._save_lock:
+            with self._lock:
+                payload = json.dumps(self.manifest, indent=1)
+                self._dirty = 0
+            with open(tmp, "w") as f:
+                f.write(payload)
+            os.replace(tmp, self.manifest_path)
+
+    def _ingest(self, drug_id, path, hashes):
+        """Returns 'added', 'known', 'duplicate' or 'error' for one source image."""
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self.manifest["files"] or digest in self._reserved:
+                return "known"
+            self._reserved.add(digest)
+        try:
+            return self._write_sample(drug_id, path, data, digest, hashes)
+        finally:
+            with self._lock:
+                self._reserved.discard(digest)
+
+    def _write_sample(self, drug_id, path, data, digest, hashes):
+        """Decodes, dedups and writes one reserved source file; records it in the manifest."""
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return "error"
+        phash = perceptual_hash(image)
+        duplicate = any(hamming(phash, other) <= self.max_distance for other in hashes)
+
+        entry = {"drug_id": drug_id, "source": path, "phash": f"{phash:016x}", "duplicate": duplicate}
+        if not duplicate:
+            stem = f"{drug_id}_{digest[:10]}"
+            cv2.imwrite(os.path.join(self.images_dir, stem + ".jpg"), resize_to(image, self.imgsz),
+                        [cv2.IMWRITE_JPEG_QUALITY, 95])
+            # Keep the source's own boxes if it has them (normalized coords survive the resize),
+            # but always with this inventory's class index
+            source_label = os.path.splitext(path)[0] + ".txt"
+            boxes = [DEFAULT_LABEL]
+            if os.path.exists(source_label):
+                with open(source_label, "r") as f:
+                    boxes = [line.split(maxsplit=1)[1].strip() for line in f if len(line.split()) == 5] or boxes
+            with open(os.path.join(self.labels_dir, stem + ".txt"), "w") as f:
+                f.write("\n".join(f"{self.class_index[drug_id]} {box}" for box in boxes))
+            entry["image"] = stem + ".jpg"
+            hashes.append(phash)
+
+        with self._lock:
+            self.manifest["files"][digest] = entry
+            self._dirty += 1
+        return "duplicate" if duplicate else "added"
+
+    def _build_one(self, drug_id):
+        stats = {"added": 0, "known": 0, "duplicate": 0, "error": 0}
+        # pHashes of images already kept for this SKU (earlier runs included)
+        with self._lock:
+            hashes = [int(e["phash"], 16) for e in self.manifest["files"].values()
+                      if e["drug_id"] == drug_id and not e.get("duplicate")]
+        try:
+            paths = self.source.fetch(drug_id, self.inventory[drug_id])
+        except Exception as e:
+            stats["error"] += 1
+            stats["msg"] = str(e)
+            return drug_id, stats
+        for path in paths:
+            try:
+                stats[self._ingest(drug_id, path, hashes)] += 1
+            except OSError:
+                stats["error"] += 1
+        if self._dirty >= 200:
+            self._save_manifest()  # Interrupted runs keep most of their progress
+        return drug_id, stats
+
+    def build(self, drug_ids=None, progress=None):
+        """Processes `drug_ids` (default: the whole inventory) concurrently. Returns per-SKU stats."""
+        os.makedirs(self.images_dir, exist_ok=True)
+        os.makedirs(self.labels_dir, exist_ok=True)
+        started = time.perf_counter()
+        report = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for drug_id, stats in pool.map(self._build_one, drug_ids or list(self.inventory)):
+                    report[drug_id] = stats
+                    if progress:
+                        progress(drug_id, stats)
+        finally:
+            self._save_manifest()
+        self.manifest["last_build"] = {"seconds": round(time.perf_counter() - started, 1), "skus": len(report)}
+        self._save_manifest()
+        return report
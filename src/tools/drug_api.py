@@ -1,4 +1,314 @@
-def check_external_interactions(drug_name):
-    # Simulated API call to a global drug interaction database
-    # In a real 2026 app, this would call an FDA or specialized medical API
-    return "No critical interactions found."
\ No newline at end of file
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from tools.inventory import get_inventory
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# File-based stand-in for the external interaction database
+INTERACTIONS_PATH = os.environ.get("PHARMA_INTERACTIONS", os.path.join(PROJECT_ROOT, "data", "interactions.json"))
+# Remote interaction API for InteractionClient (unset = local engine only)
+INTERACTION_API = os.environ.get("PHARMA_INTERACTION_API", "")
+
+SEVERITIES = ("none", "minor", "moderate", "major")
+# Salt / counter-ion words dropped when normalizing ("metformin hydrochloride" -> "metformin")
+SALTS = {"hydrochloride", "hcl", "sodium", "potassium", "calcium", "chloride", "mesylate", "maleate",
+         "succinate", "tartrate", "besylate", "citrate", "sulfate", "sulphate", "phosphate", "hyclate"}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_interaction_engine(path=None, inventory_path=None):
+    """Process-wide engine for `path` (PharmaAgent, the UI and the client share one)."""
+    key = (os.path.abspath(path or INTERACTIONS_PATH), inventory_path)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = InteractionEngine(key[0], get_inventory(inventory_path))
+        return engine
+
+
+def normalize_ingredient(name, synonyms=None):
+    """'Metformin Hydrochloride' -> 'metformin', 'Acetaminophen' -> 'paracetamol' (with the dataset's synonyms)."""
+    synonyms = synonyms or {}
+    token = re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+    token = synonyms.get(token, token)
+    words = [w for w in token.split('_') if w not in SALTS]
+    if words:
+        token = '_'.join(words)
+    return synonyms.get(token, token)
+
+
+def ingredients_from_id(drug_id):
+    """'drug_paracetamol_650' -> 'paracetamol': single-ingredient SKUs are named after their ingredient."""
+    return re.sub(r'(_\d+)+$', '', re.sub(r'^drug_', '', drug_id))
+
+
+class InteractionEngine:
+    """
+    Interaction dataset compiled into a compact lookup:
+      - every SKU resolves to ingredient ids (dataset `products`, an inventory
+        entry's own `ingredients`, or the ingredient its id is named after)
+      - class rules ("nsaid" x "anticoagulant") are expanded once into an
+        (m, m) uint8 severity matrix over the m ingredients that interact
+        with anything; all others map to row -1 and cost nothing
+    Checking an order of k SKUs is then one k x k fancy-index into that
+    matrix, independent of how many SKUs the inventory holds. The dataset
+    file and the inventory are hot-reloaded the same way InventoryService is.
+    """
+
+    def __init__(self, path, inventory, check_interval=2.0, pair_cache_size=4096):
+        self.path = path
+        self.inventory = inventory
+        self.check_interval = check_interval
+        self.pair_cache_size = pair_cache_size
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._inventory_version = None
+        self._next_check = 0.0
+        self._load()
+
+    def _load(self):
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        synonyms = data.get("synonyms", {})
+        norm = lambda name: normalize_ingredient(name, synonyms)
+        classes = {name: {norm(i) for i in members} for name, members in data.get("classes", {}).items()}
+
+        # Rules -> per ingredient pair (severity code, effect); the most severe rule wins
+        pairs = {}
+        for rule in data.get("rules", []):
+            code = SEVERITIES.index(rule["severity"])
+            side_a = classes.get(rule["a"]) or {norm(rule["a"])}
+            side_b = classes.get(rule["b"]) or {norm(rule["b"])}
+            for a in side_a:
+                for b in side_b:
+                    if a == b:
+                        continue  # Same ingredient twice is reported as a duplicate instead
+                    key = (a, b) if a < b else (b, a)
+                    if code > pairs.get(key, (0, ""))[0]:
+                        pairs[key] = (code, rule.get("effect", ""))
+
+        interacting = sorted({i for pair in pairs for i in pair})
+        row_of = {name: r for r, name in enumerate(interacting)}
+        matrix = np.zeros((len(interacting), len(interacting)), dtype=np.uint8)
+        effects = {}
+        for (a, b), (code, effect) in pairs.items():
+            ra, rb = row_of[a], row_of[b]
+            matrix[ra, rb] = matrix[rb, ra] = code
+            effects[(min(ra, rb), max(ra, rb))] = effect
+
+        products = {drug_id: [norm(i) for i in ings] for drug_id, ings in data.get("products", {}).items()}
+        tables = (synonyms, products, row_of)
+        drugs = {drug_id: self._compile(drug_id, tables) for drug_id in list(self.inventory.ids()) + list(products)}
+        # Swap everything at once so readers never mix old and new tables
+        self._snapshot = (tables, matrix, effects, drugs)
+        self._pair = lru_cache(maxsize=self.pair_cache_size)(self._pair_uncached)
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self._inventory_version = self.inventory.version
+
+    def _compile(self, drug_id, tables):
+        """(ingredient names, matrix rows) for one SKU; rows are -1 for non-interacting ingredients."""
+        synonyms, products, row_of = tables
+        info = self.inventory.get(drug_id) or {}
+        if info.get("ingredients"):
+            names = [normalize_ingredient(i, synonyms) for i in info["ingredients"]]
+        else:
+            names = products.get(drug_id) or [normalize_ingredient(ingredients_from_id(drug_id), synonyms)]
+        names = list(dict.fromkeys(names))
+        return names, np.array([row_of.get(n, -1) for n in names], dtype=np.int32)
+
+    def _fresh(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._next_check = now + self.check_interval
+                    try:
+                        if (os.stat(self.path).st_mtime_ns != self._mtime
+                                or self.inventory.version != self._inventory_version):
+                            self._load()
+                    except (OSError, ValueError, KeyError):
+                        pass  # Keep serving the last good tables while the file is being rewritten
+        return self._snapshot
+
+    def _entry(self, snapshot, drug_id):
+        tables, _, _, drugs = snapshot
+        entry = drugs.get(drug_id)
+        if entry is None:
+            # SKU unknown at build time: compile once and keep it
+            entry = drugs[drug_id] = self._compile(drug_id, tables)
+        return entry
+
+    def ingredients(self, drug_id):
+        """(normalized ingredient names, severity-matrix rows) for one SKU."""
+        return self._entry(self._fresh(), drug_id)
+
+    def check(self, order_ids, patient_meds=()):
+        """
+        Every interaction among `order_ids` and between them and `patient_meds`
+        (the patient's existing meds are not re-checked against each other),
+        plus ingredients duplicated across items. Most severe first.
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        meds = [m for m in dict.fromkeys(patient_meds) if m not in order_ids]
+        items = order_ids + meds
+        if len(items) < 2:
+            return []
+        snapshot = self._fresh()
+        _, matrix, effects, _ = snapshot
+        names, rows, owner = [], [], []
+        for pos, drug_id in enumerate(items):
+            ing_names, ing_rows = self._entry(snapshot, drug_id)
+            names += ing_names
+            rows.append(ing_rows)
+            owner += [pos] * len(ing_names)
+        rows = np.concatenate(rows)
+        owner = np.asarray(owner)
+        # Pairs of ingredients from different items where the first item is on the order
+        cross = (owner[:, None] < owner[None, :]) & (owner[:, None] < len(order_ids))
+
+        hits = []
+        valid = rows >= 0
+        if valid.sum() > 1:
+            idx = np.flatnonzero(valid)
+            codes = matrix[np.ix_(rows[idx], rows[idx])]
+            for i, j in zip(*np.nonzero((codes > 0) & cross[np.ix_(idx, idx)])):
+                a, b = idx[i], idx[j]
+                ra, rb = rows[a], rows[b]
+                hits.append(self._hit(items, owner, names, a, b, len(order_ids), SEVERITIES[codes[i, j]],
+                                      effects[(min(ra, rb), max(ra, rb))]))
+
+        same = np.asarray(names, dtype=object)
+        for a, b in zip(*np.nonzero((same[:, None] == same[None, :]) & cross)):
+            hits.append(self._hit(items, owner, names, a, b, len(order_ids), "moderate",
+                                  f"Both contain {names[a]}: duplicate dose / overdose risk.", kind="duplicate"))
+        hits.sort(key=lambda h: -SEVERITIES.index(h["severity"]))
+        return hits
+
+    @staticmethod
+    def _hit(items, owner, names, a, b, n_order, severity, effect, kind="interaction"):
+        return {
+            "drug_a": items[owner[a]],
+            "drug_b": items[owner[b]],
+            "ingredients": (names[a], names[b]),
+            "severity": severity,
+            "effect": effect,
+            "kind": kind,
+            "patient_med": bool(owner[b] >= n_order),
+        }
+
+    def _pair_uncached(self, drug_a, drug_b):
+        return tuple(self.check([drug_a, drug_b]))
+
+    def pair(self, drug_a, drug_b):
+        """Interactions between two SKUs, LRU-cached (the cache is dropped on reload)."""
+        self._fresh()
+        key = (drug_a, drug_b) if drug_a < drug_b else (drug_b, drug_a)
+        return list(self._pair(*key))
+
+    def ingredient_pair(self, ing_a, ing_b):
+        """(severity, effect) for two normalized ingredients, or None."""
+        (_, _, row_of), matrix, effects, _ = self._fresh()
+        ra, rb = row_of.get(ing_a, -1), row_of.get(ing_b, -1)
+        if ra < 0 or rb < 0 or not matrix[ra, rb]:
+            return None
+        return SEVERITIES[matrix[ra, rb]], effects[(min(ra, rb), max(ra, rb))]
+
+
+def summarize(hits):
+    """Overall verdict for a list of hits: DANGER (any major), WARNING (any other) or SAFE."""
+    if any(h["severity"] == "major" for h in hits):
+        return "DANGER"
+    return "WARNING" if hits else "SAFE"
+
+
+class InteractionClient:
+    """
+    Async front end for interaction checks. Without an API URL it answers from
+    the local engine. With one, every cross-item ingredient pair not already in
+    the LRU is POSTed to the API as {"pairs": [[a, b], ...]}; the API is
+    expected to answer {"interactions": [{"a", "b", "severity", "effect"}]}.
+    The local engine answers whenever the API is slow or unreachable.
+    """
+
+    def __init__(self, engine=None, api_url=INTERACTION_API, timeout=2.0, cache_size=4096):
+        self.engine = engine or get_interaction_engine()
+        self.api_url = api_url
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    async def check(self, order_ids, patient_meds=()):
+        if not self.api_url:
+            return self.engine.check(order_ids, patient_meds)
+
+        order_ids = list(dict.fromkeys(order_ids))
+        meds = [m for m in dict.fromkeys(patient_meds) if m not in order_ids]
+        items = order_ids + meds
+        pairs = []
+        for i, drug_a in enumerate(order_ids):
+            for j in range(i + 1, len(items)):
+                for ing_a in self.engine.ingredients(drug_a)[0]:
+                    for ing_b in self.engine.ingredients(items[j])[0]:
+                        if ing_a != ing_b:
+                            pairs.append((i, j, ing_a, ing_b))
+
+        missing = list({self._key(a, b) for _, _, a, b in pairs if self._key(a, b) not in self._cache})
+        if missing:
+            try:
+                fetched = await asyncio.wait_for(asyncio.to_thread(self._post, missing), self.timeout)
+            except (OSError, ValueError, KeyError, asyncio.TimeoutError):
+                return self.engine.check(order_ids, patient_meds)
+            for key in missing:
+                self._remember(key, fetched.get(key))
+
+        # Duplicated ingredients never need the API
+        hits = [h for h in self.engine.check(order_ids, patient_meds) if h["kind"] == "duplicate"]
+        for i, j, ing_a, ing_b in pairs:
+            key = self._key(ing_a, ing_b)
+            found = self._cache.get(key)
+            if found:
+                self._cache.move_to_end(key)
+                hits.append({"drug_a": items[i], "drug_b": items[j], "ingredients": (ing_a, ing_b),
+                             "severity": found[0], "effect": found[1], "kind": "interaction",
+                             "patient_med": j >= len(order_ids)})
+        hits.sort(key=lambda h: -SEVERITIES.index(h["severity"]))
+        return hits
+
+    @staticmethod
+    def _key(a, b):
+        return (a, b) if a < b else (b, a)
+
+    def _remember(self, key, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _post(self, pairs):
+        request = urllib.request.Request(self.api_url, data=json.dumps({"pairs": pairs}).encode(),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            payload = json.load(response)
+        return {self._key(i["a"], i["b"]): (i["severity"], i.get("effect", "")) for i in payload.get("interactions", [])}
+
+
+def check_external_interactions(drug_name, current_meds=()):
+    """
+    Interaction summary for one drug (inventory name or id) against the
+    patient's current meds (ids), from the local interaction engine.
+    """
+    engine = get_interaction_engine()
+    drug_id = engine.inventory.id_for_name(drug_name) or drug_name
+    hits = engine.check([drug_id], current_meds)
+    if not hits:
+        return "No critical interactions found."
+    return " ".join(f"[{h['severity'].upper()}] {h['drug_a']} + {h['drug_b']}: {h['effect']}" for h in hits)
@@ -0,0 +1,63 @@
+import os
+import cv2
+import numpy as np
+
+# ImageNet statistics, what off-the-shelf backbones (MobileNet, EfficientNet, ResNet) expect
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+class CropEmbedder:
+    """
+    Turns strip/box crops into L2-normalized vectors for SKU re-identification.
+    With an ONNX backbone (any ImageNet classifier exported with its pooled
+    features as output) it runs one batched ORT call per frame; without one it
+    falls back to a colour-histogram + thumbnail descriptor, which is weaker
+    but needs no model file. `name` is stored in the index so vectors from
+    different embedders are never mixed.
+    """
+
+    def __init__(self, model_path=None, input_size=224, threads=1):
+        self.input_size = input_size
+        self.session = None
+        if model_path and os.path.exists(model_path):
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            # Crops are few and small; leave the cores to the detector
+            options.intra_op_num_threads = threads
+            self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            self.input_name = self.session.get_inputs()[0].name
+            self.name = os.path.basename(model_path)
+        else:
+            self.name = "colorhist-v1"
+
+    def _prepare(self, crop, bgr):
+        rgb = crop[..., ::-1] if bgr else crop
+        resized = cv2.resize(np.ascontiguousarray(rgb), (self.input_size, self.input_size), interpolation=cv2.INTER_AREA)
+        return ((resized.astype(np.float32) / 255.0 - MEAN) / STD).transpose(2, 0, 1)
+
+    @staticmethod
+    def _handcrafted(crop, bgr):
+        hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV if bgr else cv2.COLOR_RGB2HSV)
+        hist = cv2.calcHist([hsv], [0, 1, 2], None, [8, 4, 4], [0, 180, 0, 256, 0, 256]).ravel()
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY if bgr else cv2.COLOR_RGB2GRAY)
+        thumb = cv2.resize(gray, (8, 8), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+        thumb -= thumb.mean()
+        hist /= hist.sum() + 1e-7
+        return np.concatenate((np.sqrt(hist), thumb / (np.linalg.norm(thumb) + 1e-7)))
+
+    def embed(self, crops, fmt="bgr24"):
+        """List of HxWx3 crops -> (N, D) float32, unit length rows."""
+        if not crops:
+            return np.zeros((0, 0), dtype=np.float32)
+        bgr = fmt == "bgr24"
+        if self.session is not None:
+            batch = np.stack([self._prepare(crop, bgr) for crop in crops])
+            vectors = self.session.run(None, {self.input_name: batch})[0].reshape(len(crops), -1)
+        else:
+            vectors = np.stack([self._handcrafted(crop, bgr) for crop in crops])
+        vectors = vectors.astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-7
+        return vectors
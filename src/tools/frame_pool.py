@@ -0,0 +1,23 @@
+import numpy as np
+
+
+class FramePool:
+    """
+    Per-stream pool of reusable frame buffers.
+    Live video keeps the same resolution, so after the first frame every
+    conversion target comes from here instead of a fresh allocation.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+        self.allocations = 0
+
+    def get(self, role, shape, dtype=np.uint8):
+        key = (role, tuple(shape), np.dtype(dtype).str)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            # Resolution changed (or first frame): drop stale buffers for this role
+            self._buffers = {k: v for k, v in self._buffers.items() if k[0] != role}
+            buffer = self._buffers[key] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return buffer
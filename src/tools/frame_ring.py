@@ -0,0 +1,64 @@
+import os
+import queue
+import uuid
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class FrameRing:
+    """
+    Fixed-size frame slots in one shared-memory block, owned by the client
+    side of the inference server. A frame is copied into a free slot once;
+    only (ring name, slot, shape) crosses the socket and the server reads the
+    pixels in place. Slots are handed out by acquire() and returned with
+    release() once the server has answered for them.
+    """
+
+    def __init__(self, slots=8, slot_bytes=1920 * 1080 * 3):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.name = f"pharma_ring_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=slots * slot_bytes)
+        self._free = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def fits(self, frame):
+        return frame.nbytes <= self.slot_bytes
+
+    def acquire(self, timeout=None):
+        """Blocks until a slot is free (raises queue.Empty after `timeout`)."""
+        return self._free.get(timeout=timeout)
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def write(self, slot, frame):
+        np.copyto(slot_view(self.shm, self.slot_bytes, slot, frame.shape), frame)
+
+    def close(self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def slot_view(shm, slot_bytes, slot, shape):
+    """uint8 array over one slot of a ring (no copy)."""
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+
+
+def attach_ring(name):
+    """
+    Opens a ring created by another process. The creator owns its lifetime,
+    so this side must not let Python's resource tracker unlink it on exit.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
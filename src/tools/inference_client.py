@@ -0,0 +1,168 @@
+import atexit
+import itertools
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing.connection import Client
+from tools.frame_ring import FrameRing
+from tools.inference_server import INFERENCE_ADDR, inference_key, parse_address
+
+
+class InferenceClient:
+    """
+    Same submit()/detect() interface as InferenceScheduler, backed by the
+    out-of-process InferenceServer. Each frame is copied once into a slot of
+    this process's shared-memory FrameRing and only the slot reference is
+    sent; the UI process does no model work and holds no model memory.
+    A lost server fails the in-flight frames and is reconnected lazily.
+    A frame not answered within `request_timeout` fails with TimeoutError
+    and its slot is returned, so a stuck server can never drain the ring.
+    """
+
+    def __init__(self, address=INFERENCE_ADDR, authkey=None, slots=8, slot_bytes=1920 * 1080 * 3,
+                 slot_timeout=5.0, reconnect_interval=2.0, request_timeout=10.0):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.authkey = inference_key(authkey)
+        self.slot_timeout = slot_timeout
+        self.request_timeout = request_timeout
+        self.reconnect_interval = reconnect_interval
+        self.ring = FrameRing(slots, slot_bytes)
+        atexit.register(self.ring.close)
+        self._ids = itertools.count()
+        self._pending = {}
+        self._send_lock = threading.Lock()
+        self._conn = None
+        self._next_connect = 0.0
+        # Simple counters for the ops panel, as on InferenceScheduler
+        self.frames_run = 0
+        self.timeouts = 0
+        # Fails fast at startup (OSError) when no server is listening
+        self._connect()
+
+    def _connect(self):
+        conn = Client(self.address, authkey=self.authkey)
+        conn.send(("hello",))
+        _, info = conn.recv()
+        self.names = info["names"]
+        self.imgsz = info["imgsz"]
+        self.server_info = info
+        self._conn = conn
+        threading.Thread(target=self._receive, args=(conn,), name="inference-client", daemon=True).start()
+
+    def _ensure_connected(self):
+        if self._conn is not None:
+            return
+        now = time.monotonic()
+        if now < self._next_connect:
+            raise ConnectionError("inference server unavailable")
+        self._next_connect = now + self.reconnect_interval
+        self._connect()
+
+    def submit(self, frame, classes=None, bgr=True, timeout=None):
+        """
+        Queues one frame on the server. Returns a Future resolving to (boxes, scores, class_ids),
+        failed with TimeoutError after `timeout` (default: request_timeout).
+        """
+        return self._submit(frame, classes, bgr, timeout)[1]
+
+    def _submit(self, frame, classes, bgr, timeout):
+        future = Future()
+        slot = req_id = None
+        try:
+            with self._send_lock:
+                self._ensure_connected()
+            inline = None
+            if self.ring.fits(frame):
+                slot = self.ring.acquire(timeout=self.slot_timeout)
+                self.ring.write(slot, frame)
+            else:
+                inline = frame  # Larger than a slot: correct but pickled, so size the ring for the camera
+            req_id = next(self._ids)
+            deadline = time.monotonic() + (timeout or self.request_timeout)
+            self._pending[req_id] = (future, slot, deadline)
+            with self._send_lock:
+                self._conn.send(("detect", req_id, self.ring.name, self.ring.slot_bytes, slot,
+                                 frame.shape, bgr, classes, inline))
+        except Exception as e:
+            if isinstance(e, OSError):
+                # Fails (and frees) everything in flight, this frame included
+                self._disconnect(self._conn)
+            # The slot is still ours unless _disconnect already failed (and freed) this frame
+            if (req_id is None or self._pending.pop(req_id, None) is not None) and slot is not None:
+                self.ring.release(slot)
+            if not future.done():
+                future.set_exception(e)
+        return req_id, future
+
+    def detect(self, frame, classes=None, bgr=True, timeout=None):
+        """Blocking helper used inside `recv`: submit and wait for this stream's result."""
+        req_id, future = self._submit(frame, classes, bgr, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            self._expire(req_id)
+            raise
+
+    def _expire(self, req_id):
+        """Gives up on a request: its slot goes back to the ring and a late answer is ignored."""
+        entry = self._pending.pop(req_id, None)
+        if entry is None:
+            return
+        future, slot, _ = entry
+        if slot is not None:
+            self.ring.release(slot)
+        self.timeouts += 1
+        if not future.done():
+            future.set_exception(TimeoutError("inference server did not answer in time"))
+
+    def _expire_overdue(self):
+        now = time.monotonic()
+        for req_id, (_, _, deadline) in list(self._pending.items()):
+            if now >= deadline:
+                self._expire(req_id)
+
+    def _receive(self, conn):
+        next_sweep = 0.0
+        while True:
+            try:
+                ready = conn.poll(0.25)
+                if time.monotonic() >= next_sweep:
+                    self._expire_overdue()
+                    next_sweep = time.monotonic() + 0.25
+                if not ready:
+                    continue
+                _, req_id, detection, error = conn.recv()
+            except (EOFError, OSError):
+                break
+            entry = self._pending.pop(req_id, None)
+            if entry is None:
+                continue  # Expired, or failed by a disconnect
+            future, slot, _ = entry
+            if slot is not None:
+                self.ring.release(slot)
+            self.frames_run += 1
+            if error is None:
+                future.set_result(detection)
+            else:
+                future.set_exception(RuntimeError(f"inference worker: {error}"))
+        self._disconnect(conn)
+
+    def _disconnect(self, conn):
+        with self._send_lock:
+            if conn is None or self._conn is not conn:
+                return
+            self._conn = None
+        # Everything in flight on that connection is lost: fail it and free the slots
+        for req_id in list(self._pending):
+            entry = self._pending.pop(req_id, None)
+            if entry is None:
+                continue
+            future, slot, _ = entry
+            if slot is not None:
+                self.ring.release(slot)
+            if not future.done():
+                future.set_exception(ConnectionError("inference server connection lost"))
+
+    def stats(self):
+        return {"server": self.server_info, "in_flight": len(self._pending), "frames_run": self.frames_run,
+                "timeouts": self.timeouts, "connected": self._conn is not None}
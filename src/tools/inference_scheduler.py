@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class InferenceScheduler:
+    """
+    Central micro-batcher shared by every live WebRTC session.
+    Each stream submits its frame and waits on a Future; one worker thread
+    gathers pending frames (up to `max_batch`, or until `max_wait_ms` passes)
+    and runs them through a single batched engine call.
+    """
+
+    def __init__(self, engine, max_batch=8, max_wait_ms=10):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+
+        # Simple counters for sizing hardware (read by benchmarks / ops panel)
+        self.batches_run = 0
+        self.frames_run = 0
+
+        self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, frame, classes=None, bgr=True):
+        """Queues one frame. Returns a Future resolving to (boxes, scores, class_ids)."""
+        future = Future()
+        self._queue.put((frame, classes, bgr, future))
+        return future
+
+    def detect(self, frame, classes=None, bgr=True, timeout=None):
+        """Blocking helper used inside `recv`: submit and wait for this stream's result."""
+        return self.submit(frame, classes, bgr).result(timeout=timeout)
+
+    def _collect(self):
+        """Blocks for the first frame, then keeps filling the batch until it is full or the wait expires."""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            # Frames with a different channel order cannot share one preprocess call
+            for bgr in (True, False):
+                group = [item for item in batch if item[2] == bgr]
+                if not group:
+                    continue
+                try:
+                    results = self.engine.detect_batch(
+                        [item[0] for item in group], [item[1] for item in group], bgr=bgr
+                    )
+                    for item, result in zip(group, results):
+                        item[3].set_result(result)
+                except Exception as e:
+                    for item in group:
+                        item[3].set_exception(e)
+
+            self.batches_run += 1
+            self.frames_run += len(batch)
+
+    def stop(self):
+        self._stopped.set()
+        self._worker.join(timeout=1)
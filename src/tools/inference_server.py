@@ -0,0 +1,333 @@
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.connection import Listener, wait
+import numpy as np
+from tools.frame_ring import attach_ring, slot_view
+
+# host:port (or a unix socket path) of the inference server; the app connects here with PHARMA_VISION_BACKEND=server
+INFERENCE_ADDR = os.environ.get("PHARMA_INFERENCE_ADDR", "127.0.0.1:8503")
+# Rings a worker keeps mapped; older ones (clients that went away) are closed
+MAX_ATTACHED_RINGS = 16
+
+
+def parse_address(text):
+    """'host:port' -> (host, port); anything else ('/run/pharma/inference.sock') is a unix socket path."""
+    if ":" not in text:
+        return text
+    host, port = text.rsplit(":", 1)
+    return host, int(port)
+
+
+def inference_key(authkey=None):
+    """
+    Shared secret of the server and its clients: `authkey`, else PHARMA_INFERENCE_KEY.
+    Connections carry pickles, so there is no default; a missing or empty key is refused.
+    """
+    if authkey is None:
+        authkey = os.environ.get("PHARMA_INFERENCE_KEY", "")
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    if not authkey:
+        raise RuntimeError("PHARMA_INFERENCE_KEY is not set: the inference server needs a shared secret")
+    return authkey
+
+
+def plan_cores(workers, cores_per_worker=None):
+    """Disjoint core sets, one per worker, from the cores this process may run on."""
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    per_worker = cores_per_worker or max(1, len(available) // workers)
+    plan = []
+    for i in range(workers):
+        cores = available[i * per_worker:(i + 1) * per_worker]
+        # More workers than cores: wrap around rather than leave a worker unpinned
+        plan.append(cores or [available[i % len(available)]])
+    return plan
+
+
+def _collect(conn, max_batch, max_wait):
+    """
+    First request (blocking), then more until the batch is full or `max_wait`
+    passes. Returns (batch, stop); None from the server means stop.
+    """
+    first = conn.recv()
+    if first is None:
+        return [], True
+    batch = [first]
+    deadline = time.perf_counter() + max_wait
+    while len(batch) < max_batch:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0 or not conn.poll(remaining):
+            break
+        item = conn.recv()
+        if item is None:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+def worker_main(index, model_path, cores, max_batch, max_wait_ms, conn):
+    """
+    One inference worker process: pinned to `cores`, its own OnnxEngine with
+    one intra-op thread per core, frames read in place from the clients' rings.
+    Requests and results travel over `conn`, this worker's own pipe to the server.
+    """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    from tools.onnx_engine import OnnxEngine
+
+    engine = OnnxEngine(model_path, conf=0.45, max_batch=max_batch, threads=len(cores))
+    engine.detect_batch([np.zeros((640, 640, 3), dtype=np.uint8)] * engine.max_batch)
+    conn.send(("ready", {"names": engine.names, "imgsz": engine.imgsz[0], "max_batch": engine.max_batch,
+                         "cores": cores, "session_load_ms": engine.session_load_ms}))
+
+    rings = OrderedDict()
+
+    def frame_of(request):
+        if request["inline"] is not None:
+            return request["inline"]
+        shm = rings.get(request["ring"])
+        if shm is None:
+            shm = rings[request["ring"]] = attach_ring(request["ring"])
+            while len(rings) > MAX_ATTACHED_RINGS:
+                rings.popitem(last=False)[1].close()
+        rings.move_to_end(request["ring"])
+        return slot_view(shm, request["slot_bytes"], request["slot"], request["shape"])
+
+    stop = False
+    while not stop:
+        try:
+            batch, stop = _collect(conn, engine.max_batch, max_wait_ms / 1000.0)
+        except EOFError:
+            break  # Server gone
+        # Frames with a different channel order cannot share one preprocess call
+        for bgr in (True, False):
+            group = [r for r in batch if r["bgr"] == bgr]
+            if not group:
+                continue
+            try:
+                detections = engine.detect_batch([frame_of(r) for r in group], [r["classes"] for r in group], bgr=bgr)
+                for r, detection in zip(group, detections):
+                    conn.send(("result", r["conn"], r["id"], detection, None))
+            except Exception as e:
+                for r in group:
+                    conn.send(("result", r["conn"], r["id"], None, repr(e)))
+    for shm in rings.values():
+        shm.close()
+
+
+class _Worker:
+    """Server-side handle of one worker process and the requests it holds."""
+
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.ready = False
+        self.info = None
+        # (client conn id, request id) sent to this worker and not answered yet
+        self.in_flight = set()
+
+
+class InferenceServer:
+    """
+    Hosts the vision model outside the Streamlit process.
+    `workers` processes (spawned, each pinned to its own cores) each get
+    their own pipe; the server hands every request to the least-loaded
+    ready worker, so capacity scales with workers, not with UI sessions.
+    A worker that dies (crash, OOM kill) fails exactly the requests it held
+    and is respawned on the same cores. Clients (see InferenceClient) send
+    only slot references into their shared-memory FrameRing; the pixels are
+    never serialized. This process only routes small control messages and results.
+    """
+
+    def __init__(self, model_path, address=INFERENCE_ADDR, workers=2, cores_per_worker=None,
+                 max_batch=4, max_wait_ms=5, authkey=None):
+        self.authkey = inference_key(authkey)  # Refuse to start without a secret, before any worker spawns
+        self.model_path = model_path
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.workers = workers
+        self.core_plan = plan_cores(workers, cores_per_worker)
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.info = None
+        self._conns = {}
+        self._conns_lock = threading.Lock()
+        self._conn_ids = itertools.count()
+        self._listener = None
+        self._ctx = mp.get_context("spawn")
+        self._workers = []
+        self._workers_lock = threading.RLock()
+        self._stopping = False
+        self.frames_by_worker = [0] * workers
+        self.restarts = 0
+
+    def _spawn(self, index):
+        server_end, worker_end = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=worker_main, name=f"inference-worker-{index}", daemon=True,
+            args=(index, self.model_path, self.core_plan[index], self.max_batch, self.max_wait_ms, worker_end),
+        )
+        process.start()
+        worker_end.close()  # Only the child keeps it, so a dead worker reads as EOF here
+        return _Worker(index, process, server_end)
+
+    def start(self, timeout=300):
+        """Spawns the workers and waits until every one has loaded and warmed up its model."""
+        self._workers = [self._spawn(index) for index in range(self.workers)]
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError(f"inference worker {worker.index} did not start")
+            _, worker.info = worker.conn.recv()
+            worker.ready = True
+        first = self._workers[0].info
+        self.info = {"names": first["names"], "imgsz": first["imgsz"], "workers": len(self._workers),
+                     "cores": [w.info["cores"] for w in self._workers]}
+        threading.Thread(target=self._route, name="inference-router", daemon=True).start()
+        self._listener = Listener(self.address, authkey=self.authkey)
+        return self.info
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break  # Listener closed by stop()
+            except mp.AuthenticationError:
+                continue
+            conn_id = next(self._conn_ids)
+            with self._conns_lock:
+                self._conns[conn_id] = (conn, threading.Lock())
+            threading.Thread(target=self._handle, args=(conn_id, conn), name=f"inference-conn-{conn_id}",
+                             daemon=True).start()
+
+    def _handle(self, conn_id, conn):
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == "detect":
+                    _, req_id, ring, slot_bytes, slot, shape, bgr, classes, inline = message
+                    self._dispatch({"conn": conn_id, "id": req_id, "ring": ring, "slot_bytes": slot_bytes,
+                                    "slot": slot, "shape": shape, "bgr": bgr, "classes": classes,
+                                    "inline": inline})
+                elif message[0] == "hello":
+                    self._send(conn_id, ("hello", self.info))
+                elif message[0] == "stats":
+                    self._send(conn_id, ("stats", self.stats()))
+        except (EOFError, OSError, TypeError):
+            pass  # Client gone (TypeError: connection closed under recv() by stop())
+        finally:
+            with self._conns_lock:
+                self._conns.pop(conn_id, None)
+            conn.close()
+
+    def _send(self, conn_id, message):
+        with self._conns_lock:
+            entry = self._conns.get(conn_id)
+        if entry is None:
+            return  # Client went away while its frame was in flight
+        conn, lock = entry
+        try:
+            with lock:
+                conn.send(message)
+        except OSError:
+            pass
+
+    def _dispatch(self, request):
+        key = (request["conn"], request["id"])
+        with self._workers_lock:
+            ready = [w for w in self._workers if w.ready]
+            worker = min(ready, key=lambda w: len(w.in_flight), default=None)
+            if worker is not None:
+                worker.in_flight.add(key)
+        if worker is None:
+            self._send(request["conn"], ("result", request["id"], None, "no inference worker available"))
+            return
+        try:
+            with worker.send_lock:
+                worker.conn.send(request)
+        except OSError:
+            pass  # Worker just died: the router fails everything it held, this request included
+
+    def _route(self):
+        """Relays worker results and notices dead workers (pipe EOF or process sentinel)."""
+        while not self._stopping:
+            with self._workers_lock:
+                by_handle = {w.conn: w for w in self._workers}
+                by_handle.update({w.process.sentinel: w for w in self._workers})
+            for handle in wait(list(by_handle), timeout=0.5):
+                worker = by_handle[handle]
+                if handle is worker.conn:
+                    try:
+                        self._on_message(worker, worker.conn.recv())
+                        continue
+                    except (EOFError, OSError):
+                        pass
+                self._on_death(worker)
+
+    def _on_message(self, worker, message):
+        if message[0] == "ready":
+            worker.info, worker.ready = message[1], True
+            return
+        _, conn_id, req_id, detection, error = message
+        with self._workers_lock:
+            worker.in_flight.discard((conn_id, req_id))
+        self.frames_by_worker[worker.index] += 1
+        self._send(conn_id, ("result", req_id, detection, error))
+
+    def _on_death(self, worker):
+        with self._workers_lock:
+            if self._stopping or worker not in self._workers:
+                return  # Already handled (pipe EOF and sentinel both fire)
+            # Results it sent before dying are still in the pipe
+            try:
+                while worker.conn.poll(0):
+                    self._on_message(worker, worker.conn.recv())
+            except (EOFError, OSError):
+                pass
+            lost, worker.in_flight = worker.in_flight, set()
+            self._workers[worker.index] = self._spawn(worker.index)
+            self.restarts += 1
+        worker.process.join(timeout=1)
+        worker.conn.close()
+        error = f"inference worker {worker.index} died (exit code {worker.process.exitcode})"
+        for conn_id, req_id in lost:
+            self._send(conn_id, ("result", req_id, None, error))
+
+    def stats(self):
+        with self._workers_lock:
+            workers = list(self._workers)
+        return {
+            "workers": self.workers,
+            "cores": self.core_plan,
+            "clients": len(self._conns),
+            "frames_by_worker": list(self.frames_by_worker),
+            "in_flight": [len(w.in_flight) for w in workers],
+            "alive": [w.process.is_alive() for w in workers],
+            "ready": [w.ready for w in workers],
+            "restarts": self.restarts,
+        }
+
+    def stop(self):
+        with self._workers_lock:
+            self._stopping = True
+            workers = list(self._workers)
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        if self._listener is not None:
+            self._listener.close()
+        with self._conns_lock:
+            conns = [conn for conn, _ in self._conns.values()]
+        for conn in conns:
+            conn.close()  # Clients fail their in-flight frames instead of waiting on them
+        for worker in workers:
+            worker.process.join(timeout=5)
+            worker.conn.close()
@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_INVENTORY = os.environ.get("PHARMA_INVENTORY", os.path.join(PROJECT_ROOT, "data", "inventory.json"))
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_inventory(path=None):
+    """Process-wide shared inventory for `path` (UI, PharmaAgent and tools all use the same one)."""
+    key = os.path.abspath(path or DEFAULT_INVENTORY)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = InventoryService(key)
+        return service
+
+
+class InventoryService:
+    """
+    Inventory JSON loaded once and indexed by id, name and dose.
+    The file's mtime is re-checked at most every `check_interval` seconds and
+    the indexes are rebuilt only when it actually changed (hot reload).
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0.0
+        self._load()
+
+    def _load(self):
+        with open(self.path, 'r') as f:
+            db = json.load(f)
+        by_name, by_dose = {}, {}
+        for drug_id, info in db.items():
+            by_name[info.get('name')] = drug_id
+            by_dose.setdefault(info.get('dose'), []).append(drug_id)
+        # Swap all indexes at once so readers never see a half-built snapshot
+        self._snapshot = (db, by_name, by_dose)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def _fresh(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._next_check = now + self.check_interval
+                    try:
+                        if os.stat(self.path).st_mtime_ns != self._mtime:
+                            self._load()
+                    except (OSError, ValueError):
+                        pass  # Keep serving the last good copy while the file is being rewritten
+        return self._snapshot
+
+    @property
+    def version(self):
+        """Changes whenever the file is reloaded (for caches derived from the inventory)."""
+        self._fresh()
+        return self._mtime
+
+    def get(self, drug_id):
+        return self._fresh()[0].get(drug_id)
+
+    def id_for_name(self, name):
+        return self._fresh()[1].get(name)
+
+    def ids_for_dose(self, dose):
+        return list(self._fresh()[2].get(dose, []))
+
+    def ids(self):
+        return list(self._fresh()[0].keys())
+
+    def names(self):
+        return [info['name'] for info in self._fresh()[0].values()]
+
+    def items(self):
+        return self._fresh()[0].items()
+
+    def __contains__(self, drug_id):
+        return drug_id in self._fresh()[0]
+
+    def __len__(self):
+        return len(self._fresh()[0])
@@ -0,0 +1,107 @@
+import calendar
+import re
+from datetime import date
+
+MONTHS = {m: i for i, m in enumerate(
+    ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], start=1)}
+
+# Compiled once at import. Covers what Indian / US strip prints actually use:
+#   EXP 03/2027, EXP.DATE: 03-27, Use before 31.03.2027, EXP MAR 2027, MFG: JAN.25, 2027-03
+DATE_RE = re.compile(r"""
+    (?P<kw>EXP(?:IRY)?\.?(?:\s*DATE)?|USE\s*BEFORE|BEST\s*BEFORE|MFG\.?(?:\s*DATE)?|MFD|MANUFACTURED|MFG\s*DT)?
+    [\s.:#-]{0,3}
+    (?:
+        (?<!\d)(?P<d>\d{1,2})[./-](?P<m>\d{1,2})[./-](?P<y>\d{4}|\d{2})
+      | (?<!\d)(?P<iy>20\d{2})[./-](?P<im>\d{1,2})
+      | (?<!\d)(?P<m2>\d{1,2})(?P<sep2>[./-])(?P<y2>\d{4}|\d{2})
+      | (?P<mon>JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)[A-Z]*[\s./'-]{0,2}(?P<y3>\d{4}|\d{2})
+    )
+    (?!\d)
+""", re.VERBOSE)
+
+BATCH_RE = re.compile(r"\b(?:B\.?\s?NO|BATCH(?:\s*NO)?|LOT(?:\s*NO)?|B/N)\.?\s*[:#-]?\s*([A-Z0-9][A-Z0-9/-]{2,})")
+
+EXPIRY_KEYWORDS = ("EXP", "USE", "BEST")
+# An expiry keyword whose date did not sit right after it (e.g. "EXP. DATE OF PACK: ... 03/27")
+EXPIRY_KEYWORD_RE = re.compile(r"EXP|USE\s*BEFORE|BEST\s*BEFORE")
+# Unlabelled dates outside this window (years around today) are prices, pack sizes, ...
+YEARS_BACK, YEARS_AHEAD = 5, 10
+
+
+def _year(raw):
+    year = int(raw)
+    return year + 2000 if year < 100 else year
+
+
+def _end_of_month(year, month):
+    # Month-only prints are valid until the last day of that month
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _to_date(match):
+    g = match.groupdict()
+    if g["d"]:
+        return date(_year(g["y"]), int(g["m"]), int(g["d"]))
+    if g["iy"]:
+        return _end_of_month(int(g["iy"]), int(g["im"]))
+    if g["m2"]:
+        return _end_of_month(_year(g["y2"]), int(g["m2"]))
+    return _end_of_month(_year(g["y3"]), MONTHS[g["mon"][:3]])
+
+
+def _pick_unlabelled(text, fallback):
+    """
+    Expiry among dates with no keyword of their own: the one closest after an
+    EXP-style keyword, else the earliest (a wrong guess then reads as expired, never as valid).
+    """
+    keywords = [kw.end() for kw in EXPIRY_KEYWORD_RE.finditer(text)]
+    after = [(start - end, item) for start, item in fallback for end in keywords if start >= end]
+    if after:
+        return min(after, key=lambda pair: pair[0])[1]
+    return min((item for _, item in fallback), key=lambda item: item[1])
+
+
+def parse_label(text, today=None):
+    """
+    Pulls the expiry date, manufacturing date and batch number out of raw OCR text.
+    A date right after an EXP-style keyword wins. Dates without a keyword must look
+    like one (no '.' month/year separator, year within YEARS_BACK/YEARS_AHEAD of
+    `today`), and the one nearest an EXP keyword or else the earliest is taken.
+    """
+    text = text.upper()
+    year = (today or date.today()).year
+    expiry = mfg = None
+    fallback = []
+
+    for match in DATE_RE.finditer(text):
+        try:
+            parsed = _to_date(match)
+        except (ValueError, KeyError):
+            continue  # e.g. 13/2025 or 31/02/2026: not a real date
+        raw = match.group(0).strip(" .:#-")
+        keyword = (match.group("kw") or "").replace(" ", "")
+        if keyword.startswith(EXPIRY_KEYWORDS):
+            expiry = expiry or (raw, parsed)
+        elif keyword.startswith(("MF", "MANU")):
+            mfg = mfg or (raw, parsed)
+        elif match.group("sep2") == ".":
+            continue  # "RS 12.50" is a price, not December 2050
+        elif year - YEARS_BACK <= parsed.year <= year + YEARS_AHEAD:
+            fallback.append((match.start(), (raw, parsed)))
+
+    if expiry is None and fallback:
+        expiry = _pick_unlabelled(text, fallback)
+
+    batch = BATCH_RE.search(text)
+    return {
+        "expiry_raw": expiry[0] if expiry else None,
+        "expiry": expiry[1] if expiry else None,
+        "mfg": mfg[1] if mfg else None,
+        "batch": batch.group(1) if batch else None,
+    }
+
+
+def parse_expiry(text):
+    """Expiry only -> (raw string, date) or (None, None)."""
+    label = parse_label(text)
+    return label["expiry_raw"], label["expiry"]
@@ -0,0 +1,211 @@
+import bisect
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tools import startup
+
+# Latency buckets in milliseconds (upper bounds), Prometheus-style
+BUCKETS_MS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500, 1000, 2500)
+# Stages of the live path, in display order; other callers may time their own (BatchVerifier: "audit")
+STAGES = ("decode", "convert", "inference", "postprocess", "draw", "ocr", "total")
+METRICS_PORT = int(os.environ.get("PHARMA_METRICS_PORT", "8502"))
+
+
+class RollingHistogram:
+    """
+    Cumulative bucket counts (what Prometheus scrapes) plus a window of recent
+    samples for the p50/p95 shown in the ops panel.
+    """
+
+    def __init__(self, window=512):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.count += 1
+        self.recent.append(ms)
+
+    def percentile(self, q):
+        samples = sorted(self.recent)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class StreamMetrics:
+    """
+    Per-stream counters and stage timings. Written from more than one thread
+    (with PHARMA_ASYNC_PIPELINE=1 the recv thread times decode/total while
+    the pipeline worker times the rest) and read by /metrics, hence the lock.
+    """
+
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self.stages = {stage: RollingHistogram() for stage in STAGES}
+        self.frames = 0
+        self.inferences = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_error = None
+        self._frame_times = deque(maxlen=120)
+        self._lock = threading.Lock()
+
+    def observe(self, stage, ms):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = RollingHistogram()
+            hist.observe(ms)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - start) * 1000)
+
+    def frame_done(self, skipped):
+        with self._lock:
+            self.frames += 1
+            if skipped:
+                self.skipped += 1
+            else:
+                self.inferences += 1
+            self._frame_times.append(time.monotonic())
+
+    def error(self, exc):
+        with self._lock:
+            self.errors += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"
+
+    def fps(self):
+        with self._lock:
+            times = list(self._frame_times)
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stage_items(self):
+        """[(stage, (bucket counts, sum, count))] copied under the lock, for the exporter."""
+        with self._lock:
+            return [(stage, (list(h.counts), h.total, h.count)) for stage, h in self.stages.items() if h.count]
+
+    def snapshot(self):
+        fps = self.fps()
+        with self._lock:
+            row = {
+                "stream": self.stream_id,
+                "fps": round(fps, 1),
+                "frames": self.frames,
+                "skip_ratio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+                "errors": self.errors,
+                "last_error": self.last_error,
+            }
+            for stage, hist in self.stages.items():
+                if hist.count:
+                    row[f"{stage}_p50_ms"] = round(hist.percentile(0.5), 2)
+                    row[f"{stage}_p95_ms"] = round(hist.percentile(0.95), 2)
+        return row
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def new_stream(self):
+        with self._lock:
+            metrics = StreamMetrics(f"stream-{next(self._ids)}")
+            self._streams[metrics.stream_id] = metrics
+            return metrics
+
+    def remove(self, metrics):
+        with self._lock:
+            self._streams.pop(metrics.stream_id, None)
+
+    def streams(self):
+        with self._lock:
+            return list(self._streams.values())
+
+    def snapshot(self):
+        return [m.snapshot() for m in self.streams()]
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = [
+            "# HELP pharma_stage_latency_ms Per-stage latency of the live scanning pipeline.",
+            "# TYPE pharma_stage_latency_ms histogram",
+        ]
+        streams = self.streams()
+        for m in streams:
+            for stage, (counts, total, count) in m.stage_items():
+                labels = f'stream="{m.stream_id}",stage="{stage}"'
+                for bound, cumulative in zip(BUCKETS_MS + ("+Inf",), itertools.accumulate(counts)):
+                    lines.append(f'pharma_stage_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"pharma_stage_latency_ms_sum{{{labels}}} {total:.3f}")
+                lines.append(f"pharma_stage_latency_ms_count{{{labels}}} {count}")
+
+        for name, kind, help_text, value in (
+            ("pharma_frames_total", "counter", "Frames received.", lambda m: m.frames),
+            ("pharma_inferences_total", "counter", "Frames that ran the detector.", lambda m: m.inferences),
+            ("pharma_skipped_frames_total", "counter", "Frames served without inference.", lambda m: m.skipped),
+            ("pharma_errors_total", "counter", "Exceptions swallowed by the pipeline.", lambda m: m.errors),
+            ("pharma_stream_fps", "gauge", "Recent frames per second.", lambda m: round(m.fps(), 2)),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for m in streams:
+                lines.append(f'{name}{{stream="{m.stream_id}"}} {value(m)}')
+        lines.append("# HELP pharma_active_streams Live streams (and batch runs) currently registered.")
+        lines.append("# TYPE pharma_active_streams gauge")
+        lines.append(f"pharma_active_streams {len(streams)}")
+
+        lines.append("# HELP pharma_startup_ms Cold-start phases of this process (imports, session load, first inference).")
+        lines.append("# TYPE pharma_startup_ms gauge")
+        for phase, value in startup.timings().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f'pharma_startup_ms{{phase="{phase}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # keep scrapes out of the Streamlit console
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serves GET /metrics on `port` from a daemon thread (once per process)."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
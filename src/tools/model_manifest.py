@@ -0,0 +1,38 @@
+import json
+import os
+
+MANIFEST_NAME = "manifest.json"
+
+
+def load_manifest(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def select_variant(manifest_path, map_budget=0.01, max_imgsz=None):
+    """
+    Fastest exported variant whose mAP50-95 is within `map_budget` of the
+    fp32 baseline (see export_models.py); variants never validated against it
+    are skipped. Returns the manifest entry with an absolute "path", or None
+    when there is no usable manifest.
+    """
+    if not manifest_path or not os.path.exists(manifest_path):
+        return None
+    try:
+        manifest = load_manifest(manifest_path)
+    except (OSError, ValueError):
+        return None
+
+    root = os.path.dirname(os.path.abspath(manifest_path))
+    candidates = []
+    for variant in manifest.get("variants", []):
+        path = os.path.join(root, variant["file"])
+        if variant.get("latency_ms_p50") is None or not os.path.exists(path):
+            continue
+        # No delta means no baseline or no validation: an unmeasured variant never passes the gate
+        if variant.get("map_delta") is None or variant["map_delta"] < -map_budget:
+            continue
+        if max_imgsz and variant["imgsz"] > max_imgsz:
+            continue
+        candidates.append({**variant, "path": path})
+    return min(candidates, key=lambda v: v["latency_ms_p50"]) if candidates else None
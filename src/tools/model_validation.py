@@ -0,0 +1,144 @@
+import os
+import time
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+# COCO-style IoU thresholds for mAP50-95
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def read_image_list(list_path):
+    """Image paths from a split list (train.txt / val.txt); relative entries are relative to the list."""
+    root = os.path.dirname(os.path.abspath(list_path))
+    with open(list_path, "r") as f:
+        return [os.path.normpath(os.path.join(root, line.strip())) for line in f if line.strip()]
+
+
+def label_path_for(image_path):
+    """YOLO layout: .../images/<split>/x.jpg -> .../labels/<split>/x.txt"""
+    head, sep, tail = image_path.rpartition(os.sep + "images" + os.sep)
+    return os.path.splitext(head + os.sep + "labels" + os.sep + tail if sep else image_path)[0] + ".txt"
+
+
+def load_labelled_images(image_dir, label_dir):
+    """
+    [(bgr image, gt boxes xyxy in pixels, gt class ids)] for every image that
+    has a YOLO-format label file (class cx cy w h, normalized).
+    """
+    names = sorted(name for name in os.listdir(image_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+    return _load_samples(
+        (os.path.join(image_dir, name), os.path.join(label_dir, os.path.splitext(name)[0] + ".txt")) for name in names
+    )
+
+
+def load_labelled_list(list_path):
+    """Same as load_labelled_images, for the images of a split list (e.g. the held-out dataset/val.txt)."""
+    return _load_samples((path, label_path_for(path)) for path in read_image_list(list_path))
+
+
+def _load_samples(pairs):
+    samples = []
+    for image_path, label_path in pairs:
+        image = cv2.imread(image_path)
+        if image is None or not os.path.exists(label_path):
+            continue
+        rows = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+        h, w = image.shape[:2]
+        if rows.size:
+            cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+            boxes = np.stack((cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2), axis=1)
+            classes = rows[:, 0].astype(np.int64)
+        else:
+            boxes, classes = np.zeros((0, 4), np.float32), np.zeros(0, np.int64)
+        samples.append((image, boxes, classes))
+    return samples
+
+
+def box_iou(a, b):
+    """(N, 4) x (M, 4) xyxy -> (N, M) IoU."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-7)
+
+
+def average_precision(recall, precision):
+    """Area under the interpolated precision envelope (101-point, like COCO / Ultralytics)."""
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    y = np.interp(x, mrec, mpre)
+    return float(np.sum((y[1:] + y[:-1]) / 2 * np.diff(x)))
+
+
+def _match(pred_boxes, pred_classes, gt_boxes, gt_classes):
+    """(n_pred, n_iou) bool: is each prediction a true positive at each IoU threshold."""
+    correct = np.zeros((len(pred_boxes), len(IOU_THRESHOLDS)), dtype=bool)
+    if not len(pred_boxes) or not len(gt_boxes):
+        return correct
+    iou = box_iou(gt_boxes, pred_boxes) * (gt_classes[:, None] == pred_classes[None, :])
+    for t, threshold in enumerate(IOU_THRESHOLDS):
+        gt_idx, pred_idx = np.nonzero(iou >= threshold)
+        if not gt_idx.size:
+            continue
+        # Greedy one-to-one matching, best IoU first
+        order = iou[gt_idx, pred_idx].argsort()[::-1]
+        gt_idx, pred_idx = gt_idx[order], pred_idx[order]
+        _, first_pred = np.unique(pred_idx, return_index=True)
+        gt_idx, pred_idx = gt_idx[first_pred], pred_idx[first_pred]
+        _, first_gt = np.unique(gt_idx, return_index=True)
+        correct[pred_idx[first_gt], t] = True
+    return correct
+
+
+def evaluate_map(engine, samples, conf=0.001):
+    """
+    mAP50 and mAP50-95 of an OnnxEngine over `samples` (see load_labelled_images).
+    Runs the same letterbox/decode/NMS code the app serves with.
+    """
+    correct, scores, pred_classes, gt_classes = [], [], [], []
+    for image, gt_boxes, gt_cls in samples:
+        boxes, conf_scores, classes = engine.detect(image, conf=conf)
+        correct.append(_match(boxes, classes, gt_boxes, gt_cls))
+        scores.append(conf_scores)
+        pred_classes.append(classes)
+        gt_classes.append(gt_cls)
+
+    correct = np.concatenate(correct) if correct else np.zeros((0, len(IOU_THRESHOLDS)), bool)
+    scores, pred_classes = np.concatenate(scores), np.concatenate(pred_classes)
+    gt_classes = np.concatenate(gt_classes)
+    order = scores.argsort()[::-1]
+    correct, pred_classes = correct[order], pred_classes[order]
+
+    ap = []
+    for cls in np.unique(gt_classes):
+        hits = correct[pred_classes == cls]
+        n_gt = int((gt_classes == cls).sum())
+        if not len(hits):
+            ap.append(np.zeros(len(IOU_THRESHOLDS)))
+            continue
+        tp = np.cumsum(hits, axis=0)
+        fp = np.cumsum(~hits, axis=0)
+        recall = tp / n_gt
+        precision = tp / (tp + fp)
+        ap.append([average_precision(recall[:, t], precision[:, t]) for t in range(len(IOU_THRESHOLDS))])
+
+    ap = np.asarray(ap) if ap else np.zeros((1, len(IOU_THRESHOLDS)))
+    return {"map50": round(float(ap[:, 0].mean()), 4), "map50_95": round(float(ap.mean()), 4)}
+
+
+def measure_latency(engine, images, runs=50, warmup=5):
+    """Single-frame CPU latency of engine.detect (letterbox + inference + decode), in ms."""
+    for i in range(warmup):
+        engine.detect(images[i % len(images)])
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        engine.detect(images[i % len(images)])
+        samples.append((time.perf_counter() - start) * 1000)
+    p50, p95 = np.percentile(samples, [50, 95])
+    return {"latency_ms_p50": round(float(p50), 2), "latency_ms_p95": round(float(p95), 2)}
@@ -0,0 +1,104 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from PIL import Image
+
+try:
+    import tesserocr  # C API bindings: language data loaded once per handle, no process spawn
+except ImportError:
+    tesserocr = None
+
+OCR_WORKERS = int(os.environ.get("PHARMA_OCR_WORKERS", "2"))
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tesseract_pool():
+    """Process-wide OCR pool shared by every counter's stream."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = TesseractPool(OCR_WORKERS)
+    return _pool
+
+
+def pool_stats():
+    """Stats of the shared pool, or None if no OCR has run in this process yet (never starts one)."""
+    return _pool.stats() if _pool is not None else None
+
+
+class TesseractPool:
+    """
+    Long-lived Tesseract workers fed over a queue.
+    With tesserocr each worker owns one initialized API handle (the eng
+    traineddata is loaded once, recognition releases the GIL); without it
+    the workers fall back to pytesseract, which still spawns a process per call.
+    """
+
+    def __init__(self, workers=2, lang="eng", psm=6):
+        self.lang = lang
+        self.psm = psm
+        self.backend = "tesserocr" if tesserocr else "pytesseract"
+        if tesserocr is None:
+            logger.warning("tesserocr is not installed: OCR falls back to pytesseract, one tesseract "
+                           "process per read. Install tesserocr (see Dockerfile) for persistent workers.")
+        self._queue = queue.Queue()
+        self._workers = [
+            threading.Thread(target=self._run, name=f"tesseract-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _make_reader(self):
+        if tesserocr:
+            api = tesserocr.PyTessBaseAPI(lang=self.lang, psm=self.psm)
+
+            def read(image):
+                api.SetImage(Image.fromarray(image) if not isinstance(image, Image.Image) else image)
+                return api.GetUTF8Text()
+            return read
+
+        import pytesseract
+        config = f"--psm {self.psm}"
+
+        def read(image):
+            return pytesseract.image_to_string(image, lang=self.lang, config=config)
+        return read
+
+    def _run(self):
+        read = self._make_reader()
+        while True:
+            image, future = self._queue.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(read(image))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def submit(self, image):
+        """Queues an image (numpy array or PIL image). Returns a Future with the raw text."""
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def image_to_string(self, image, timeout=None):
+        return self.submit(image).result(timeout=timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            # False = fallback mode: every read still spawns a tesseract process
+            "persistent_workers": tesserocr is not None,
+            "workers": len(self._workers),
+            "queue_depth": self.queue_depth(),
+        }
@@ -0,0 +1,232 @@
+import ast
+import json
+import os
+import platform
+import threading
+import time
+import numpy as np
+import cv2
+import onnxruntime as ort
+
+# Same grey padding value Ultralytics uses for letterboxing
+PAD_VALUE = 114
+# Class offset for batched class-aware NMS (boxes of different classes never overlap)
+MAX_WH = 7680
+# Where serialized pre-optimized graphs are kept ("" disables); default: <model dir>/.ort_cache
+ORT_CACHE_DIR = os.environ.get("PHARMA_ORT_CACHE")
+
+
+def cached_graph_path(model_path):
+    """
+    Serialized optimized graph for this exact model file, ORT version and CPU
+    architecture, or None when caching is disabled.
+    """
+    cache_dir = ORT_CACHE_DIR if ORT_CACHE_DIR is not None else os.path.join(
+        os.path.dirname(os.path.abspath(model_path)), ".ort_cache")
+    if not cache_dir:
+        return None
+    stat = os.stat(model_path)
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    key = f"{stem}-{stat.st_size}-{stat.st_mtime_ns}-ort{ort.__version__}-{platform.machine()}"
+    return os.path.join(cache_dir, key + ".onnx")
+
+
+def save_optimized_graph(model_path, cache_path, metadata):
+    """
+    Writes the EXTENDED-level graph (fusions and constant folding, no
+    CPU-specific layout) plus the export metadata, atomically.
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = tmp
+    ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+    with open(tmp + ".json", "w") as f:
+        json.dump(metadata, f)
+    # Metadata first: a graph file without its sidecar is never picked up
+    os.replace(tmp + ".json", cache_path + ".json")
+    os.replace(tmp, cache_path)
+
+
+def nms(boxes, scores, iou_thres):
+    """Greedy NMS with vectorized IoU. Returns kept indices, highest score first."""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(x1[i], x1[rest])
+        yy1 = np.maximum(y1[i], y1[rest])
+        xx2 = np.minimum(x2[i], x2[rest])
+        yy2 = np.minimum(y2[i], y2[rest])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-7)
+        order = rest[iou <= iou_thres]
+    return np.asarray(keep, dtype=np.int64)
+
+
+class OnnxEngine:
+    """
+    Runs the exported YOLO ONNX graph directly on onnxruntime.
+    Skips the Ultralytics wrapper: letterbox + normalize go into a preallocated
+    NCHW buffer and the raw (B, 4+nc, N) output is decoded with NumPy.
+    """
+
+    def __init__(self, model_path, conf=0.45, iou=0.45, providers=None, threads=0, max_batch=1, cache=True):
+        # 1. SESSION SETUP (from the serialized pre-optimized graph when there is one)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        cache_path = cached_graph_path(model_path) if cache else None
+        self.from_cache = bool(cache_path) and os.path.exists(cache_path) and os.path.exists(cache_path + ".json")
+        t0 = time.perf_counter()
+        self.session = ort.InferenceSession(
+            cache_path if self.from_cache else model_path, options, providers=providers or ["CPUExecutionProvider"]
+        )
+        self.session_load_ms = round((time.perf_counter() - t0) * 1000, 1)
+        self.conf = conf
+        self.iou = iou
+
+        # 2. INPUT GEOMETRY (dynamic axes fall back to the 640 training size)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        b, _, h, w = model_input.shape
+        self.imgsz = (h if isinstance(h, int) else 640, w if isinstance(w, int) else 640)
+        # Models exported without `dynamic=True` only take a batch of 1
+        self.dynamic_batch = not isinstance(b, int)
+        self.max_batch = max_batch if self.dynamic_batch else 1
+
+        # 3. CLASS NAMES FROM THE EXPORT METADATA
+        if self.from_cache:
+            with open(cache_path + ".json", "r") as f:
+                meta = json.load(f)
+        else:
+            meta = self.session.get_modelmeta().custom_metadata_map
+            if cache_path:
+                # Serialize off the startup path; the next process start loads the fused graph
+                threading.Thread(
+                    target=self._write_cache, args=(model_path, cache_path, dict(meta)),
+                    name="ort-graph-cache", daemon=True,
+                ).start()
+        self.names = ast.literal_eval(meta["names"]) if "names" in meta else {}
+
+        # 4. PREALLOCATED BUFFERS (one letterbox slot per batch row, reused every call)
+        h, w = self.imgsz
+        self._canvas = np.full((self.max_batch, h, w, 3), PAD_VALUE, dtype=np.uint8)
+        self._input = np.empty((self.max_batch, 3, h, w), dtype=np.float32)
+        self._geometry = [None] * self.max_batch
+        self._resized = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _write_cache(model_path, cache_path, metadata):
+        try:
+            save_optimized_graph(model_path, cache_path, metadata)
+        except Exception:
+            pass  # Read-only model dir or disk full: just keep optimizing at load time
+
+    def _letterbox(self, image, slot=0):
+        """Resizes into the padded canvas of `slot`. Returns (scale, pad_x, pad_y)."""
+        ih, iw = image.shape[:2]
+        h, w = self.imgsz
+        canvas = self._canvas[slot]
+        geometry = self._geometry[slot]
+        if geometry is None or geometry[0] != (ih, iw):
+            r = min(h / ih, w / iw)
+            nh, nw = int(round(ih * r)), int(round(iw * r))
+            top, left = (h - nh) // 2, (w - nw) // 2
+            # Frame size changed: reset the padding area once
+            canvas.fill(PAD_VALUE)
+            geometry = self._geometry[slot] = ((ih, iw), r, nh, nw, top, left)
+
+        _, r, nh, nw, top, left = geometry
+        if (nh, nw) == (ih, iw):
+            canvas[top:top + nh, left:left + nw] = image
+        else:
+            resized = self._resized.get((nh, nw))
+            if resized is None:
+                resized = self._resized[(nh, nw)] = np.empty((nh, nw, 3), dtype=np.uint8)
+            cv2.resize(image, (nw, nh), dst=resized, interpolation=cv2.INTER_LINEAR)
+            canvas[top:top + nh, left:left + nw] = resized
+        return r, left, top
+
+    def _fill_input(self, slot, bgr):
+        """HWC uint8 canvas -> CHW float32 in [0, 1], RGB order, written in place."""
+        src = self._canvas[slot, ..., ::-1] if bgr else self._canvas[slot]
+        np.multiply(src.transpose(2, 0, 1), np.float32(1 / 255), out=self._input[slot], casting="unsafe")
+
+    def _decode(self, pred, scale, pad_x, pad_y, shape, classes=None, conf=None):
+        """(4+nc, N) raw head output -> boxes (xyxy, source pixels), scores, class ids."""
+        conf = self.conf if conf is None else conf
+        cls_scores = pred[4:]
+        class_ids = cls_scores.argmax(0)
+        scores = cls_scores[class_ids, np.arange(cls_scores.shape[1])]
+
+        mask = scores > conf
+        if classes is not None:
+            mask &= np.isin(class_ids, classes)
+        if not mask.any():
+            return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+
+        cx, cy, bw, bh = pred[:4, mask]
+        boxes = np.stack((cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2), axis=1)
+        scores, class_ids = scores[mask], class_ids[mask]
+
+        keep = nms(boxes + (class_ids[:, None] * MAX_WH), scores, self.iou)
+        boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+
+        # Undo the letterbox back to frame coordinates
+        boxes -= (pad_x, pad_y, pad_x, pad_y)
+        boxes /= scale
+        ih, iw = shape[:2]
+        np.clip(boxes[:, 0::2], 0, iw, out=boxes[:, 0::2])
+        np.clip(boxes[:, 1::2], 0, ih, out=boxes[:, 1::2])
+        return boxes, scores, class_ids
+
+    def detect(self, image, classes=None, conf=None, bgr=True, timings=None):
+        """
+        Single-frame inference. `bgr=False` accepts RGB frames straight from WebRTC.
+        Returns (boxes Nx4 xyxy, scores N, class_ids N), sorted by confidence.
+        """
+        return self.detect_batch([image], [classes], conf, bgr, timings)[0]
+
+    def detect_batch(self, images, classes=None, conf=None, bgr=True, timings=None):
+        """
+        Runs several frames through one session call (chunks of `max_batch`).
+        `classes` is an optional per-image list of class filters.
+        If a `timings` dict is given, convert / inference / postprocess ms are added to it.
+        Returns one (boxes, scores, class_ids) tuple per image.
+        """
+        classes = classes or [None] * len(images)
+        results = []
+        spent = {"convert": 0.0, "inference": 0.0, "postprocess": 0.0}
+        with self._lock:
+            for start in range(0, len(images), self.max_batch):
+                chunk = images[start:start + self.max_batch]
+                t0 = time.perf_counter()
+                geometry = []
+                for slot, image in enumerate(chunk):
+                    geometry.append(self._letterbox(image, slot))
+                    self._fill_input(slot, bgr)
+
+                t1 = time.perf_counter()
+                pred = self.session.run(None, {self.input_name: self._input[:len(chunk)]})[0]
+                t2 = time.perf_counter()
+                for slot, image in enumerate(chunk):
+                    scale, pad_x, pad_y = geometry[slot]
+                    results.append(self._decode(
+                        pred[slot], scale, pad_x, pad_y, image.shape, classes[start + slot], conf
+                    ))
+                t3 = time.perf_counter()
+                spent["convert"] += (t1 - t0) * 1000
+                spent["inference"] += (t2 - t1) * 1000
+                spent["postprocess"] += (t3 - t2) * 1000
+        if timings is not None:
+            for stage, ms in spent.items():
+                timings[stage] = timings.get(stage, 0.0) + ms
+        return results
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_sku_index(root):
+    """Process-wide index for `root`, shared by every stream."""
+    key = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SkuIndex(key)
+        return index
+
+
+class SkuIndex:
+    """
+    Reference embeddings per inventory id, kept on disk as
+        vectors.npy   (N, D) float32, unit rows
+        labels.json   drug id of every row, plus the embedder name
+    Search is an exact cosine scan (one matrix-vector product), well under a
+    millisecond for a few thousand SKUs x a handful of reference images.
+    Adding a SKU rewrites both files atomically; readers swap to the new
+    arrays in one assignment. Inserts from another process (index_skus.py)
+    are picked up through the same mtime check the inventory uses.
+    """
+
+    def __init__(self, root, check_interval=2.0):
+        self.root = root
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = (np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=object))
+        self._mtime = None
+        self._next_check = 0.0
+        self.embedder = None
+        self._load()
+
+    def _paths(self):
+        return os.path.join(self.root, "vectors.npy"), os.path.join(self.root, "labels.json")
+
+    def _load(self):
+        vectors_path, labels_path = self._paths()
+        if not (os.path.exists(vectors_path) and os.path.exists(labels_path)):
+            return
+        with open(labels_path, "r") as f:
+            meta = json.load(f)
+        # Read fully (a few MB): a memory-mapped file could not be replaced on Windows
+        vectors = np.load(vectors_path)
+        self.embedder = meta.get("embedder")
+        self._snapshot = (vectors, np.asarray(meta["labels"], dtype=object))
+        self._mtime = os.stat(labels_path).st_mtime_ns
+
+    def _fresh(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._next_check = now + self.check_interval
+                    try:
+                        labels_path = self._paths()[1]
+                        if os.path.exists(labels_path) and os.stat(labels_path).st_mtime_ns != self._mtime:
+                            self._load()
+                    except (OSError, ValueError):
+                        pass  # Mid-rewrite: keep the last good snapshot
+        return self._snapshot
+
+    def _save(self, vectors, labels):
+        os.makedirs(self.root, exist_ok=True)
+        vectors_path, labels_path = self._paths()
+        np.save(vectors_path + ".tmp.npy", vectors)
+        with open(labels_path + ".tmp", "w") as f:
+            json.dump({"embedder": self.embedder, "dim": int(vectors.shape[1]) if vectors.size else 0,
+                       "labels": [str(label) for label in labels]}, f)
+        os.replace(vectors_path + ".tmp.npy", vectors_path)
+        os.replace(labels_path + ".tmp", labels_path)
+        self._snapshot = (vectors, labels)
+        self._mtime = os.stat(labels_path).st_mtime_ns
+
+    def _check_embedder(self, embedder_name):
+        if self.embedder is None:
+            self.embedder = embedder_name
+        elif embedder_name != self.embedder:
+            raise ValueError(f"Index {self.root} was built with {self.embedder!r}, not {embedder_name!r}")
+
+    def add(self, drug_id, vectors, embedder_name, replace=True):
+        """Inserts reference vectors for `drug_id` (replacing its old ones by default)."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        with self._lock:
+            self._check_embedder(embedder_name)
+            current, labels = self._snapshot
+            if current.size and current.shape[1] != vectors.shape[1]:
+                raise ValueError(f"Vector size {vectors.shape[1]} does not match index size {current.shape[1]}")
+            keep = labels != drug_id if replace else np.ones(len(labels), dtype=bool)
+            merged = np.concatenate((current[keep], vectors)) if current.size else vectors
+            self._save(merged, np.concatenate((labels[keep], np.full(len(vectors), drug_id, dtype=object))))
+
+    def remove(self, drug_id):
+        with self._lock:
+            current, labels = self._snapshot
+            keep = labels != drug_id
+            if not keep.all():
+                self._save(current[keep], labels[keep])
+
+    def search(self, queries, embedder_name):
+        """(N, D) unit vectors -> [(drug_id, cosine similarity)] best match per query."""
+        vectors, labels = self._fresh()
+        if not len(labels) or not len(queries):
+            return [(None, 0.0)] * len(queries)
+        if embedder_name != self.embedder:
+            raise ValueError(f"Index {self.root} was built with {self.embedder!r}, not {embedder_name!r}")
+        similarity = np.asarray(queries, dtype=np.float32) @ vectors.T
+        best = similarity.argmax(axis=1)
+        return [(labels[row], float(similarity[i, row])) for i, row in enumerate(best)]
+
+    def ids(self):
+        return sorted(set(self._fresh()[1]))
+
+    def __len__(self):
+        return len(self._fresh()[1])
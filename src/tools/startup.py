@@ -0,0 +1,51 @@
+import threading
+import time
+
+# Stdlib only: this is imported before the PIN page renders, so it must stay cheap
+_T0 = time.perf_counter()
+_timings = {}
+_warmup = None
+_warmup_lock = threading.Lock()
+_ready = threading.Event()
+
+
+def since_start_ms():
+    """Milliseconds since the app script first ran in this process."""
+    return round((time.perf_counter() - _T0) * 1000, 1)
+
+
+def record(phase, value):
+    """Keeps the first value per phase (reruns must not overwrite cold-start numbers)."""
+    _timings.setdefault(phase, round(value, 1) if isinstance(value, float) else value)
+
+
+def mark(phase):
+    record(phase, since_start_ms())
+
+
+def timings():
+    return dict(_timings)
+
+
+def start_warmup(fn):
+    """Runs `fn` once per process on a daemon thread (model load + first inference)."""
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None:
+            def run():
+                try:
+                    fn()
+                except Exception as e:
+                    _timings["warmup_error"] = f"{type(e).__name__}: {e}"
+                finally:
+                    _ready.set()
+            _warmup = threading.Thread(target=run, name="warmup", daemon=True)
+            _warmup.start()
+
+
+def warmup_done():
+    return _ready.is_set()
+
+
+def wait_for_warmup(timeout=None):
+    return _ready.wait(timeout)
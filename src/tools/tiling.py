@@ -0,0 +1,68 @@
+import math
+import numpy as np
+
+
+def _starts(length, tile, overlap):
+    if length <= tile:
+        return [0]
+    stride = tile * (1 - overlap)
+    n = math.ceil((length - tile) / stride) + 1
+    # Evenly spread so the last tile ends exactly on the border
+    return [int(round(v)) for v in np.linspace(0, length - tile, n)]
+
+
+def tile_grid(height, width, tile=640, overlap=0.2):
+    """Overlapping (x1, y1, x2, y2) windows that cover the whole frame."""
+    th, tw = min(tile, height), min(tile, width)
+    return [
+        (x, y, x + tw, y + th)
+        for y in _starts(height, th, overlap)
+        for x in _starts(width, tw, overlap)
+    ]
+
+
+def merge_nms(boxes, scores, class_ids, thres=0.5):
+    """
+    Class-aware greedy merge on intersection-over-smaller instead of IoU: a
+    strip cut by a tile border leaves a partial box whose IoU with the full one
+    is low, but which lies almost entirely inside it. The highest-scoring box
+    and everything it overlaps that way become one box, their union, so a
+    confident partial never replaces the whole strip (and two halves from
+    neighbouring tiles join up). Returns (boxes, scores, class_ids), best first.
+    """
+    if not len(boxes):
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    merged, keep = [], []
+    while order.size > 0:
+        i = order[0]
+        rest = order[1:]
+        inter = (np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+                 * np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None))
+        ios = inter / (np.minimum(areas[i], areas[rest]) + 1e-7)
+        group = (ios > thres) & (class_ids[rest] == class_ids[i])
+        members = boxes[np.concatenate(([i], rest[group]))]
+        merged.append(np.concatenate((members[:, :2].min(axis=0), members[:, 2:].max(axis=0))))
+        keep.append(i)
+        order = rest[~group]
+    keep = np.asarray(keep, dtype=np.int64)
+    return np.asarray(merged, dtype=np.float32), scores[keep], class_ids[keep]
+
+
+def merge_tile_detections(results, windows, thres=0.5):
+    """
+    Per-window (boxes, scores, class_ids) in window pixels -> one frame-level
+    result, sorted by confidence. A full-frame pass is just the window (0, 0, w, h).
+    """
+    boxes, scores, class_ids = [], [], []
+    for (b, s, c), (x1, y1, _, _) in zip(results, windows):
+        if len(b):
+            boxes.append(np.asarray(b, dtype=np.float32) + (x1, y1, x1, y1))
+            scores.append(np.asarray(s, dtype=np.float32))
+            class_ids.append(np.asarray(c, dtype=np.int64))
+    if not boxes:
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+    boxes, scores, class_ids = np.concatenate(boxes), np.concatenate(scores), np.concatenate(class_ids)
+    return merge_nms(boxes, scores, class_ids, thres)
@@ -0,0 +1,179 @@
+from collections import Counter, deque
+import itertools
+import numpy as np
+import cv2
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between two sets of xyxy boxes (len(a) x len(b))."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    a, b = a[:, None, :], b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / (area_a + area_b - inter + 1e-7)
+
+
+# Grayscale conversion per frame layout, so motion is measured on the same luma whatever the decode order
+GRAY_CODES = {"rgb24": cv2.COLOR_RGB2GRAY, "bgr24": cv2.COLOR_BGR2GRAY}
+
+
+class MotionGate:
+    """
+    Cheap frame-difference check deciding when the detector must run again.
+    Works on a tiny grayscale thumbnail so it costs well under a millisecond.
+    """
+
+    def __init__(self, threshold=6.0, min_interval=2, max_interval=15, size=(64, 36)):
+        self.threshold = threshold        # mean abs pixel diff that counts as motion
+        self.min_interval = min_interval  # never run the model more often than this
+        self.max_interval = max_interval  # always refresh at least this often
+        self.size = size
+        self._reference = None
+        self._since_detect = 0
+
+    def reset(self):
+        self._reference = None
+        self._since_detect = 0
+
+    def should_detect(self, frame, fmt="rgb24"):
+        """`fmt` is the frame's channel layout ("rgb24" or "bgr24"), as for VisionAgent."""
+        thumb = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA), GRAY_CODES[fmt])
+        self._since_detect += 1
+
+        if self._reference is None or self._since_detect >= self.max_interval:
+            moved = True
+        elif self._since_detect < self.min_interval:
+            moved = False
+        else:
+            moved = float(cv2.absdiff(thumb, self._reference).mean()) > self.threshold
+
+        if moved:
+            # Compare future frames against the one the detector actually saw
+            self._reference = thumb
+            self._since_detect = 0
+        return moved
+
+
+class Track:
+    def __init__(self, track_id, box, score, class_id, votes):
+        self.id = track_id
+        self.box = box.astype(np.float32)
+        self.anchor = self.box.copy()  # last box the detector actually produced
+        self.since_update = 0
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.score = float(score)
+        self.votes = deque([int(class_id)], maxlen=votes)
+        self.hits = 1
+        self.misses = 0
+
+    @property
+    def class_id(self):
+        """Temporal majority of the class ids seen on this track."""
+        return Counter(self.votes).most_common(1)[0][0]
+
+
+class IoUTracker:
+    """
+    Lightweight IoU-association tracker with constant-velocity prediction.
+    Keeps boxes on screen between inference frames and smooths the class
+    over the last `votes` detections of each track.
+    """
+
+    def __init__(self, iou_thres=0.3, max_misses=3, votes=9):
+        self.iou_thres = iou_thres
+        self.max_misses = max_misses
+        self.votes = votes
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def reset(self):
+        self.tracks = []
+
+    def predict(self):
+        """Advances every track by its velocity (used on frames the detector skips)."""
+        for track in self.tracks:
+            track.box = track.box + track.velocity
+            track.since_update += 1
+        return self.tracks
+
+    def update(self, boxes, scores, class_ids):
+        """Associates fresh detections to existing tracks (greedy, highest IoU first)."""
+        existing = np.array([t.box for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+        ious = iou_matrix(existing, np.asarray(boxes, dtype=np.float32).reshape(-1, 4))
+
+        matched_tracks, matched_dets = set(), set()
+        if ious.size:
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                ti, di = np.unravel_index(flat, ious.shape)
+                if ious[ti, di] < self.iou_thres:
+                    break
+                if ti in matched_tracks or di in matched_dets:
+                    continue
+                track = self.tracks[ti]
+                new_box = boxes[di].astype(np.float32)
+                # Smoothed per-frame velocity so skipped frames keep following the strip
+                elapsed = track.since_update + 1
+                track.velocity = 0.5 * track.velocity + 0.5 * (new_box - track.anchor) / elapsed
+                track.box = new_box
+                track.anchor = new_box.copy()
+                track.since_update = 0
+                track.score = float(scores[di])
+                track.votes.append(int(class_ids[di]))
+                track.hits += 1
+                track.misses = 0
+                matched_tracks.add(ti)
+                matched_dets.add(di)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+                track.velocity = np.zeros(4, dtype=np.float32)
+                track.anchor = track.box.copy()
+                track.since_update = 0
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for di in range(len(boxes)):
+            if di not in matched_dets:
+                self.tracks.append(Track(next(self._ids), boxes[di], scores[di], class_ids[di], self.votes))
+        return self.tracks
+
+    def visible(self):
+        """Tracks worth drawing: currently matched or only briefly lost, most established first."""
+        return sorted(self.tracks, key=lambda t: (t.misses, -t.hits, -t.score))
+
+
+class BoxKeys:
+    """
+    Stable keys for detector boxes across inference frames when no tracker
+    runs (fixed frame mode): each box inherits the key of the previous
+    frame's box it overlaps most (greedy, IoU >= `iou_thres`), otherwise it
+    gets a new one. Lets per-object caches (re-id) work without tracking.
+    """
+
+    def __init__(self, iou_thres=0.5):
+        self.iou_thres = iou_thres
+        self._boxes = np.zeros((0, 4), dtype=np.float32)
+        self._keys = []
+        self._ids = itertools.count(1)
+
+    def assign(self, boxes):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        keys = [None] * len(boxes)
+        ious = iou_matrix(boxes, self._boxes)
+        if ious.size:
+            taken = set()
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                bi, pi = np.unravel_index(flat, ious.shape)
+                if ious[bi, pi] < self.iou_thres:
+                    break
+                if keys[bi] is None and pi not in taken:
+                    keys[bi] = self._keys[pi]
+                    taken.add(pi)
+        # Tuples, so they never collide with IoUTracker's integer track ids in the same cache
+        keys = [key if key is not None else ("box", next(self._ids)) for key in keys]
+        self._boxes, self._keys = boxes, keys
+        return keys
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+
+def class_names(inventory_path):
+    """Class order = inventory order (the same order the dataset builder labels with)."""
+    with open(inventory_path, "r") as f:
+        return list(json.load(f).keys())
+
+
+def split_dataset(images_dir, val_fraction=0.2):
+    """
+    Deterministic train/val split: an image's side is decided by a hash of its
+    file name, so adding images never reshuffles the existing split. Applied
+    per class (name prefix) so every SKU lands in both sides when it can.
+    """
+    by_class = {}
+    for name in sorted(os.listdir(images_dir)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            # drug_cetirizine_12.jpg / drug_cetirizine_<sha10>.jpg -> drug_cetirizine
+            stem = os.path.splitext(name)[0]
+            by_class.setdefault(stem.rsplit("_", 1)[0], []).append(os.path.join(images_dir, name))
+
+    train, val = [], []
+    for paths in by_class.values():
+        ranked = sorted(paths, key=lambda p: hashlib.md5(os.path.basename(p).encode()).hexdigest())
+        n_val = int(round(len(ranked) * val_fraction)) if len(ranked) > 1 else 0
+        n_val = max(n_val, 1) if len(ranked) >= 3 else n_val
+        val += ranked[:n_val]
+        train += ranked[n_val:]
+    return sorted(train), sorted(val)
+
+
+def write_split(paths, out_path):
+    """
+    Ultralytics image-list file; './' entries resolve against the list's own
+    folder. The list must sit above the images: Ultralytics replaces every
+    './' in an entry, which mangles '../' paths.
+    """
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    base = os.path.dirname(os.path.abspath(out_path))
+    with open(out_path, "w") as f:
+        f.write("\n".join("./" + os.path.relpath(p, base).replace(os.sep, "/") for p in paths) + "\n")
+
+
+def write_data_yaml(out_path, train_list, val_list, names):
+    """
+    Ultralytics data.yaml. No `path:` key, so the split lists resolve against
+    the yaml's own folder and the file works on any machine.
+    """
+    base = os.path.dirname(os.path.abspath(out_path))
+    lines = [
+        "# Generated by run_train.py from the inventory - do not edit by hand",
+        f"train: {os.path.relpath(train_list, base)}".replace(os.sep, "/"),
+        f"val: {os.path.relpath(val_list, base)}".replace(os.sep, "/"),
+        "",
+        f"nc: {len(names)}",
+        "names:",
+    ] + [f"  {i}: {name}" for i, name in enumerate(names)]
+    with open(out_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _signature(paths, imgsz):
+    h = hashlib.sha1(str(imgsz).encode())
+    for path in paths:
+        stat = os.stat(path)
+        h.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def build_image_cache(paths, cache_path, imgsz=640, workers=8):
+    """
+    Decodes every image once into a (N, imgsz, imgsz, 3) uint8 memmap.
+    Each image is resized to long side `imgsz` (what the Ultralytics loader
+    does per epoch) and placed top-left in its slot; its (h, w) and original
+    (h0, w0) are kept in `<cache_path>.json`, so normalized YOLO labels stay
+    valid. Rebuilt only when the file list, sizes/mtimes or imgsz change.
+    """
+    meta_path = cache_path + ".json"
+    signature = _signature(paths, imgsz)
+    if os.path.exists(meta_path) and os.path.exists(cache_path):
+        with open(meta_path, "r") as f:
+            if json.load(f).get("signature") == signature:
+                return meta_path
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    cache = np.lib.format.open_memmap(cache_path + ".tmp", mode="w+", dtype=np.uint8,
+                                      shape=(len(paths), imgsz, imgsz, 3))
+    hw0 = [None] * len(paths)
+    hw = [None] * len(paths)
+
+    def fill(row):
+        image = cv2.imread(paths[row])
+        if image is None:
+            return
+        h0, w0 = image.shape[:2]
+        r = imgsz / max(h0, w0)
+        if r != 1:
+            image = cv2.resize(image, (min(imgsz, round(w0 * r)), min(imgsz, round(h0 * r))),
+                               interpolation=cv2.INTER_LINEAR if r > 1 else cv2.INTER_AREA)
+        h, w = image.shape[:2]
+        cache[row, :h, :w] = image
+        hw0[row], hw[row] = (h0, w0), (h, w)
+
+    # OpenCV decode/resize release the GIL, so threads scale across cores
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fill, range(len(paths))))
+    cache.flush()
+    del cache
+    os.replace(cache_path + ".tmp", cache_path)
+
+    with open(meta_path, "w") as f:
+        json.dump({"signature": signature, "imgsz": imgsz,
+                   "files": [os.path.abspath(p) for p in paths], "hw0": hw0, "hw": hw}, f)
+    return meta_path
+
+
+class ImageCache:
+    """
+    Read side of build_image_cache: `get(path)` -> (image copy, (h0, w0), (h, w))
+    or None. The memmap is opened lazily and never pickled, so DataLoader
+    workers each map the same file instead of receiving a copy of it.
+    """
+
+    def __init__(self, cache_path):
+        with open(cache_path + ".json", "r") as f:
+            meta = json.load(f)
+        self.cache_path = cache_path
+        self.imgsz = meta["imgsz"]
+        self.rows = {path: i for i, path in enumerate(meta["files"]) if meta["hw"][i] is not None}
+        self.hw0, self.hw = meta["hw0"], meta["hw"]
+        self._array = None
+
+    def __getstate__(self):
+        return {**self.__dict__, "_array": None}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, path):
+        row = self.rows.get(os.path.abspath(path))
+        if row is None:
+            return None
+        if self._array is None:
+            self._array = np.load(self.cache_path, mmap_mode="r")
+        h, w = self.hw[row]
+        return np.array(self._array[row, :h, :w]), tuple(self.hw0[row]), (h, w)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Same import root as main.py and the CLI scripts ("from tools... import")
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,99 @@
+import multiprocessing as mp
+
+import pytest
+
+from tools.audit_store import AuditStore
+
+
+def _record(i, day="2026-10-17", medicine="drug_a"):
+    return {"Timestamp": f"{day} 10:{i // 60:02d}:{i % 60:02d}", "Transaction_ID": f"t{day}-{i}",
+            "medicine": medicine, "status": "SAFE"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AuditStore(str(tmp_path / "audit"))
+    store.append([_record(i, "2026-10-16") for i in range(15)])
+    store.append([_record(i, "2026-10-17", "drug_b" if i % 2 else "drug_a") for i in range(10)])
+    return store
+
+
+def test_pages_are_newest_first_across_segments(store):
+    assert store.total_records() == 25
+    first = store.newest_page(1, 10)
+    assert [r["Transaction_ID"] for r in first] == [f"t2026-10-17-{i}" for i in range(9, -1, -1)]
+    # Page 2 skips the whole newer segment and starts at the end of the older one
+    second = store.newest_page(2, 10)
+    assert [r["Transaction_ID"] for r in second] == [f"t2026-10-16-{i}" for i in range(14, 4, -1)]
+    assert len(store.newest_page(3, 10)) == 5
+    assert store.newest_page(4, 10) == []
+
+
+def test_range_medicine_and_transaction_queries(store):
+    rows = list(store.query_range("2026-10-16 10:00:10", "2026-10-17 10:00:01"))
+    assert [r["Transaction_ID"] for r in rows] == (
+        [f"t2026-10-16-{i}" for i in range(10, 15)] + ["t2026-10-17-0", "t2026-10-17-1"])
+    assert [r["Transaction_ID"] for r in store.query_medicine("drug_b", limit=3)] == [
+        "t2026-10-17-9", "t2026-10-17-7", "t2026-10-17-5"]
+    assert store.find_transaction("t2026-10-16-3")["Timestamp"] == "2026-10-16 10:00:03"
+    assert store.find_transaction("nope") is None
+
+
+def test_medicine_pages(store):
+    assert store.medicine_records("drug_a") == 20
+    assert store.medicine_records("drug_c") == 0
+    ids = lambda rows: [r["Transaction_ID"] for r in rows]
+    assert ids(store.query_medicine("drug_a", limit=4, offset=3)) == [
+        "t2026-10-17-2", "t2026-10-17-0", "t2026-10-16-14", "t2026-10-16-13"]
+    # An offset past the newer segment's drug_a rows never reads its index
+    assert ids(store.query_medicine("drug_a", limit=3, offset=5)) == [
+        "t2026-10-16-14", "t2026-10-16-13", "t2026-10-16-12"]
+    assert ids(store.query_medicine("drug_a", limit=10, offset=15)) == [f"t2026-10-16-{i}" for i in range(4, -1, -1)]
+    assert list(store.query_medicine("drug_a", limit=10, offset=20)) == []
+
+
+def test_undated_rows_are_the_oldest_page(store):
+    store.append([{"Transaction_ID": "legacy", "medicine": "drug_a"}])
+    assert store.days(newest_first=False)[0] == "undated"
+    assert store.newest_page(1, 1)[0]["Transaction_ID"] == "t2026-10-17-9"
+    assert store.newest_page(26, 1)[0]["Transaction_ID"] == "legacy"
+
+
+def test_two_writers_keep_each_others_counts(tmp_path):
+    root = str(tmp_path / "audit")
+    app, batch_job = AuditStore(root), AuditStore(root)
+    app.append([_record(i) for i in range(5)])
+    batch_job.append([_record(i + 5) for i in range(3)])
+    app.append([_record(i + 8) for i in range(2)])
+    for store in (app, batch_job, AuditStore(root)):
+        assert store.total_records() == 10
+        assert [r["Transaction_ID"] for r in store.newest_page(1, 3)] == ["t2026-10-17-9", "t2026-10-17-8",
+                                                                          "t2026-10-17-7"]
+
+
+def _append_many(root, worker):
+    store = AuditStore(root)
+    for i in range(20):
+        store.append([_record(worker * 100 + i)])
+
+
+def test_concurrent_processes(tmp_path):
+    root = str(tmp_path / "audit")
+    ctx = mp.get_context("fork")
+    processes = [ctx.Process(target=_append_many, args=(root, w)) for w in range(3)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    store = AuditStore(root)
+    assert store.total_records() == 60
+    assert len(store.newest_page(1, 100)) == 60
+
+
+def test_reset_by_another_instance(store):
+    other = AuditStore(store.root)
+    store.newest_page(1, 10)  # warms the sidecar cache
+    other.reset()
+    assert store.total_records() == 0
+    other.append([_record(0)])
+    assert [r["Transaction_ID"] for r in store.newest_page(1, 10)] == ["t2026-10-17-0"]
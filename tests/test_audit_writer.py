@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from tools.audit_store import AuditStore
+from tools.audit_writer import AuditWriter
+
+
+class FlakyStore(AuditStore):
+    """AuditStore whose first `failures` appends raise."""
+
+    def __init__(self, root, failures):
+        super().__init__(root)
+        self.failures = failures
+
+    def append(self, batch, spans=None):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        return super().append(batch, spans)
+
+
+def _records(n):
+    return [{"Timestamp": f"2026-10-17 10:00:{i:02d}", "Transaction_ID": f"t{i}", "medicine": "drug_a",
+             "status": "SAFE"} for i in range(n)]
+
+
+@pytest.fixture
+def make_writer(tmp_path):
+    writers = []
+
+    def make(failures, **kwargs):
+        writer = AuditWriter(FlakyStore(str(tmp_path / "audit"), failures), retry_delay=0.01, **kwargs)
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.close()
+
+
+def test_failed_batch_is_retried(make_writer):
+    writer = make_writer(failures=2)
+    for record in _records(3):
+        writer.submit(record)
+    writer.flush()
+    assert writer.errors == 2 and writer.spilled == 0
+    assert writer.store.total_records() == 3
+
+
+def test_batch_is_spilled_after_the_last_retry(make_writer, tmp_path, caplog):
+    writer = make_writer(failures=100, max_retries=2)
+    for record in _records(4):
+        writer.submit(record)
+    writer.flush()
+    assert writer.spilled == 4 and writer.lost == 0
+    assert writer.errors >= 3 and writer.errors % 3 == 0  # 3 attempts per batch (the worker may split them)
+    spill = next((tmp_path / "audit").glob("unwritten-*.jsonl"))
+    assert [json.loads(line)["Transaction_ID"] for line in spill.read_text().splitlines()] == [
+        "t0", "t1", "t2", "t3"]
+    assert "could not be appended" in caplog.text
@@ -0,0 +1,127 @@
+import os
+import signal
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import numpy as np
+import pytest
+
+from tools.inference_client import InferenceClient
+from tools.inference_server import InferenceServer
+
+KEY = b"test-key"
+
+
+def _free_address():
+    listener = Listener(("127.0.0.1", 0))
+    address = listener.address
+    listener.close()
+    return address
+
+
+def _wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def tiny_model(tmp_path):
+    """A (B, 3, 640, 640) -> (B, 4 + 5, 64) graph with YOLO-style metadata, cheap enough for CI."""
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("cv2")
+    from onnx import TensorProto, helper
+
+    nodes = [
+        helper.make_node("AveragePool", ["images"], ["pooled"], kernel_shape=[80, 80], strides=[80, 80]),
+        helper.make_node("Reshape", ["pooled", "shape"], ["flat"]),
+        helper.make_node("Concat", ["flat", "flat", "flat"], ["output0"], axis=1),
+    ]
+    graph = helper.make_graph(
+        nodes, "tiny",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, 640, 640])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", 9, 64])],
+        [helper.make_tensor("shape", TensorProto.INT64, [3], [0, 3, 64])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    helper.set_model_props(model, {"names": str({i: f"drug_{i}" for i in range(5)}), "imgsz": "[640, 640]"})
+    path = tmp_path / "tiny.onnx"
+    onnx.save(model, str(path))
+    return str(path)
+
+
+@pytest.fixture
+def server(tiny_model, monkeypatch):
+    monkeypatch.setenv("PHARMA_ORT_CACHE", "")
+    server = InferenceServer(tiny_model, _free_address(), workers=2, max_batch=1, max_wait_ms=1, authkey=KEY)
+    server.start(timeout=120)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.stop()
+
+
+def test_client_recovers_when_a_worker_is_killed(server):
+    client = InferenceClient(server.address, authkey=KEY, slots=4, slot_bytes=640 * 640 * 3, request_timeout=5.0)
+    frame = np.full((640, 640, 3), 255, np.uint8)
+    assert client.detect(frame, timeout=5.0) is not None
+
+    futures = [client.submit(frame) for _ in range(40)]
+    os.kill(server._workers[0].process.pid, signal.SIGKILL)
+
+    # Every frame is answered or failed (never left hanging) and every slot comes back
+    for future in futures:
+        try:
+            future.result(timeout=10)
+        except RuntimeError as e:
+            assert "died" in str(e)
+    _wait_for(lambda: client.ring._free.qsize() == 4)
+
+    _wait_for(lambda: server.stats()["restarts"] == 1 and all(server.stats()["ready"]))
+    assert client.detect(frame, timeout=5.0) is not None
+    assert client.stats()["connected"]
+
+
+def test_unanswered_frame_times_out_and_frees_its_slot():
+    # A server that says hello and then never answers (a hung worker, from the client's side)
+    listener = Listener(("127.0.0.1", 0), authkey=KEY)
+    held = []
+
+    def serve():
+        conn = listener.accept()
+        conn.recv()
+        conn.send(("hello", {"names": {0: "drug_0"}, "imgsz": 640}))
+        held.append(conn)
+        while True:
+            try:
+                conn.recv()
+            except (EOFError, OSError):
+                return
+
+    threading.Thread(target=serve, daemon=True).start()
+    client = InferenceClient(listener.address, authkey=KEY, slots=2, slot_bytes=64 * 64 * 3, request_timeout=0.5)
+    frame = np.zeros((64, 64, 3), np.uint8)
+
+    with pytest.raises(TimeoutError):
+        client.detect(frame, timeout=0.3)
+    # Fire-and-forget frames are swept at request_timeout
+    future = client.submit(frame)
+    with pytest.raises(TimeoutError):
+        future.result(timeout=5)
+    assert client.ring._free.qsize() == 2
+    assert client.stats()["timeouts"] == 2
+    client.ring.close()
+    listener.close()
+
+
+def test_server_refuses_to_start_without_a_key(monkeypatch):
+    monkeypatch.delenv("PHARMA_INFERENCE_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="PHARMA_INFERENCE_KEY"):
+        InferenceServer("unused.onnx", "127.0.0.1:0", workers=1)
+    monkeypatch.setenv("PHARMA_INFERENCE_KEY", "")
+    with pytest.raises(RuntimeError):
+        InferenceClient("127.0.0.1:0")
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from tools.drug_api import InteractionEngine, normalize_ingredient, summarize
+from tools.inventory import InventoryService
+
+DATASET = {
+    "synonyms": {"acetaminophen": "paracetamol"},
+    "products": {"drug_combiflam": ["ibuprofen", "paracetamol"]},
+    "classes": {"nsaid": ["ibuprofen", "naproxen"], "anticoagulant": ["warfarin", "apixaban"]},
+    "rules": [
+        {"a": "anticoagulant", "b": "nsaid", "severity": "major", "effect": "Bleeding risk."},
+        {"a": "nsaid", "b": "nsaid", "severity": "moderate", "effect": "Two NSAIDs."},
+        {"a": "warfarin", "b": "paracetamol", "severity": "moderate", "effect": "Raises INR."},
+        {"a": "warfarin", "b": "ibuprofen", "severity": "minor", "effect": "Weaker duplicate rule."},
+    ],
+}
+
+INVENTORY = {
+    "drug_warfarin_5": {"name": "Warfarin 5", "dose": "5mg"},
+    "drug_ibuprofen_400": {"name": "Ibuprofen 400", "dose": "400mg"},
+    "drug_naproxen_250": {"name": "Naproxen 250", "dose": "250mg"},
+    "drug_combiflam": {"name": "Combiflam", "dose": "400mg"},
+    "drug_tylenol": {"name": "Tylenol", "dose": "500mg", "ingredients": ["Acetaminophen"]},
+    "drug_cetirizine_10": {"name": "Cetirizine 10", "dose": "10mg"},
+}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    (tmp_path / "interactions.json").write_text(json.dumps(DATASET))
+    (tmp_path / "inventory.json").write_text(json.dumps(INVENTORY))
+    inventory = InventoryService(str(tmp_path / "inventory.json"))
+    return InteractionEngine(str(tmp_path / "interactions.json"), inventory)
+
+
+def test_normalize_strips_salts_and_applies_synonyms():
+    assert normalize_ingredient("Metformin Hydrochloride") == "metformin"
+    assert normalize_ingredient("Acetaminophen", {"acetaminophen": "paracetamol"}) == "paracetamol"
+
+
+def test_class_rules_expand_and_the_most_severe_rule_wins(engine):
+    assert engine.ingredient_pair("warfarin", "naproxen") == ("major", "Bleeding risk.")
+    # "warfarin x ibuprofen" is listed as minor too, but the class rule is major
+    assert engine.ingredient_pair("ibuprofen", "warfarin")[0] == "major"
+    assert engine.ingredient_pair("ibuprofen", "naproxen")[0] == "moderate"
+    assert engine.ingredient_pair("warfarin", "cetirizine") is None
+    assert engine.ingredient_pair("ibuprofen", "ibuprofen") is None
+
+
+def test_check_reports_hits_most_severe_first(engine):
+    hits = engine.check(["drug_warfarin_5", "drug_combiflam"])
+    assert [(h["ingredients"], h["severity"]) for h in hits] == [
+        (("warfarin", "ibuprofen"), "major"),
+        (("warfarin", "paracetamol"), "moderate"),
+    ]
+    assert summarize(hits) == "DANGER"
+
+
+def test_inventory_ingredients_resolve_through_synonyms(engine):
+    assert engine.ingredients("drug_tylenol")[0] == ["paracetamol"]
+    hits = engine.check(["drug_tylenol", "drug_warfarin_5"])
+    assert [h["severity"] for h in hits] == ["moderate"]
+    assert summarize(hits) == "WARNING"
+
+
+def test_shared_ingredient_is_a_duplicate(engine):
+    hits = engine.check(["drug_combiflam", "drug_ibuprofen_400"])
+    kinds = {(h["kind"], h["ingredients"]) for h in hits}
+    assert ("duplicate", ("ibuprofen", "ibuprofen")) in kinds
+
+
+def test_clean_order_is_safe(engine):
+    assert engine.check(["drug_cetirizine_10", "drug_naproxen_250"]) == []
+    assert engine.check(["drug_warfarin_5"]) == []
+    assert summarize([]) == "SAFE"
+
+
+def test_patient_meds_are_screened_against_the_order_only(engine):
+    hits = engine.check(["drug_cetirizine_10"], patient_meds=["drug_warfarin_5", "drug_ibuprofen_400"])
+    assert hits == []  # The two existing meds are not re-checked against each other
+
+    hits = engine.check(["drug_naproxen_250"], patient_meds=["drug_warfarin_5"])
+    assert len(hits) == 1
+    assert hits[0]["patient_med"] and hits[0]["drug_b"] == "drug_warfarin_5"
+
+
+def test_pair_is_symmetric(engine):
+    forward = engine.pair("drug_warfarin_5", "drug_naproxen_250")
+    assert forward == engine.pair("drug_naproxen_250", "drug_warfarin_5")
+    assert forward[0]["severity"] == "major"
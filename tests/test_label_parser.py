@@ -0,0 +1,51 @@
+from datetime import date
+
+import pytest
+
+from tools.label_parser import parse_expiry, parse_label
+
+TODAY = date(2026, 10, 17)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("EXP 03/2027", date(2027, 3, 31)),
+    ("EXP.DATE: 03-27", date(2027, 3, 31)),
+    ("Expiry 03.2027", date(2027, 3, 31)),
+    ("Use before 31.03.2027", date(2027, 3, 31)),
+    ("EXP MAR 2027", date(2027, 3, 31)),
+    ("BEST BEFORE 2027-03", date(2027, 3, 31)),
+])
+def test_keyworded_forms(text, expected):
+    assert parse_label(text, today=TODAY)["expiry"] == expected
+
+
+def test_price_is_not_an_expiry():
+    label = parse_label("MRP RS 12.50 10/2023", today=TODAY)
+    assert label["expiry_raw"] == "10/2023"
+    assert label["expiry"] == date(2023, 10, 31)
+
+
+def test_price_alone_gives_no_expiry():
+    assert parse_expiry("MRP RS 12.50 INCL. OF ALL TAXES") == (None, None)
+
+
+def test_unlabelled_dates_take_the_earliest():
+    # No keyword: a wrong guess must read as expired, never as valid
+    assert parse_label("10/2024 10/2027", today=TODAY)["expiry"] == date(2024, 10, 31)
+
+
+def test_unlabelled_date_nearest_after_keyword():
+    label = parse_label("EXP. DATE OF PACK 03/2027 LIC 01/2025", today=TODAY)
+    assert label["expiry"] == date(2027, 3, 31)
+
+
+def test_mfg_is_never_the_expiry():
+    label = parse_label("MFG: JAN.25 EXP: 12/26 B.NO. AB1234", today=TODAY)
+    assert label["mfg"] == date(2025, 1, 31)
+    assert label["expiry"] == date(2026, 12, 31)
+    assert label["batch"] == "AB1234"
+
+
+@pytest.mark.parametrize("text", ["13/2025", "31/02/2026", "10/1990", "06/2099"])
+def test_implausible_unlabelled_dates_are_ignored(text):
+    assert parse_label(text, today=TODAY)["expiry"] is None
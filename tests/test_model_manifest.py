@@ -0,0 +1,38 @@
+import json
+
+from tools.model_manifest import select_variant
+
+
+def _manifest(tmp_path, variants):
+    for variant in variants:
+        (tmp_path / variant["file"]).write_bytes(b"onnx")
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"variants": variants}))
+    return str(path)
+
+
+def _variant(name, latency, delta, imgsz=640):
+    return {"name": name, "file": f"{name}.onnx", "imgsz": imgsz, "latency_ms_p50": latency, "map_delta": delta}
+
+
+def test_fastest_variant_within_budget(tmp_path):
+    path = _manifest(tmp_path, [
+        _variant("best_640_fp32", 40.0, 0.0),
+        _variant("best_640_int8", 15.0, -0.005),
+        _variant("best_320_int8", 6.0, -0.05, imgsz=320),
+    ])
+    assert select_variant(path, map_budget=0.01)["name"] == "best_640_int8"
+    assert select_variant(path, map_budget=0.1)["name"] == "best_320_int8"
+
+
+def test_unvalidated_variants_never_pass_the_gate(tmp_path):
+    path = _manifest(tmp_path, [
+        _variant("best_640_fp32", 40.0, 0.0),
+        _variant("best_320_int8", 6.0, None, imgsz=320),
+    ])
+    assert select_variant(path)["name"] == "best_640_fp32"
+
+
+def test_missing_manifest(tmp_path):
+    assert select_variant(str(tmp_path / "manifest.json")) is None
+    assert select_variant(None) is None
@@ -0,0 +1,51 @@
+import numpy as np
+
+from tools.tiling import merge_tile_detections, tile_grid
+
+
+def test_grid_covers_the_frame_with_overlap():
+    windows = tile_grid(1080, 1920, tile=640, overlap=0.2)
+    assert all(x2 - x1 == 640 and y2 - y1 == 640 for x1, y1, x2, y2 in windows)
+    assert max(x2 for _, _, x2, _ in windows) == 1920
+    assert max(y2 for _, _, _, y2 in windows) == 1080
+    xs = sorted({x1 for x1, _, _, _ in windows})
+    assert all(b - a <= 640 * 0.8 + 1 for a, b in zip(xs, xs[1:]))
+
+
+def test_small_frame_is_one_window():
+    assert tile_grid(480, 600, tile=640) == [(0, 0, 600, 480)]
+
+
+def _det(boxes, scores, classes):
+    return np.array(boxes, np.float32), np.array(scores, np.float32), np.array(classes, np.int64)
+
+
+def test_confident_partial_does_not_cut_the_full_box():
+    windows = [(0, 0, 640, 640), (0, 0, 1920, 1080)]
+    partial = _det([[500, 100, 640, 200]], [0.95], [3])       # cut by the tile border
+    full = _det([[500, 100, 800, 200]], [0.70], [3])          # whole strip from the full-frame pass
+    boxes, scores, classes = merge_tile_detections([partial, full], windows)
+    assert boxes.tolist() == [[500, 100, 800, 200]]
+    assert scores.tolist() == [np.float32(0.95)]
+    assert classes.tolist() == [3]
+
+
+def test_halves_from_neighbouring_tiles_join():
+    windows = [(0, 0, 640, 640), (512, 0, 1152, 640)]
+    left = _det([[560, 50, 640, 150]], [0.8], [1])
+    right = _det([[48, 50, 168, 150]], [0.9], [1])   # 560..680 in frame pixels
+    boxes, _, _ = merge_tile_detections([left, right], windows)
+    assert boxes.tolist() == [[560, 50, 680, 150]]
+
+
+def test_other_classes_and_separate_strips_are_kept():
+    windows = [(0, 0, 1920, 1080)]
+    dets = _det([[0, 0, 100, 100], [10, 10, 90, 90], [300, 300, 400, 400]], [0.9, 0.8, 0.7], [0, 1, 0])
+    boxes, scores, classes = merge_tile_detections([dets], windows)
+    assert len(boxes) == 3
+    assert scores.tolist() == sorted(scores.tolist(), reverse=True)
+
+
+def test_no_detections():
+    boxes, scores, classes = merge_tile_detections([_det(np.zeros((0, 4)), [], [])], [(0, 0, 640, 640)])
+    assert boxes.shape == (0, 4) and not len(scores) and not len(classes)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from tools.tracker import BoxKeys, IoUTracker, MotionGate, iou_matrix
+
+
+def _boxes(*rows):
+    return np.array(rows, dtype=np.float32)
+
+
+def test_iou_matrix():
+    ious = iou_matrix(_boxes([0, 0, 10, 10]), _boxes([0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]))
+    assert ious.shape == (1, 3)
+    assert ious[0].tolist() == pytest.approx([1.0, 1 / 3, 0.0], abs=1e-4)
+    assert iou_matrix(_boxes(), _boxes([0, 0, 1, 1])).shape == (0, 1)
+
+
+def test_track_ids_follow_moving_boxes():
+    tracker = IoUTracker()
+    first = tracker.update(_boxes([0, 0, 100, 50], [200, 0, 300, 50]), [0.9, 0.8], [1, 2])
+    ids = [t.id for t in first]
+    tracker.update(_boxes([10, 0, 110, 50], [210, 0, 310, 50]), [0.9, 0.8], [1, 2])
+    assert [t.id for t in tracker.tracks] == ids
+    assert tracker.tracks[0].velocity.tolist() == [5, 0, 5, 0]  # smoothed 0.5 * 10 px/frame
+
+
+def test_predict_moves_tracks_between_detections():
+    tracker = IoUTracker()
+    tracker.update(_boxes([0, 0, 100, 50]), [0.9], [1])
+    tracker.update(_boxes([10, 0, 110, 50]), [0.9], [1])
+    tracker.predict()
+    tracker.predict()
+    assert tracker.tracks[0].box.tolist() == [20, 0, 120, 50]
+    # The next detection is measured against the last real box over the frames in between
+    tracker.update(_boxes([40, 0, 140, 50]), [0.9], [1])
+    assert tracker.tracks[0].velocity.tolist() == pytest.approx([7.5, 0, 7.5, 0])
+
+
+def test_class_is_the_majority_vote():
+    tracker = IoUTracker(votes=5)
+    box = _boxes([0, 0, 100, 50])
+    for class_id in [3, 3, 7, 3, 7]:
+        tracker.update(box, [0.9], [class_id])
+    assert len(tracker.tracks) == 1
+    assert tracker.tracks[0].class_id == 3
+
+
+def test_lost_tracks_expire_after_max_misses():
+    tracker = IoUTracker(max_misses=2)
+    tracker.update(_boxes([0, 0, 100, 50]), [0.9], [1])
+    tracker.update(_boxes([300, 0, 400, 50]), [0.8], [1])
+    assert [t.misses for t in tracker.visible()] == [0, 1]
+    tracker.update(_boxes([300, 0, 400, 50]), [0.8], [1])
+    tracker.update(_boxes([300, 0, 400, 50]), [0.8], [1])
+    assert len(tracker.tracks) == 1 and tracker.tracks[0].misses == 0
+
+
+def test_motion_gate_intervals_and_motion():
+    gate = MotionGate(threshold=6.0, min_interval=2, max_interval=5)
+    still = np.full((360, 640, 3), 100, dtype=np.uint8)
+    moved = np.full((360, 640, 3), 200, dtype=np.uint8)
+
+    assert gate.should_detect(still)       # no reference yet
+    assert not gate.should_detect(moved)   # within min_interval, even with motion
+    assert gate.should_detect(moved)       # motion once allowed
+    assert [gate.should_detect(moved) for _ in range(5)] == [False] * 4 + [True]  # max_interval refresh
+
+    gate.reset()
+    assert gate.should_detect(moved)
+
+
+def test_motion_gate_reads_the_frame_layout():
+    # Pure blue and pure red differ a lot in luma; read with the wrong layout they would swap
+    blue_rgb = np.zeros((36, 64, 3), dtype=np.uint8)
+    blue_rgb[..., 2] = 255
+    gate_rgb, gate_bgr = MotionGate(), MotionGate()
+    gate_rgb.should_detect(blue_rgb, "rgb24")
+    gate_bgr.should_detect(np.ascontiguousarray(blue_rgb[..., ::-1]), "bgr24")
+    assert gate_rgb._reference.tolist() == gate_bgr._reference.tolist()
+    assert int(gate_rgb._reference.mean()) == 29  # 0.114 * 255: blue, not red
+
+
+def test_box_keys_are_inherited_by_overlapping_boxes():
+    keys = BoxKeys()
+    first = keys.assign(_boxes([0, 0, 100, 50], [200, 0, 300, 50]))
+    second = keys.assign(_boxes([205, 0, 305, 50], [2, 0, 102, 50], [500, 0, 600, 50]))
+    assert second[:2] == [first[1], first[0]]
+    assert second[2] not in first
+    assert all(isinstance(key, tuple) for key in second)
+    assert keys.assign(_boxes()) == []
@@ -1,15 +1,24 @@
+import os
 from ultralytics import YOLO
+from run_train import BASE_DIR, prepare
+from tools.cached_training import CachedDetectionTrainer
 
-# 1. Load a pre-trained base model
-model = YOLO('yolov8n.pt') 
-
-# 2. Start Training on your laptop
-# 'epochs' is how many times it looks at the data. Use 50 for a quick, good result.
-results = model.train(
-    data='dataset/data.yaml', 
-    epochs=50, 
-    imgsz=640, 
-    device='cpu' # Use '0' if you have an NVIDIA GPU, otherwise 'cpu'
-)
+if __name__ == '__main__':  # DataLoader workers re-import this file on Windows
+    # 0. Generate dataset/data.yaml + the train/val split + the decoded image cache
+    data_yaml, CachedDetectionTrainer.cache_paths = prepare(
+        os.path.join(BASE_DIR, "data", "inventory_all.json"), imgsz=640, val_fraction=0.2, workers=os.cpu_count() or 1
+    )
 
+    # 1. Load a pre-trained base model
+    model = YOLO('yolov8n.pt')
 
+    # 2. Start Training on your laptop
+    # 'epochs' is how many times it looks at the data. Use 50 for a quick, good result.
+    results = model.train(
+        trainer=CachedDetectionTrainer,
+        data=data_yaml,
+        epochs=50,
+        imgsz=640,
+        workers=min(4, os.cpu_count() or 1),
+        device='cpu' # Use '0' if you have an NVIDIA GPU, otherwise 'cpu'
+    )
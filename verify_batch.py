@@ -0,0 +1,52 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# Same path setup as main.py so the agents import identically
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+from brain.orchestrator import Orchestrator
+from brain.batch_pipeline import BatchVerifier, expected_from_filename
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Headless verification of an image folder or a recorded video "
+                    "(night-shift recordings, incoming stock photos)."
+    )
+    parser.add_argument("input", help="Folder of images or a video file")
+    parser.add_argument("--expected", help="Drug id every item should match (e.g. drug_crocin_advance)")
+    parser.add_argument("--expected-from-filename", action="store_true",
+                        help="Take the expected drug id from the file name (drug_cetirizine_12.jpg)")
+    parser.add_argument("--out", default=None, help="JSON-lines result file (default: data/logs/batch/<timestamp>.jsonl)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4, help="Decode worker threads")
+    parser.add_argument("--every", type=int, default=1, help="Video only: analyse every Nth frame")
+    parser.add_argument("--backend", default=None, help="ultralytics | onnxruntime (default: PHARMA_VISION_BACKEND)")
+    args = parser.parse_args()
+
+    expected = expected_from_filename if args.expected_from_filename else args.expected
+    # The user's paths are relative to where they ran the command, the default one to the repo
+    input_path = os.path.abspath(args.input)
+    out_path = os.path.abspath(args.out) if args.out else os.path.join(
+        BASE_DIR, "data", "logs", "batch", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    # Then the same working directory as main.py, for the agents' data/ and models/ paths
+    os.chdir(BASE_DIR)
+
+    # Own (non-shared) orchestrator with a batched engine sized for this run
+    brain = Orchestrator(backend=args.backend, max_batch=args.batch_size)
+    verifier = BatchVerifier(brain, batch_size=args.batch_size, workers=args.workers)
+
+    start = time.perf_counter()
+    summary = verifier.run(input_path, out_path, expected=expected, every=args.every)
+    elapsed = time.perf_counter() - start
+
+    summary["seconds"] = round(elapsed, 2)
+    summary["items_per_second"] = round(summary["items"] / elapsed, 1) if elapsed else None
+    summary["results"] = out_path
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()